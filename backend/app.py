@@ -1,33 +1,35 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, send_file, Response
-from flask_mysqldb import MySQL
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, send_file, Response, g
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
+from werkzeug.datastructures import Headers
+from urllib.parse import quote
+import unicodedata
 from functools import wraps
 import os
-import io
 import tempfile
-import pandas as pd
-from datetime import datetime
 from config import Config
 
 # Importar scripts de transformación
-from scripts import clientes, venta_material, unir_ventas, exhibidores
-from config_flujos import FLUJOS_N8N, detectar_flujo, validar_columnas
+from scripts import almacen_ventas, lectura, escritura
+import cache
+import procesamiento
+import lotes
+import jobs
+import n8n_cliente
+import db
+import metricas
+import subidas
+import time
+from config_flujos import FLUJOS_N8N, analizar_columnas, validar_columnas
 import requests
 
 app = Flask(__name__)
 app.config.from_object(Config)
-
-# Directorio de cache para archivos procesados (filesystem-based para multi-worker)
-# Cada usuario tendrá un archivo temporal con metadata JSON
-import json
-CACHE_DIR = os.path.join(tempfile.gettempdir(), 'convertidor_cache')
-os.makedirs(CACHE_DIR, mode=0o755, exist_ok=True)
+# Las subidas se escriben directo a disco (con su hash) y se mueven sin copiar
+app.request_class = subidas.SubidaRequest
 
 ALLOWED_EXTENSIONS = app.config['ALLOWED_EXTENSIONS']
 
-mysql = MySQL(app)
-
 # Decorador para requerir login
 def login_required(f):
     @wraps(f)
@@ -51,59 +53,52 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Latencia de cada petición por ruta (plantilla de la regla, no la URL, para acotar las etiquetas)
+@app.before_request
+def _inicio_peticion():
+    g.inicio_peticion = time.perf_counter()
+
+@app.after_request
+def _medir_peticion(response):
+    inicio = g.pop('inicio_peticion', None)
+    if inicio is not None and request.endpoint not in ('static', 'metrics'):
+        ruta = request.url_rule.rule if request.url_rule else 'sin_ruta'
+        metricas.PETICION_SEGUNDOS.labels(
+            ruta=ruta, metodo=request.method, estado=str(response.status_code)
+        ).observe(time.perf_counter() - inicio)
+    return response
+
+@app.teardown_request
+def _limpiar_subidas(exc):
+    request.limpiar_subidas()
+
+@app.route('/metrics')
+def metrics():
+    """Métricas en formato Prometheus (con METRICS_TOKEN exige 'Authorization: Bearer <token>')"""
+    token = app.config.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return Response('No autorizado\n', status=401, mimetype='text/plain')
+    contenido, content_type = metricas.generar()
+    return Response(contenido, content_type=content_type)
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def save_to_cache(user_id, filename, file_path):
-    """Guarda un archivo procesado en el cache del usuario (filesystem) - copia directa sin modificar"""
-    # Leer el archivo como bytes sin procesar
-    with open(file_path, 'rb') as f:
-        csv_data = f.read()
-    
-    if len(csv_data) == 0:
-        print(f"[WARNING] Intentando guardar archivo vacío!")
-    
-    # Guardar archivo CSV en filesystem
-    cache_file_path = os.path.join(CACHE_DIR, f'user_{user_id}.csv')
-    cache_meta_path = os.path.join(CACHE_DIR, f'user_{user_id}.json')
-    
-    with open(cache_file_path, 'wb') as f:
-        f.write(csv_data)
-    
-    # Guardar metadata
-    metadata = {
-        'filename': filename,
-        'timestamp': datetime.now().isoformat(),
-        'size': len(csv_data)
-    }
-    with open(cache_meta_path, 'w') as f:
-        json.dump(metadata, f)
-    
-    print(f"[INFO] Archivo guardado en cache: {filename} ({len(csv_data)} bytes)")
-    
-def get_from_cache(user_id):
-    """Obtiene archivo del cache del usuario (filesystem)"""
-    cache_file_path = os.path.join(CACHE_DIR, f'user_{user_id}.csv')
-    cache_meta_path = os.path.join(CACHE_DIR, f'user_{user_id}.json')
-    
-    if not os.path.exists(cache_file_path) or not os.path.exists(cache_meta_path):
-        return None
-    
+def content_disposition(filename):
+    """
+    Content-Disposition de descarga como el de send_file(download_name=...): el
+    nombre va entre comillas si lo necesita (espacios, ';') y, si no es ASCII,
+    también en filename* (RFC 5987)
+    """
     try:
-        with open(cache_file_path, 'rb') as f:
-            data = f.read()
-        
-        with open(cache_meta_path, 'r') as f:
-            metadata = json.load(f)
-        
-        return {
-            'filename': metadata['filename'],
-            'data': data,
-            'timestamp': datetime.fromisoformat(metadata['timestamp'])
-        }
-    except Exception as e:
-        print(f"[ERROR] Error reading cache for user {user_id}: {e}")
-        return None
+        filename.encode('ascii')
+        opciones = {'filename': filename}
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        opciones = {'filename': simple, 'filename*': f"UTF-8''{quote(filename, safe='!#$&+^`|~')}"}
+    headers = Headers()
+    headers.set('Content-Disposition', 'attachment', **opciones)
+    return headers['Content-Disposition']
 
 # RUTAS DE AUTENTICACIÓN
 @app.route('/favicon.ico')
@@ -125,10 +120,11 @@ def login():
         usuario = request.form['usuario']
         password = request.form['password']
         
-        cur = mysql.connection.cursor()
-        cur.execute("SELECT id, usuario, password, rol FROM usuarios WHERE usuario = %s", (usuario,))
-        user = cur.fetchone()
-        cur.close()
+        with db.conexion() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT id, usuario, password, rol FROM usuarios WHERE usuario = %s", (usuario,))
+            user = cur.fetchone()
+            cur.close()
         
         if user and check_password_hash(user[2], password):
             session['user_id'] = user[0]
@@ -157,10 +153,7 @@ def dashboard():
 @app.route('/usuarios')
 @admin_required
 def usuarios():
-    cur = mysql.connection.cursor()
-    cur.execute("SELECT id, usuario, rol FROM usuarios ORDER BY id DESC")
-    users = cur.fetchall()
-    cur.close()
+    users = db.listar_usuarios()
     return render_template('usuarios.html', usuarios=users)
 
 @app.route('/usuarios/crear', methods=['POST'])
@@ -173,11 +166,13 @@ def crear_usuario():
     hashed_password = generate_password_hash(password)
     
     try:
-        cur = mysql.connection.cursor()
-        cur.execute("INSERT INTO usuarios (usuario, password, rol) VALUES (%s, %s, %s)", 
-                   (usuario, hashed_password, rol))
-        mysql.connection.commit()
-        cur.close()
+        with db.conexion() as conn:
+            cur = conn.cursor()
+            cur.execute("INSERT INTO usuarios (usuario, password, rol) VALUES (%s, %s, %s)", 
+                       (usuario, hashed_password, rol))
+            conn.commit()
+            cur.close()
+        db.invalidar_usuarios()
         flash('Usuario creado exitosamente', 'success')
     except Exception as e:
         flash(f'Error al crear usuario: {str(e)}', 'danger')
@@ -192,10 +187,12 @@ def eliminar_usuario(id):
         return redirect(url_for('usuarios'))
     
     try:
-        cur = mysql.connection.cursor()
-        cur.execute("DELETE FROM usuarios WHERE id = %s", (id,))
-        mysql.connection.commit()
-        cur.close()
+        with db.conexion() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM usuarios WHERE id = %s", (id,))
+            conn.commit()
+            cur.close()
+        db.invalidar_usuarios()
         flash('Usuario eliminado exitosamente', 'success')
     except Exception as e:
         flash(f'Error al eliminar usuario: {str(e)}', 'danger')
@@ -207,10 +204,7 @@ def eliminar_usuario(id):
 @admin_required
 def api_get_usuarios():
     try:
-        cur = mysql.connection.cursor()
-        cur.execute("SELECT id, usuario, rol FROM usuarios ORDER BY id DESC")
-        users = cur.fetchall()
-        cur.close()
+        users = db.listar_usuarios()
         
         usuarios_list = []
         for user in users:
@@ -238,11 +232,13 @@ def api_crear_usuario():
         
         hashed_password = generate_password_hash(password)
         
-        cur = mysql.connection.cursor()
-        cur.execute("INSERT INTO usuarios (usuario, password, rol) VALUES (%s, %s, %s)", 
-                   (usuario, hashed_password, rol))
-        mysql.connection.commit()
-        cur.close()
+        with db.conexion() as conn:
+            cur = conn.cursor()
+            cur.execute("INSERT INTO usuarios (usuario, password, rol) VALUES (%s, %s, %s)", 
+                       (usuario, hashed_password, rol))
+            conn.commit()
+            cur.close()
+        db.invalidar_usuarios()
         
         return jsonify({'success': True, 'message': 'Usuario creado exitosamente'})
     except Exception as e:
@@ -255,10 +251,12 @@ def api_eliminar_usuario(id):
         if id == session.get('user_id'):
             return jsonify({'success': False, 'error': 'No puedes eliminar tu propio usuario'}), 400
         
-        cur = mysql.connection.cursor()
-        cur.execute("DELETE FROM usuarios WHERE id = %s", (id,))
-        mysql.connection.commit()
-        cur.close()
+        with db.conexion() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM usuarios WHERE id = %s", (id,))
+            conn.commit()
+            cur.close()
+        db.invalidar_usuarios()
         
         return jsonify({'success': True, 'message': 'Usuario eliminado exitosamente'})
     except Exception as e:
@@ -276,174 +274,256 @@ def api_actualizar_usuario(id):
         if not usuario or not rol:
             return jsonify({'success': False, 'error': 'Usuario y rol son requeridos'}), 400
         
-        cur = mysql.connection.cursor()
-        
-        # Si se proporcionó una nueva contraseña
-        if password and password.strip():
-            hashed_password = generate_password_hash(password)
-            cur.execute("UPDATE usuarios SET usuario = %s, password = %s, rol = %s WHERE id = %s", 
-                       (usuario, hashed_password, rol, id))
-        else:
-            # Solo actualizar usuario y rol
-            cur.execute("UPDATE usuarios SET usuario = %s, rol = %s WHERE id = %s", 
-                       (usuario, rol, id))
-        
-        mysql.connection.commit()
-        cur.close()
+        with db.conexion() as conn:
+            cur = conn.cursor()
+            
+            # Si se proporcionó una nueva contraseña
+            if password and password.strip():
+                hashed_password = generate_password_hash(password)
+                cur.execute("UPDATE usuarios SET usuario = %s, password = %s, rol = %s WHERE id = %s", 
+                           (usuario, hashed_password, rol, id))
+            else:
+                # Solo actualizar usuario y rol
+                cur.execute("UPDATE usuarios SET usuario = %s, rol = %s WHERE id = %s", 
+                           (usuario, rol, id))
+            
+            conn.commit()
+            cur.close()
+        db.invalidar_usuarios()
         
         return jsonify({'success': True, 'message': 'Usuario actualizado exitosamente'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-# PROCESAMIENTO DE ARCHIVOS (en memoria)
+# PROCESAMIENTO DE ARCHIVOS (cola de trabajos en segundo plano)
 @app.route('/procesar/<tipo>', methods=['POST'])
 @login_required
 def procesar_archivo(tipo):
     try:
         user_id = session.get('user_id')
         
-        if tipo == 'union_ventas':
-            if 'archivo_acum' not in request.files or 'archivo_mes' not in request.files:
-                return jsonify({'success': False, 'error': 'Faltan archivos'}), 400
-            
-            file_acum = request.files['archivo_acum']
-            file_mes = request.files['archivo_mes']
-            
-            if file_acum.filename == '' or file_mes.filename == '':
-                return jsonify({'success': False, 'error': 'No se seleccionaron archivos'}), 400
+        try:
+            transformacion = procesamiento.obtener(tipo)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        try:
+            formato = escritura.validar_formato(request.form.get('formato'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        # Archivos que declara la transformación (los opcionales vacíos se ignoran)
+        archivos_subidos = {}
+        for campo in transformacion.campos + transformacion.opcionales:
+            file = request.files.get(campo)
+            obligatorio = campo in transformacion.campos
+            if file is None or file.filename == '':
+                if not obligatorio:
+                    continue
+                if file is None:
+                    mensaje = 'No se envió ningún archivo' if len(transformacion.campos) == 1 else 'Faltan archivos'
+                else:
+                    mensaje = 'No se seleccionó ningún archivo'
+                return jsonify({'success': False, 'error': mensaje}), 400
             
-            if not (allowed_file(file_acum.filename) and allowed_file(file_mes.filename)):
-                return jsonify({'success': False, 'error': 'Tipo de archivo no válido'}), 400
+            if not allowed_file(file.filename):
+                return jsonify({'success': False, 'error': 'Tipo de archivo no válido. Solo se permiten: xlsx, xls, csv, parquet'}), 400
             
-            try:
-                # Guardar archivos temporalmente para procesarlos con el script
-                temp_dir = tempfile.mkdtemp()
-                temp_acum = os.path.join(temp_dir, secure_filename(file_acum.filename))
-                temp_mes = os.path.join(temp_dir, secure_filename(file_mes.filename))
-                
-                file_acum.save(temp_acum)
-                file_mes.save(temp_mes)
-                
-                # Procesar con el script de unir_ventas
-                print(f"[INFO] Procesando unión de ventas usando script")
-                unir_ventas.ejecutar(temp_acum, temp_mes, carpeta_salida=temp_dir)
-                
-                # Ruta al resultado
-                resultado_path = os.path.join(temp_dir, 'ventas_acum.csv')
-                
-                if not os.path.exists(resultado_path):
-                    return jsonify({'success': False, 'error': 'El archivo procesado no se generó correctamente'}), 500
-                
-                # Guardar en cache (copia directa del archivo sin modificar)
-                save_to_cache(user_id, 'ventas_acum.csv', resultado_path)
-                
-                # Limpiar archivos temporales
-                import shutil
-                shutil.rmtree(temp_dir)
-                
-                return jsonify({
-                    'success': True, 
-                    'message': 'Archivos unidos correctamente',
-                    'download_url': url_for('download_file')
-                })
-                
-            except ValueError as e:
-                return jsonify({'success': False, 'error': f'Error al leer archivos: {str(e)}'}), 400
-            except Exception as e:
-                import traceback
-                traceback.print_exc()
-                return jsonify({'success': False, 'error': f'Error al procesar: {str(e)}'}), 500
-        
-        # Para archivos individuales
-        if 'archivo' not in request.files:
-            return jsonify({'success': False, 'error': 'No se envió ningún archivo'}), 400
+            archivos_subidos[campo] = file
         
-        file = request.files['archivo']
+        error = transformacion.validar(archivos_subidos, procesamiento.opciones(tipo))
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
         
-        if file.filename == '':
-            return jsonify({'success': False, 'error': 'No se seleccionó ningún archivo'}), 400
+        print(f"[INFO] Encolando procesamiento tipo '{tipo}' para user_id: {user_id}")
+        
+        # Guardar archivos en una carpeta de trabajo; el proceso del pool la elimina al terminar
+        temp_dir = tempfile.mkdtemp()
+        archivos = {}
+        hashes = {}
+        for campo, archivo in archivos_subidos.items():
+            ruta = os.path.join(temp_dir, f'{campo}_{secure_filename(archivo.filename)}')
+            # Se mueve el temporal de la subida; el hash se calculó mientras llegaba
+            hashes[campo] = subidas.mover_subida(archivo, ruta)
+            archivos[campo] = ruta
+            metricas.SUBIDA_BYTES.labels(tipo=tipo).observe(os.path.getsize(ruta))
+        
+        parametros = {'mes': request.form.get('mes', ''), 'formato': formato}
         
-        if not allowed_file(file.filename):
-            return jsonify({'success': False, 'error': 'Tipo de archivo no válido. Solo se permiten: xlsx, xls, csv'}), 400
+        # Misma subida + mismo tipo y parámetros: devolver el resultado en cache sin reprocesar
+        clave = cache.calcular_clave(hashes, tipo, parametros)
+        
+        if transformacion.usa_cache:
+            respuesta = _respuesta_en_cache(user_id, tipo, clave, temp_dir)
+            if respuesta:
+                return respuesta
+        
+        return _encolar(tipo, user_id, archivos, parametros, temp_dir, clave, 'Archivo recibido. Procesamiento en curso.')
+    
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': f'Error general: {str(e)}'}), 500
+
+def _respuesta_en_cache(user_id, tipo, clave, temp_dir):
+    """Misma subida + mismo tipo y parámetros: respuesta con el resultado en cache, o None"""
+    entrada = cache.buscar(clave)
+    if not entrada:
+        return None
+    import shutil
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    cache.registrar_usuario(user_id, clave, entrada['filename'])
+    print(f"[INFO] Resultado en cache para tipo '{tipo}' (clave {clave[:12]})")
+    return jsonify({
+        'success': True,
+        'message': 'Archivo procesado correctamente',
+        'archivo': entrada['filename'],
+        'download_url': url_for('download_file', clave=clave)
+    })
+
+def _encolar(tipo, user_id, archivos, parametros, temp_dir, clave, mensaje, lote=False):
+    """Envía el trabajo a la cola; el proceso del pool elimina temp_dir al terminar"""
+    try:
+        job_id = jobs.encolar(tipo, user_id, archivos, parametros, temp_dir, clave, lote=lote)
+    except jobs.ColaLlena as e:
+        import shutil
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        return jsonify({'success': False, 'error': str(e)}), 503
+    
+    return jsonify({
+        'success': True,
+        'message': mensaje,
+        'job_id': job_id,
+        'status_url': url_for('api_job', job_id=job_id)
+    }), 202
+
+# PROCESAMIENTO POR LOTES (varios archivos o ZIP del mismo tipo en un solo trabajo)
+@app.route('/procesar-lote/<tipo>', methods=['POST'])
+@login_required
+def procesar_lote(tipo):
+    """
+    Recibe varios archivos en el campo 'archivos' (sueltos o ZIP) y los procesa en
+    paralelo. 'salida' = zip (un resultado por archivo) | combinado (un solo archivo).
+    """
+    temp_dir = None
+    try:
+        user_id = session.get('user_id')
         
         try:
-            print(f"[INFO] Procesando archivo {file.filename} tipo '{tipo}' para user_id: {user_id}")
-            
-            # Guardar archivo temporal para procesarlo con los scripts
-            temp_dir = tempfile.mkdtemp()
-            temp_file = os.path.join(temp_dir, secure_filename(file.filename))
-            file.save(temp_file)
-            
-            # Procesar según el tipo usando los scripts
-            if tipo == 'clientes':
-                print(f"[INFO] Procesando maestra de clientes usando script")
-                clientes.ejecutar(temp_file, carpeta_salida=temp_dir)
-                output_filename = 'maestra_clientes.csv'
-                
-            elif tipo == 'venta_material':
-                mes = request.form.get('mes', '')
-                print(f"[INFO] Procesando venta_material con mes: {mes} usando script")
-                venta_material.ejecutar(temp_file, mes, carpeta_salida=temp_dir)
-                output_filename = 'ventas_mes.csv'
-            
-            elif tipo == 'exhibidores':
-                print(f"[INFO] Procesando exhibidores usando script")
-                exhibidores.ejecutar(temp_file, carpeta_salida=temp_dir)
-                output_filename = 'Exhibidores.csv'
-            
-            else:
-                return jsonify({'success': False, 'error': f'Tipo de procesamiento "{tipo}" no reconocido'}), 400
-            
-            # Ruta al archivo procesado
-            resultado_path = os.path.join(temp_dir, output_filename)
-            
-            if not os.path.exists(resultado_path):
-                return jsonify({'success': False, 'error': 'El archivo procesado no se generó correctamente'}), 500
-            
-            print(f"[INFO] Guardando en cache: {output_filename}")
-            # Guardar en cache (copia directa del archivo sin modificar)
-            save_to_cache(user_id, output_filename, resultado_path)
-            
-            # Limpiar archivos temporales
-            import shutil
-            if os.path.exists(temp_file):
-                shutil.rmtree(os.path.dirname(temp_file), ignore_errors=True)
-            
-            return jsonify({
-                'success': True, 
-                'message': 'Archivo procesado correctamente',
-                'download_url': url_for('download_file')
-            })
-                
+            transformacion = procesamiento.obtener(tipo)
+            formato = escritura.validar_formato(request.form.get('formato'))
+            salida = lotes.validar_salida(request.form.get('salida'))
         except ValueError as e:
-            print(f"[ERROR] ValueError: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return jsonify({'success': False, 'error': f'Error al leer archivo: {str(e)}'}), 400
-        except Exception as e:
-            print(f"[ERROR] Exception: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return jsonify({'success': False, 'error': f'Error al procesar archivo: {str(e)}'}), 500
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        if not transformacion.admite_lote:
+            return jsonify({'success': False, 'error': f'El tipo "{tipo}" no admite procesamiento por lotes'}), 400
+        
+        subidos = [archivo for archivo in request.files.getlist('archivos') if archivo.filename]
+        if not subidos:
+            return jsonify({'success': False, 'error': 'No se envió ningún archivo'}), 400
+        for archivo in subidos:
+            if not (allowed_file(archivo.filename) or lotes.es_zip(archivo.filename)):
+                return jsonify({'success': False, 'error': 'Tipo de archivo no válido. Solo se permiten: xlsx, xls, csv, parquet o zip'}), 400
+        
+        temp_dir = tempfile.mkdtemp()
+        archivos = {}
+        hashes = {}
+        for archivo in subidos:
+            nombre = secure_filename(archivo.filename)
+            if '.' not in nombre:
+                # El nombre no tenía caracteres válidos además de la extensión
+                nombre = f"archivo.{archivo.filename.rsplit('.', 1)[1].lower()}"
+            nombre = lotes.nombre_unico(nombre, archivos)
+            ruta = os.path.join(temp_dir, nombre)
+            hashes[nombre] = subidas.mover_subida(archivo, ruta)
+            archivos[nombre] = ruta
+            metricas.SUBIDA_BYTES.labels(tipo=tipo).observe(os.path.getsize(ruta))
+        
+        # Solo el índice de los ZIP: cantidad de archivos y tamaño descomprimido
+        entradas = lotes.listar_entradas(archivos, ALLOWED_EXTENSIONS)
+        print(f"[INFO] Encolando lote de {len(entradas)} archivos tipo '{tipo}' para user_id: {user_id}")
+        
+        parametros = {'mes': request.form.get('mes', ''), 'formato': formato, 'salida': salida}
+        clave = cache.calcular_clave(hashes, tipo, parametros)
+        respuesta = _respuesta_en_cache(user_id, tipo, clave, temp_dir)
+        if respuesta:
+            return respuesta
+        
+        return _encolar(tipo, user_id, archivos, parametros, temp_dir, clave,
+                        f'Lote de {len(entradas)} archivos recibido. Procesamiento en curso.', lote=True)
     
     except Exception as e:
+        if temp_dir:
+            import shutil
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        if isinstance(e, ValueError):
+            return jsonify({'success': False, 'error': str(e)}), 400
+        import traceback
+        traceback.print_exc()
         return jsonify({'success': False, 'error': f'Error general: {str(e)}'}), 500
 
+def _job_publico(estado):
+    """Campos del trabajo que se exponen en la API"""
+    respuesta = {
+        'job_id': estado['id'],
+        'tipo': estado['tipo'],
+        'lote': estado.get('lote', False),
+        'estado': estado['estado'],
+        'progreso': estado['progreso'],
+        'mensaje': estado['mensaje'],
+        'error': estado['error'],
+        'creado': estado['creado'],
+        'actualizado': estado['actualizado'],
+        'etapas': estado.get('etapas'),
+        'resultado': None
+    }
+    resultado = estado.get('resultado')
+    if estado['estado'] == jobs.COMPLETADO and resultado:
+        if resultado['origen'] == 'ventas_acumuladas':
+            download_url = url_for('download_ventas_acumuladas')
+        else:
+            download_url = url_for('download_file', clave=resultado.get('clave'))
+        respuesta['resultado'] = dict(resultado, download_url=download_url)
+    return respuesta
+
+@app.route('/api/jobs/<job_id>')
+@login_required
+def api_job(job_id):
+    """Estado, progreso y ubicación del resultado de un trabajo"""
+    estado = jobs.obtener(job_id)
+    if estado is None or (estado['user_id'] != session.get('user_id') and session.get('rol') != 'admin'):
+        return jsonify({'success': False, 'error': 'Trabajo no encontrado'}), 404
+    return jsonify(dict(_job_publico(estado), success=True))
+
+@app.route('/api/jobs')
+@login_required
+def api_jobs():
+    """Trabajos recientes del usuario"""
+    trabajos = jobs.listar(user_id=session.get('user_id'))
+    return jsonify({'success': True, 'jobs': [_job_publico(t) for t in trabajos]})
+
+@app.route('/api/admin/etapas')
+@admin_required
+def api_etapas():
+    """Tiempo, filas y memoria por etapa de los scripts, agregados por tipo de procesamiento"""
+    return jsonify({'success': True, 'tipos': jobs.resumen_etapas()})
+
 # API para archivos recientes (desde cache)
 @app.route('/api/recent-files')
 @login_required
 def api_recent_files():
     try:
         user_id = session.get('user_id')
-        cached_file = get_from_cache(user_id)
-        
-        archivos = []
-        if cached_file:
-            archivos.append({
-                'nombre': cached_file['filename'],
-                'tamano': len(cached_file['data']),
-                'fecha': cached_file['timestamp'].timestamp()
-            })
+        archivos = [
+            {
+                'nombre': entrada['filename'],
+                'tamano': entrada['size'],
+                'fecha': entrada['timestamp'].timestamp(),
+                'download_url': url_for('download_file', clave=entrada['clave'])
+            }
+            for entrada in cache.listar_usuario(user_id)
+        ]
         
         return jsonify({'success': True, 'archivos': archivos})
     except Exception as e:
@@ -453,44 +533,74 @@ def api_recent_files():
 @app.route('/download/')
 @login_required
 def download_file():
-    """Descarga el archivo transformado del cache del usuario"""
+    """Descarga un archivo transformado del cache del usuario (el más reciente si no se indica clave)"""
     try:
         user_id = session.get('user_id')
-        cached_file = get_from_cache(user_id)
+        cached_file = cache.get_from_cache(user_id, request.args.get('clave'))
         
         if not cached_file:
             return jsonify({'success': False, 'error': 'No hay archivo disponible para descargar'}), 404
         
-        # Crear respuesta con el archivo en memoria
+        filename = cached_file['filename']
+        
+        if lectura.es_parquet(filename):
+            mimetype = 'application/vnd.apache.parquet'
+        elif lotes.es_zip(filename):
+            mimetype = 'application/zip'
+        else:
+            mimetype = 'text/csv'
+        
+        # Los resultados Parquet se pueden descargar como CSV convirtiéndolos al vuelo
+        if lectura.es_parquet(filename) and request.args.get('formato') == 'csv':
+            return Response(
+                escritura.iterar_csv(cached_file['path']),
+                mimetype='text/csv',
+                headers={'Content-Disposition': content_disposition(escritura.nombre_salida(filename, "csv"))}
+            )
+        
+        # Con nginx montando CACHE_DIR, nginx envía el archivo con sendfile y atiende Range
+        x_accel_prefix = app.config['CACHE_X_ACCEL_PREFIX']
+        if x_accel_prefix:
+            response = Response(mimetype=mimetype)
+            ruta_relativa = os.path.relpath(cached_file['path'], cache.CACHE_DIR)
+            response.headers['X-Accel-Redirect'] = f"{x_accel_prefix.rstrip('/')}/{ruta_relativa}"
+            response.headers['Content-Disposition'] = content_disposition(filename)
+            return response
+        
+        # Servir directo desde disco (sin cargarlo en memoria) con soporte de Range/reanudación
         return send_file(
-            io.BytesIO(cached_file['data']),
-            mimetype='text/csv',
+            cached_file['path'],
+            mimetype=mimetype,
             as_attachment=True,
-            download_name=cached_file['filename']
+            download_name=filename,
+            conditional=True,
+            max_age=0
         )
     except Exception as e:
         return jsonify({'success': False, 'error': f'Error al descargar: {str(e)}'}), 500
 
-# Rutas de transformación simplificadas
-@app.route('/transform/clientes', methods=['POST'])
-@login_required
-def transform_clientes():
-    return procesar_archivo('clientes')
-
-@app.route('/transform/ventas', methods=['POST'])
+@app.route('/download/ventas-acumuladas')
 @login_required
-def transform_ventas():
-    return procesar_archivo('venta_material')
-
-@app.route('/transform/union', methods=['POST'])
-@login_required
-def transform_union():
-    return procesar_archivo('union_ventas')
-
-@app.route('/transform/exhibidores', methods=['POST'])
+def download_ventas_acumuladas():
+    """Descarga el acumulado de ventas concatenando las particiones mensuales en orden"""
+    carpeta = app.config['VENTAS_ACUM_FOLDER']
+    if almacen_ventas.almacen_vacio(carpeta):
+        return jsonify({'success': False, 'error': 'No hay ventas acumuladas disponibles'}), 404
+    
+    return Response(
+        almacen_ventas.iterar_bytes(carpeta),
+        mimetype='text/csv',
+        headers={'Content-Disposition': content_disposition('ventas_acum.csv')}
+    )
+
+# Rutas de transformación simplificadas (alias de cada transformación registrada)
+@app.route('/transform/<ruta>', methods=['POST'])
 @login_required
-def transform_exhibidores():
-    return procesar_archivo('exhibidores')
+def transform(ruta):
+    transformacion = procesamiento.por_ruta(ruta)
+    if transformacion is None:
+        return jsonify({'success': False, 'error': f'Transformación "{ruta}" no reconocida'}), 404
+    return procesar_archivo(transformacion.nombre)
 
 # RUTAS DE CARGA A POSTGRESQL (SOLO ADMIN)
 @app.route('/carga-datos')
@@ -512,41 +622,23 @@ def analizar_archivo():
         if file.filename == '':
             return jsonify({'success': False, 'error': 'Nombre de archivo vacío'}), 400
         
-        # Leer archivo (Excel o CSV) - solo primeras 5 filas para análisis
-        if file.filename.endswith('.csv'):
-            # Intentar múltiples encodings para CSVs
-            for encoding in ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']:
-                try:
-                    file.seek(0)
-                    df = pd.read_csv(file, nrows=5, encoding=encoding)
-                    print(f"[INFO] CSV leído con encoding: {encoding}")
-                    break
-                except (UnicodeDecodeError, UnicodeError):
-                    continue
-            else:
-                return jsonify({
-                    'detectado': False,
-                    'mensaje': 'No se pudo leer el archivo CSV. Verifique el encoding.',
-                    'columnas': [],
-                    'flujos_disponibles': {}
-                }), 400
-        elif file.filename.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(file, nrows=5)
-        else:
+        if not file.filename.endswith(('.csv', '.xlsx', '.xls')):
             return jsonify({'success': False, 'error': 'Formato no soportado. Use CSV o XLSX'}), 400
         
-        # Detectar flujo basado en columnas
-        columnas = df.columns.tolist()
-        flujo_id, flujo_config = detectar_flujo(columnas)
-        
-        # Limpiar DataFrame de memoria
-        del df
+        # Solo el encabezado: primera línea del CSV o primeras filas de la hoja
+        columnas = lectura.leer_encabezado(file.stream, nombre=file.filename)
+        analisis = analizar_columnas(columnas)
+        flujo_id = analisis['flujo_id']
         
         if not flujo_id:
             return jsonify({
                 'detectado': False,
                 'mensaje': 'No se pudo identificar el tipo de archivo automáticamente',
                 'columnas': columnas,
+                # Flujo más cercano y columnas del archivo que podrían ser sus faltantes
+                'candidato': analisis['candidato'],
+                'faltantes': analisis['faltantes'],
+                'sugerencias': analisis['sugerencias'],
                 'flujos_disponibles': {
                     nombre: {
                         'nombre': config['nombre'],
@@ -557,9 +649,11 @@ def analizar_archivo():
                 }
             })
         
+        flujo_config = FLUJOS_N8N[flujo_id]
         return jsonify({
             'detectado': True,
             'flujo_id': flujo_id,
+            'confianza': analisis['confianza'],
             'flujo_nombre': flujo_config['nombre'],
             'flujo_descripcion': flujo_config['descripcion'],
             'columnas_encontradas': columnas,
@@ -591,6 +685,7 @@ def enviar_a_n8n():
     """Envía los datos del archivo al webhook de n8n correspondiente"""
     print(f"[INFO] ===== INICIO enviar-a-n8n =====")
     file = None
+    temp_dir = None
     try:
         if 'file' not in request.files:
             return jsonify({'success': False, 'error': 'No se proporcionó archivo'}), 400
@@ -610,47 +705,44 @@ def enviar_a_n8n():
                 'error': 'Webhook no configurado para este flujo'
             }), 500
         
-        # Resetear puntero del archivo para leerlo completo
-        file.seek(0)
-        file_content = file.read()
+        # Guardar a disco para enviarlo por bloques (y reanudar partes si falla)
+        temp_dir = tempfile.mkdtemp()
+        temp_file = os.path.join(temp_dir, secure_filename(file.filename) or 'archivo')
+        hash_contenido = subidas.mover_subida(file, temp_file)
         
-        print(f"[INFO] Enviando archivo {file.filename} ({len(file_content)} bytes) a {config_flujo['nombre']}")
         print(f"[INFO] Webhook: {webhook_url}")
         
-        # Enviar archivo como multipart/form-data con binary + metadata
-        files = {
-            'data': (file.filename, file_content, 'application/octet-stream')
-        }
-        data = {
-            'archivo': file.filename,
-            'usuario': session.get('usuario'),
-            'tipo_flujo': flujo
-        }
-        
-        response = requests.post(
-            webhook_url,
-            files=files,
-            data=data,
-            timeout=900  # 15 minutos timeout para archivos grandes
-        )
+        resultado = n8n_cliente.enviar_archivo(flujo, config_flujo, temp_file, file.filename, session.get('usuario'),
+                                               hash_contenido=hash_contenido)
+        response = resultado['response']
         
-        print(f"[INFO] Respuesta n8n - Status: {response.status_code}, Content-Type: {response.headers.get('content-type')}")
-        
-        # Verificar si la respuesta es JSON
-        try:
-            response_data = response.json()
-            print(f"[INFO] JSON recibido de n8n: {response_data}")
-        except ValueError:
-            # Si no es JSON, probablemente es HTML o texto
-            print(f"[WARNING] Respuesta no-JSON de n8n: {response.text[:500]}")
-            response_data = {}
-        
-        if response.status_code == 200:
+        if response is not None:
+            print(f"[INFO] Respuesta n8n - Status: {response.status_code}, Content-Type: {response.headers.get('content-type')}")
+            
+            # Verificar si la respuesta es JSON
+            try:
+                response_data = response.json()
+                print(f"[INFO] JSON recibido de n8n: {response_data}")
+            except ValueError:
+                # Si no es JSON, probablemente es HTML o texto
+                print(f"[WARNING] Respuesta no-JSON de n8n: {response.text[:500]}")
+                response_data = {}
+        
+        if resultado['exito']:
             return jsonify({
                 'success': True,
                 'message': f'Archivo enviado correctamente a {config_flujo["nombre"]}. Procesamiento en curso.',
-                'flujo': flujo
+                'flujo': flujo,
+                'partes': resultado['total_partes']
             })
+        elif resultado['total_partes'] > 1:
+            print(f"[ERROR] Respuesta n8n: {response.status_code} - {response.text}")
+            return jsonify({
+                'success': False,
+                'error': (f'Error al procesar en n8n (código {response.status_code}). '
+                          f'Se aceptaron {resultado["aceptadas"]} de {resultado["total_partes"]} partes; '
+                          f'reenvíe el mismo archivo para continuar desde la parte pendiente.')
+            }), 500
         else:
             print(f"[ERROR] Respuesta n8n: {response.status_code} - {response.text}")
             return jsonify({
@@ -675,12 +767,21 @@ def enviar_a_n8n():
         traceback.print_exc()
         return jsonify({'success': False, 'error': 'Error inesperado al procesar el archivo. Contacte al administrador.'}), 500
     finally:
-        # Limpiar archivo de memoria
+        # Limpiar archivo de memoria y temporal en disco
         if file:
             try:
                 file.close()
             except:
                 pass
+        if temp_dir:
+            import shutil
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+@app.route('/api/n8n/metricas')
+@admin_required
+def api_n8n_metricas():
+    """Latencia, errores y bytes enviados a cada webhook de n8n (todos los workers)"""
+    return jsonify({'success': True, 'metricas': metricas.resumen_n8n()})
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,13 @@
+"""
+Benchmarks de los scripts de transformación
+
+Genera exportaciones sintéticas (con semilla fija) con las columnas que espera
+cada script y mide tiempo, memoria máxima y tamaño de salida de su ejecutar().
+Desde la carpeta backend:
+
+    python -m benchmarks.ejecutar --tamanos 10k,1m
+    python -m benchmarks.ejecutar --scripts venta_material --tamanos 10m
+
+Los datos generados se reutilizan desde benchmarks/datos y los resultados se
+guardan como JSON en benchmarks/resultados/<commit>.json para comparar commits.
+"""
@@ -0,0 +1,253 @@
+"""
+Ejecuta los benchmarks y guarda los resultados en JSON.
+
+Cada caso (script + tamaño) corre en un proceso nuevo, así la memoria máxima
+medida (ru_maxrss) corresponde solo a ese caso.
+
+Cada resultado incluye datos_mb: la memoria de los DataFrames al leer y al
+escribir. Con --plan-tipos ambos cada caso se mide con y sin el plan de tipos
+de los scripts (scripts/tipos.py) para comparar la memoria antes y después.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+from datetime import datetime
+
+from benchmarks import generadores
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATOS_DIR = os.path.join(BACKEND_DIR, 'benchmarks', 'datos')
+RESULTADOS_DIR = os.path.join(BACKEND_DIR, 'benchmarks', 'resultados')
+
+TAMANOS = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+SEMILLA = 20240601
+MES = 5
+MESES_ACUMULADO = range(1, 13)
+TIMEOUT_CASO = 3600  # mismo timeout que gunicorn
+# --plan-tipos: con qué configuraciones se mide cada caso
+PLAN_TIPOS = {'si': (True,), 'no': (False,), 'ambos': (False, True)}
+
+
+def _datos(nombre, filas, generar):
+    """Ruta del archivo generado, creándolo la primera vez"""
+    os.makedirs(DATOS_DIR, exist_ok=True)
+    ruta = os.path.join(DATOS_DIR, nombre.format(filas=filas, semilla=SEMILLA))
+    if not os.path.exists(ruta):
+        inicio = time.perf_counter()
+        print(f"[INFO] Generando {os.path.basename(ruta)}...")
+        generar(ruta)
+        print(f"[INFO] {os.path.basename(ruta)} generado en {time.perf_counter() - inicio:.1f}s "
+              f"({os.path.getsize(ruta) / 1024 / 1024:.1f} MB)")
+    return ruta
+
+
+def preparar_venta_material(filas):
+    return {'archivo_entrada': _datos('venta_material_{filas}_{semilla}.csv', filas,
+                                      lambda r: generadores.generar_venta_material(r, filas, SEMILLA))}
+
+
+def preparar_clientes(filas):
+    return {'archivo_entrada': _datos('clientes_{filas}_{semilla}.csv', filas,
+                                      lambda r: generadores.generar_clientes(r, filas, SEMILLA))}
+
+
+def preparar_exhibidores(filas):
+    return {'archivo_entrada': _datos('exhibidores_{filas}_{semilla}.csv', filas,
+                                      lambda r: generadores.generar_exhibidores(r, filas, SEMILLA))}
+
+
+def preparar_unir_ventas(filas):
+    # Acumulado de 12 meses con 'filas' filas + un mes de ~1/12 de ese tamaño
+    return {
+        'archivo_acum': _datos('ventas_acum_{filas}_{semilla}.csv', filas,
+                               lambda r: generadores.generar_ventas(r, filas, MESES_ACUMULADO, SEMILLA)),
+        'archivo_mes': _datos('ventas_mes_{filas}_{semilla}.csv', max(filas // 12, 1),
+                              lambda r: generadores.generar_ventas(r, max(filas // 12, 1), [MES], SEMILLA + 1)),
+    }
+
+
+def ejecutar_caso(script, archivos, carpeta_salida):
+    """Corre el ejecutar() del script (en el proceso hijo)"""
+    if script == 'venta_material':
+        from scripts import venta_material
+        venta_material.ejecutar(archivos['archivo_entrada'], str(MES), carpeta_salida)
+    elif script == 'clientes':
+        from scripts import clientes
+        clientes.ejecutar(archivos['archivo_entrada'], carpeta_salida)
+    elif script == 'exhibidores':
+        from scripts import exhibidores
+        exhibidores.ejecutar(archivos['archivo_entrada'], carpeta_salida)
+    elif script == 'unir_ventas':
+        from scripts import unir_ventas
+        unir_ventas.ejecutar(archivos['archivo_acum'], archivos['archivo_mes'], carpeta_salida)
+    elif script == 'unir_ventas_incremental':
+        from scripts import unir_ventas
+        unir_ventas.ejecutar_incremental(archivos['archivo_mes'], os.path.join(carpeta_salida, 'almacen'),
+                                         archivo_acum=archivos['archivo_acum'])
+    else:
+        raise ValueError(f"Script desconocido: {script}")
+
+
+SCRIPTS = {
+    'venta_material': preparar_venta_material,
+    'clientes': preparar_clientes,
+    'exhibidores': preparar_exhibidores,
+    'unir_ventas': preparar_unir_ventas,
+    'unir_ventas_incremental': preparar_unir_ventas,
+}
+
+
+def _tamano_carpeta(carpeta):
+    return sum(
+        os.path.getsize(os.path.join(raiz, nombre))
+        for raiz, _, nombres in os.walk(carpeta) for nombre in nombres
+    )
+
+
+def _medir_en_proceso(script, archivos, ruta_resultado, plan_tipos=True):
+    """Punto de entrada del proceso hijo: mide un caso y escribe el resultado en JSON"""
+    # Importar pandas antes de medir, para separar su memoria de la del script
+    import pandas  # noqa: F401
+    from scripts import instrumentacion, tipos
+    tipos.ACTIVO = plan_tipos
+    rss_base = instrumentacion.memoria_mb()
+
+    carpeta_salida = tempfile.mkdtemp(prefix=f'bench_{script}_')
+    error = None
+    instrumentacion.iniciar(datos=True)
+    inicio = time.perf_counter()
+    try:
+        ejecutar_caso(script, archivos, carpeta_salida)
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+    segundos = time.perf_counter() - inicio
+    medicion = instrumentacion.finalizar()
+
+    bytes_salida = _tamano_carpeta(carpeta_salida)
+    shutil.rmtree(carpeta_salida, ignore_errors=True)
+    if error is None and bytes_salida == 0:
+        # Los scripts informan sus errores con print y no generan salida
+        error = 'El script no generó archivo de salida'
+
+    with open(ruta_resultado, 'w') as f:
+        json.dump({
+            'segundos': round(segundos, 3),
+            'rss_base_mb': round(rss_base, 1),
+            'rss_max_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            'bytes_salida': bytes_salida,
+            'error': error,
+            'plan_tipos': plan_tipos,
+            'datos_mb': medicion['datos_mb'],
+            'etapas': medicion['etapas'],
+        }, f)
+
+
+def medir(script, tamano, verbose=False, plan_tipos=True):
+    """Genera los datos si hace falta y mide el caso en un proceso nuevo"""
+    filas = TAMANOS[tamano]
+    archivos = SCRIPTS[script](filas)
+
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+        ruta_resultado = f.name
+    try:
+        comando = [sys.executable, '-m', 'benchmarks.ejecutar', '--caso', script, json.dumps(archivos), ruta_resultado]
+        if not plan_tipos:
+            comando.append('--sin-plan-tipos')
+        proceso = subprocess.run(comando, cwd=BACKEND_DIR, timeout=TIMEOUT_CASO,
+                                 stdout=None if verbose else subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        try:
+            with open(ruta_resultado) as f:
+                resultado = json.load(f)
+        except ValueError:
+            resultado = {'error': f'El proceso terminó con código {proceso.returncode}: {proceso.stderr[-500:]}'}
+    except subprocess.TimeoutExpired:
+        resultado = {'error': f'Superó {TIMEOUT_CASO}s'}
+    finally:
+        os.remove(ruta_resultado)
+
+    resultado.update({
+        'script': script,
+        'tamano': tamano,
+        'filas': filas,
+        'plan_tipos': plan_tipos,
+        'bytes_entrada': sum(os.path.getsize(r) for r in archivos.values()),
+    })
+    return resultado
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconocido'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks de los scripts de transformación')
+    parser.add_argument('--scripts', default=','.join(SCRIPTS), help='scripts separados por coma')
+    parser.add_argument('--tamanos', default='10k', help=f"tamaños separados por coma ({', '.join(TAMANOS)})")
+    parser.add_argument('--salida', help='archivo JSON de resultados (por defecto resultados/<commit>.json)')
+    parser.add_argument('--verbose', action='store_true', help='muestra la salida de los scripts')
+    parser.add_argument('--plan-tipos', choices=PLAN_TIPOS, default='si',
+                        help='mide con el plan de tipos de los scripts, sin él o ambos (para comparar memoria)')
+    parser.add_argument('--caso', nargs=3, help=argparse.SUPPRESS)
+    parser.add_argument('--sin-plan-tipos', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.caso:
+        script, archivos, ruta_resultado = args.caso
+        _medir_en_proceso(script, json.loads(archivos), ruta_resultado, plan_tipos=not args.sin_plan_tipos)
+        return
+
+    scripts = [s.strip() for s in args.scripts.split(',') if s.strip()]
+    tamanos = [t.strip().lower() for t in args.tamanos.split(',') if t.strip()]
+    for nombre in scripts:
+        if nombre not in SCRIPTS:
+            parser.error(f"Script desconocido: {nombre}. Opciones: {', '.join(SCRIPTS)}")
+    for tamano in tamanos:
+        if tamano not in TAMANOS:
+            parser.error(f"Tamaño desconocido: {tamano}. Opciones: {', '.join(TAMANOS)}")
+
+    commit = _commit_actual()
+    resultados = []
+    for tamano in tamanos:
+        for script in scripts:
+            for plan_tipos in PLAN_TIPOS[args.plan_tipos]:
+                resultado = medir(script, tamano, args.verbose, plan_tipos)
+                resultados.append(resultado)
+                caso = f"{script} {tamano}" + ('' if plan_tipos else ' (sin plan de tipos)')
+                if resultado.get('error'):
+                    print(f"❌ {caso}: {resultado['error']}")
+                else:
+                    datos = ', '.join(f"{punto} {megas:.1f}" for punto, megas in resultado['datos_mb'].items())
+                    print(f"✅ {caso}: {resultado['segundos']:.2f}s, "
+                          f"RSS máx {resultado['rss_max_mb']:.0f} MB, "
+                          f"datos MB ({datos}), "
+                          f"salida {resultado['bytes_salida'] / 1024 / 1024:.1f} MB")
+
+    informe = {
+        'commit': commit,
+        'fecha': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'semilla': SEMILLA,
+        'resultados': resultados,
+    }
+    ruta_salida = args.salida or os.path.join(RESULTADOS_DIR, f'{commit}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(ruta_salida)), exist_ok=True)
+    with open(ruta_salida, 'w') as f:
+        json.dump(informe, f, indent=2, ensure_ascii=False)
+    print(f"📁 Resultados guardados en: {ruta_salida}")
+
+
+if __name__ == '__main__':
+    main()
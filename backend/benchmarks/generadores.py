@@ -0,0 +1,215 @@
+"""
+Generadores de exportaciones sintéticas para los benchmarks.
+
+Cada generador escribe por bloques (memoria constante aunque sean 10M de
+filas) y usa una semilla fija: la misma semilla y número de filas producen
+el mismo archivo byte a byte. Los valores incluyen tildes, los textos que
+corrigen los REEMPLAZOS de cada script y las filas que los scripts filtran.
+"""
+import os
+import numpy as np
+import pandas as pd
+
+FILAS_POR_BLOQUE = 250000
+
+# Valores compartidos --------------------------------------------------------
+
+CIUDADES = ['01-MONTERIA', '02-CERETÉ', '03-SAHAGÚN', '04-LORICA', '05-PLANETA RICA',
+            '06-MOÑITOS', '07-CIÉNAGA DE ORO', '08-TIERRALTA', '09-MONTELÍBANO', '10-CHINÚ']
+SEGMENTOS = ['Reposición', 'AU Multimisión', 'Servicios de Alimentación', 'Centros de diversión',
+             'Tienda', 'Minimercado', 'Droguería']
+CATEGORIAS = ['10-Café', '51-Té e infusiones', '61-Equipos Preparación', '06-Champiñones',
+              '09-Bebidas dechocolate', '01-Galletas', '02-Pastas', '03-Carnes frías']
+MARCAS = ['026-Colcafé', '001-Zenú', '351-Genérico otros distibuidos', '373-Bénet', '113-Drácula',
+          '096-Setas de Cuivá', '010-Noel', '020-Doria', '030-Jet', '040-Tosh']
+SUBMARCAS = ['01-Colcafé', '01-Zenú', '02-Zenú', '01-Genérico otros distibuidos', '01-Bénet',
+             '10-Lechey calcio', '04-Lechecon almendras', '12-Quesoy Mantequilla', '08-Gool',
+             '01-Drácula', '02-Clásica', '03-Premium']
+NEGOCIOS = ['01-Cárnicos', '04-Café', '23-Nutrición Experta', '02-Galletas', '05-Chocolates', '06-Pastas']
+LINEAS = ['0094-Sólidas', '0041-Azúcar', '0058-Café Molido', '0103-Pasta Clásica', '0200-Atún',
+          '0194-Maíz LV', '0029-Otros LV Cárnicos', '0090-Cremas dechocolate', '0521-Cápsulas', '0010-Saltinas']
+SUBLINEAS = ['0161-Sólidas sin agregados', '0160-Sólidas con agregados', '0171-Grageadoscrocantes',
+             '0173-Clásica', '0296-Maíz LV', '0151-Bombones sólidos', '0420-Azúcar',
+             '0152-Cremas deChocolate', '0141-Estuches de Línea', '0688-Cápsulas', '0011-Saltinas']
+SUBCATEGORIAS = ['026-Instantáneo', '027-Mezclas Instantáneas', '056-OtrosDistribuidos',
+                 '277-Cápsulas Nutricional', '001-Galletas saladas', '002-Galletas dulces']
+NOMBRES = ['JOSÉ', 'MARÍA', 'ANDRÉS', 'LUZ', 'JUAN', 'ÁNGELA', 'RAÚL', 'INÉS', 'CAMILO', 'NOHEMÍ']
+APELLIDOS = ['PÉREZ', 'GÓMEZ', 'MUÑOZ', 'DÍAZ', 'HERNÁNDEZ', 'RAMÍREZ', 'LÓPEZ', 'NÚÑEZ']
+BARRIOS = ['CENTRO', 'LA GRANJA', 'MOGAMBO', 'EL CAMPANO', 'SANTA FÉ', 'LOS ÁLAMOS', 'P-5', 'CANTACLARO']
+PRODUCTOS = ['CAFÉ SELLO ROJO 500G', 'SALCHICHA ZENÚ 230G', 'GALLETA SALTÍN NOEL', 'CHOCOLATE CORONA 250G',
+             'ATÚN VAN CAMPS 160G', 'PASTA DORIA 250G', 'JET CHOCOLATINA 12G', 'TOSH GALLETA MIEL']
+
+
+def _mezclar(rng, valores, n):
+    return rng.choice(np.array(valores, dtype=object), n)
+
+
+def _nombres(rng, n):
+    return _mezclar(rng, NOMBRES, n) + ' ' + _mezclar(rng, APELLIDOS, n)
+
+
+def _vendedores(rng, n, total=80):
+    """Códigos y nombres de asesores, incluidos los que tienen '-' en el nombre y SERVICIOS"""
+    asesores = [f'{100 + i}-{NOMBRES[i % len(NOMBRES)]} {APELLIDOS[i % len(APELLIDOS)]}' for i in range(total)]
+    asesores += ['99 - SERVICIOS', '180-ANA-MARÍA PÉREZ']
+    return _mezclar(rng, asesores, n)
+
+
+def _escribir_por_bloques(ruta, filas, semilla, generar_bloque, **to_csv):
+    """Escribe generar_bloque(rng, inicio, n) en bloques de FILAS_POR_BLOQUE filas"""
+    rng = np.random.default_rng(semilla)
+    temporal = f'{ruta}.tmp'
+    escritas = 0
+    while True:
+        n = min(FILAS_POR_BLOQUE, filas - escritas)
+        df = generar_bloque(rng, escritas, n)
+        df.to_csv(temporal, index=False, mode='w' if escritas == 0 else 'a', header=(escritas == 0), **to_csv)
+        escritas += n
+        if escritas >= filas:
+            break
+    os.replace(temporal, ruta)
+    return ruta
+
+
+# Venta x Material x Cliente (venta_material) --------------------------------
+
+def _bloque_venta_material(rng, inicio, n):
+    pedida = rng.integers(0, 60, n)
+    devuelta = np.minimum(rng.integers(0, 4, n), pedida)
+    neta = pedida - devuelta
+    venta = (neta * rng.uniform(800, 25000, n)).round(2)
+    return pd.DataFrame({
+        'Cliente': rng.integers(1, 60000, n).astype(str),
+        'Nombre': _nombres(rng, n),
+        'Razon Soc': 'TIENDA ' + _mezclar(rng, APELLIDOS, n),
+        'Documento': np.char.add('00', rng.integers(1000000, 99999999, n).astype(str)),
+        'Barrio': _mezclar(rng, BARRIOS, n),
+        'Nombre Segmento': _mezclar(rng, SEGMENTOS, n),
+        'Producto': rng.integers(1000, 1400, n),
+        'Nombre.1': _mezclar(rng, PRODUCTOS, n),
+        'Cant. Ped.': pedida,
+        'Cant. Dev.': devuelta,
+        'Cant. Neta': neta,
+        'IVA': (venta * 0.19).round(2),
+        'Vta. - IVA': venta,
+        'Marca': _mezclar(rng, MARCAS, n),
+        'SubMarca': _mezclar(rng, SUBMARCAS, n),
+        'Linea': _mezclar(rng, LINEAS, n),
+        'SubLinea': _mezclar(rng, SUBLINEAS, n),
+        'Categoria': _mezclar(rng, CATEGORIAS, n),
+        'Sub Categoria': _mezclar(rng, SUBCATEGORIAS, n),
+        'Negocio': _mezclar(rng, NEGOCIOS, n),
+        'Vendedor': _vendedores(rng, n),
+        'Ciudad': _mezclar(rng, CIUDADES, n),
+    })
+
+
+def generar_venta_material(ruta, filas, semilla=0):
+    """Exportación del informe Venta x Material x Cliente (CSV latin-1)"""
+    return _escribir_por_bloques(ruta, filas, semilla, _bloque_venta_material, encoding='latin-1')
+
+
+# Ventas mensuales y acumuladas (unir_ventas) ---------------------------------
+
+def _bloque_ventas(meses):
+    def generar(rng, inicio, n):
+        df = _bloque_venta_material(rng, inicio, n).rename(columns={
+            'Razon Soc': 'Razon Social', 'Cant. Ped.': 'Cant. pedida', 'Cant. Dev.': 'Cant. devuelta',
+            'Cant. Neta': 'Cantidad neta', 'Vta. - IVA': 'Venta - IVA', 'SubMarca': 'Sub marca',
+            'SubLinea': 'Sub linea', 'Sub Categoria': 'Sub categoria'
+        })
+        # Mismas columnas que la salida de venta_material; el acumulado viene ordenado por mes
+        mes = np.sort(rng.choice(np.array(meses), n)) if len(meses) > 1 else meses[0]
+        df.insert(1, 'Mes', mes)
+        codigos = df.pop('Vendedor').str.split('-', n=1, expand=True)
+        df['Ciudad'] = df['Ciudad'].str.split('-', n=1).str[1]
+        df['Cod. Asesor'] = codigos[0]
+        df['Asesor'] = codigos[1]
+        df['Venta - IVA'] = df['Venta - IVA'].astype(int)
+        return df
+    return generar
+
+
+def generar_ventas(ruta, filas, meses, semilla=0):
+    """Ventas con la estructura de la salida de venta_material (CSV utf-8)"""
+    return _escribir_por_bloques(ruta, filas, semilla, _bloque_ventas(list(meses)), encoding='utf-8')
+
+
+# Maestra de clientes (clientes) ----------------------------------------------
+
+def _bloque_clientes(rng, inicio, n):
+    ciudades = np.array([c.split('-', 1)[1] for c in CIUDADES] + ['MOQITOS'], dtype=object)
+    segmentos = SEGMENTOS + ['Reposicisn', 'AU Multimisisn', 'Servicios de Alimentacisn', 'Centros de diversisn']
+    fechas = pd.Timestamp('2015-01-01') + pd.to_timedelta(rng.integers(0, 3650, n), unit='D')
+    lat = rng.uniform(7.5, 9.5, n).round(6)
+    lon = rng.uniform(-76.5, -75.0, n).round(6)
+    return pd.DataFrame({
+        'Codigo Ecom': np.char.add('0', (inicio + np.arange(n)).astype(str)),
+        'Sucursal': rng.integers(1, 4, n),
+        'Documento': rng.integers(1000000, 99999999, n).astype(str),
+        'Ra. Social': 'TIENDA ' + _mezclar(rng, APELLIDOS, n),
+        'Nombre Neg': 'NEGOCIO ' + _mezclar(rng, NOMBRES, n),
+        'Dpto': 'CÓRDOBA',
+        'Ciudad': rng.choice(ciudades, n),
+        'Barrio': _mezclar(rng, BARRIOS, n),
+        'Segmento': _mezclar(rng, segmentos, n),
+        'Fecha': fechas.strftime('%Y-%m-%d'),
+        'Coordenada Y': lat,
+        'Coordenada X': lon,
+        'Exhibidor': rng.choice(np.array(['SI', 'NO', ''], dtype=object), n),
+        'Cod.Asesor': rng.integers(100, 180, n),
+        'Asesor': _nombres(rng, n),
+        'Coordenadas Gis': lat.astype(str).astype(object) + ',' + lon.astype(str).astype(object),
+        'Socios Nutresa': rng.choice(np.array(['S', 'N'], dtype=object), n),
+    })
+
+
+def generar_clientes(ruta, filas, semilla=0):
+    """
+    Maestra de clientes. Se genera en CSV (utf-8, que es como la lee el
+    script): xlsx no admite más de 1.048.576 filas.
+    """
+    return _escribir_por_bloques(ruta, filas, semilla, _bloque_clientes, encoding='utf-8')
+
+
+# Exhibidores (exhibidores) ---------------------------------------------------
+
+TIPOS_EXHIBIDOR = [
+    '40089141-MUEBLE SNACKERO PISO GRANDE CON NEVERA',
+    '40089142-MUEBLE SNACKERO PISO CON NEVERA',
+    '40089999-MUEBLE SNACKERO ABARROTERO MOSTRADOR',
+    '40089100-NEVERA VERTICAL UNA PUERTA',
+    '40089101-NEVERA HORIZONTAL',
+    '40089200-MUEBLE SNACKERO METÁLICO',
+]
+
+
+def _bloque_exhibidores(rng, inicio, n):
+    cliente = rng.integers(1, 60000, n).astype(str).astype(object)
+    # Parte de los códigos vienen exportados como decimales ('123.0')
+    cliente = np.where(rng.random(n) < 0.3, cliente + '.0', cliente)
+    comodato = rng.integers(10000, 99999, n).astype(str).astype(object)
+    comodato = np.where(rng.random(n) < 0.2, comodato + ';', comodato)
+    df = pd.DataFrame({
+        # ~2% de números repetidos para drop_duplicates
+        'Numero': (inicio + np.arange(n) - (rng.random(n) < 0.02)).astype(str),
+        'Placa': np.char.add('PL', rng.integers(100000, 999999, n).astype(str)),
+        'Tipo': _mezclar(rng, TIPOS_EXHIBIDOR, n),
+        'Estado': rng.choice(np.array(['A', 'A', 'A', 'I'], dtype=object), n),
+        'Cod. Cliente': cliente,
+        'Cliente': 'TIENDA ' + _mezclar(rng, APELLIDOS, n),
+        'Direccion': 'CALLE ' + rng.integers(1, 80, n).astype(str).astype(object) + ' # ' + rng.integers(1, 60, n).astype(str).astype(object),
+        'Ciudad': _mezclar(rng, CIUDADES, n),
+        'Num. Comodato': comodato,
+        'Fecha Comodato': (pd.Timestamp('2018-01-01') + pd.to_timedelta(rng.integers(0, 2500, n), unit='D')).strftime('%d/%m/%Y'),
+        'Valor': rng.integers(500000, 4000000, n),
+        'Observacion': _mezclar(rng, ['', 'EN BUEN ESTADO', 'REQUIERE MANTENIMIENTO', 'REUBICACIÓN'], n),
+    })
+    # El export termina cada línea en '|', que pandas lee como 'Unnamed: 12'
+    df[''] = ''
+    return df
+
+
+def generar_exhibidores(ruta, filas, semilla=0):
+    """Base de exhibidores separada por '|' (latin-1)"""
+    return _escribir_por_bloques(ruta, filas, semilla, _bloque_exhibidores, sep='|', encoding='latin-1')
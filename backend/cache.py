@@ -0,0 +1,232 @@
+"""
+Cache de archivos procesados (filesystem-based para multi-worker)
+
+Cada resultado se guarda una sola vez bajo una clave de contenido: hash de los
+archivos subidos + tipo de transformación + parámetros. Así, volver a subir el
+mismo archivo devuelve el resultado sin rehacer el trabajo de pandas.
+
+- objetos/<clave>.<ext> + objetos/<clave>.json: resultado y su metadata
+- usuarios/user_<id>.json: últimos resultados de cada usuario
+- Presupuesto global de bytes (CACHE_MAX_BYTES) con desalojo LRU y TTL por entrada
+"""
+import os
+import json
+import time
+import fcntl
+import shutil
+import hashlib
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+
+from config import Config
+import metricas
+
+# CACHE_DIR puede apuntar a un volumen compartido con nginx para servir
+# las descargas con X-Accel-Redirect (ver CACHE_X_ACCEL_PREFIX en config.py)
+CACHE_DIR = os.environ.get('CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'convertidor_cache')
+OBJETOS_DIR = os.path.join(CACHE_DIR, 'objetos')
+USUARIOS_DIR = os.path.join(CACHE_DIR, 'usuarios')
+os.makedirs(OBJETOS_DIR, mode=0o755, exist_ok=True)
+os.makedirs(USUARIOS_DIR, mode=0o755, exist_ok=True)
+
+# Cambiar al modificar los scripts de forma que cambie su salida
+VERSION_CACHE = 1
+
+BLOQUE_HASH = 1024 * 1024
+
+
+@contextmanager
+def _bloqueo(nombre):
+    """Bloqueo exclusivo entre procesos (workers de gunicorn y pool de trabajos)"""
+    with open(os.path.join(CACHE_DIR, f'.{nombre}.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _escribir_json(ruta, datos):
+    temporal = f'{ruta}.{os.getpid()}.tmp'
+    with open(temporal, 'w') as f:
+        json.dump(datos, f)
+    os.replace(temporal, ruta)
+
+
+def _leer_json(ruta, defecto=None):
+    try:
+        with open(ruta, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return defecto
+
+
+def hash_archivo(ruta):
+    """SHA-256 del contenido del archivo, leído por bloques"""
+    sha = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(BLOQUE_HASH), b''):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+def calcular_clave(hashes, tipo, parametros):
+    """
+    Clave de contenido de un resultado
+
+    Args:
+        hashes: dict campo del formulario -> hash del archivo subido
+        tipo: tipo de transformación
+        parametros: dict de parámetros que afectan la salida (ej. mes, formato)
+    """
+    firma = json.dumps([VERSION_CACHE, tipo, hashes, parametros], sort_keys=True)
+    return hashlib.sha256(firma.encode()).hexdigest()
+
+
+def _ruta_meta(clave):
+    return os.path.join(OBJETOS_DIR, f'{clave}.json')
+
+
+def _ruta_usuario(user_id):
+    return os.path.join(USUARIOS_DIR, f'user_{user_id}.json')
+
+
+def _entrada(clave, tocar=False):
+    """Metadata de la entrada si existe y no expiró; tocar=True la marca como usada (LRU)"""
+    metadata = _leer_json(_ruta_meta(clave))
+    if metadata is None:
+        return None
+    ruta = os.path.join(OBJETOS_DIR, metadata['archivo'])
+    try:
+        stat = os.stat(ruta)
+    except FileNotFoundError:
+        return None
+    if time.time() - stat.st_mtime > Config.CACHE_TTL:
+        return None
+    if tocar:
+        # atime = último acceso (LRU), mtime = creación (TTL)
+        os.utime(ruta, (time.time(), stat.st_mtime))
+    return {
+        'clave': clave,
+        'filename': metadata['filename'],
+        'path': ruta,
+        'size': stat.st_size,
+        'timestamp': datetime.fromtimestamp(stat.st_mtime)
+    }
+
+
+def buscar(clave):
+    """Devuelve la entrada del cache para la clave o None"""
+    entrada = _entrada(clave, tocar=True)
+    metricas.CACHE_CONSULTAS.labels(operacion='procesar', resultado='hit' if entrada else 'miss').inc()
+    return entrada
+
+
+def registrar_usuario(user_id, clave, filename):
+    """Agrega la entrada a los resultados recientes del usuario"""
+    with _bloqueo(f'user_{user_id}'):
+        ruta = _ruta_usuario(user_id)
+        recientes = [r for r in _leer_json(ruta, []) if r['clave'] != clave]
+        recientes.insert(0, {'clave': clave, 'filename': filename, 'timestamp': datetime.now().isoformat()})
+        _escribir_json(ruta, recientes[:Config.CACHE_MAX_POR_USUARIO])
+
+
+def save_to_cache(user_id, filename, file_path, clave):
+    """
+    Guarda un archivo procesado en el cache bajo su clave de contenido. El
+    archivo se mueve (no se copia): file_path deja de existir.
+    """
+    size = os.path.getsize(file_path)
+
+    if size == 0:
+        print(f"[WARNING] Intentando guardar archivo vacío!")
+
+    archivo = f'{clave}{os.path.splitext(filename)[1]}'
+    cache_file_path = os.path.join(OBJETOS_DIR, archivo)
+
+    # Reemplazo atómico: una descarga en curso sigue leyendo el archivo anterior completo
+    try:
+        os.replace(file_path, cache_file_path)
+    except OSError:
+        # CACHE_DIR en otro volumen: se copia una vez a un temporal del mismo volumen
+        temp_file_path = f'{cache_file_path}.{os.getpid()}.tmp'
+        shutil.copyfile(file_path, temp_file_path)
+        os.replace(temp_file_path, cache_file_path)
+        os.remove(file_path)
+
+    _escribir_json(_ruta_meta(clave), {
+        'filename': filename,
+        'archivo': archivo,
+        'size': size,
+        'timestamp': datetime.now().isoformat()
+    })
+    registrar_usuario(user_id, clave, filename)
+
+    print(f"[INFO] Archivo guardado en cache: {filename} ({size} bytes, clave {clave[:12]})")
+    metricas.CACHE_BYTES.labels(operacion='guardado').inc(size)
+    desalojar()
+
+
+def get_from_cache(user_id, clave=None):
+    """
+    Obtiene la ubicación y metadata de un resultado del usuario (el más reciente
+    si no se indica clave). No lee el contenido: se sirve directo desde disco.
+    """
+    entrada = None
+    for reciente in _leer_json(_ruta_usuario(user_id), []):
+        if clave is None or reciente['clave'] == clave:
+            entrada = _entrada(reciente['clave'], tocar=True)
+            if entrada or clave is not None:
+                break
+
+    metricas.CACHE_CONSULTAS.labels(operacion='descargar', resultado='hit' if entrada else 'miss').inc()
+    if entrada:
+        metricas.CACHE_BYTES.labels(operacion='servido').inc(entrada['size'])
+    return entrada
+
+
+def listar_usuario(user_id):
+    """Resultados recientes del usuario que siguen en cache"""
+    entradas = []
+    for reciente in _leer_json(_ruta_usuario(user_id), []):
+        entrada = _entrada(reciente['clave'])
+        if entrada:
+            entradas.append(entrada)
+    return entradas
+
+
+def _eliminar(clave, ruta):
+    for r in (ruta, _ruta_meta(clave)):
+        try:
+            os.remove(r)
+        except FileNotFoundError:
+            pass
+
+
+def desalojar():
+    """Elimina entradas expiradas y, si se supera CACHE_MAX_BYTES, las menos usadas (LRU)"""
+    with _bloqueo('desalojo'):
+        ahora = time.time()
+        entradas = []
+        for nombre in os.listdir(OBJETOS_DIR):
+            if nombre.endswith('.json') or nombre.endswith('.tmp'):
+                continue
+            ruta = os.path.join(OBJETOS_DIR, nombre)
+            clave = os.path.splitext(nombre)[0]
+            try:
+                stat = os.stat(ruta)
+            except FileNotFoundError:
+                continue
+            if ahora - stat.st_mtime > Config.CACHE_TTL:
+                _eliminar(clave, ruta)
+                continue
+            entradas.append((stat.st_atime, stat.st_size, clave, ruta))
+
+        total = sum(size for _, size, _, _ in entradas)
+        for _, size, clave, ruta in sorted(entradas):
+            if total <= Config.CACHE_MAX_BYTES:
+                break
+            _eliminar(clave, ruta)
+            total -= size
+            print(f"[INFO] Cache: desalojada entrada {clave[:12]} ({size} bytes)")
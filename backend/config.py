@@ -21,14 +21,70 @@ class Config:
     MYSQL_USER = os.environ.get('MYSQL_USER') or 'root'
     MYSQL_PASSWORD = os.environ.get('MYSQL_PASSWORD') or ''
     MYSQL_DB = os.environ.get('MYSQL_DATABASE') or 'joseberrio_db'
+    DB_POOL_TAMANO = int(os.environ.get('DB_POOL_TAMANO', 5))  # conexiones por worker
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))  # segundos esperando una conexión libre
+    DB_PING_SEGUNDOS = int(os.environ.get('DB_PING_SEGUNDOS', 30))  # inactividad tras la cual se verifica con ping()
+    USUARIOS_CACHE_TTL = int(os.environ.get('USUARIOS_CACHE_TTL', 30))  # segundos de vida de la lista de usuarios
     
     # Configuración de archivos
     UPLOAD_FOLDER = 'uploads'
     TRANSFORMED_FOLDER = 'transformados'
     MAX_CONTENT_LENGTH = 2000 * 1024 * 1024  # 2GB max (aumentado para archivos acumulados grandes)
     
+    # Almacén de ventas acumuladas en el servidor (una partición CSV por mes)
+    VENTAS_ACUM_FOLDER = os.environ.get('VENTAS_ACUM_FOLDER') or os.path.join('data', 'ventas_acum')
+    
+    # Cache de resultados por contenido (hash de la subida + tipo + parámetros)
+    CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', 4 * 1024 * 1024 * 1024))  # presupuesto global, desalojo LRU
+    CACHE_TTL = int(os.environ.get('CACHE_TTL', 24 * 3600))  # segundos de vida de cada resultado
+    CACHE_MAX_POR_USUARIO = int(os.environ.get('CACHE_MAX_POR_USUARIO', 5))  # resultados recientes por usuario
+    
+    # Prefijo 'internal' de nginx para servir descargas con X-Accel-Redirect (vacío = Flask envía el archivo)
+    # Requiere que nginx monte CACHE_DIR; ver nginx-proxy/custom-nginx.conf
+    CACHE_X_ACCEL_PREFIX = os.environ.get('CACHE_X_ACCEL_PREFIX', '')
+    
+    # Filas por lote al transformar venta_material (0 = cargar el archivo completo)
+    VENTA_MATERIAL_CHUNKSIZE = int(os.environ.get('VENTA_MATERIAL_CHUNKSIZE', 200000))
+    
+    # Filas por lote al leer la maestra de clientes en .xlsx (0 = cargar el libro completo con pd.read_excel)
+    CLIENTES_FILAS_POR_LOTE = int(os.environ.get('CLIENTES_FILAS_POR_LOTE', 50000))
+    
+    # Filas por lote de los demás pipelines de transformación (0 = cargar el archivo completo)
+    PIPELINE_FILAS_POR_LOTE = int(os.environ.get('PIPELINE_FILAS_POR_LOTE', 200000))
+    
+    # Unión de ventas: lectura simultánea del mes y del acumulado, este último por rangos de líneas
+    UNION_TRABAJADORES = int(os.environ.get('UNION_TRABAJADORES', os.cpu_count() or 1))  # 1 = lectura secuencial
+    UNION_MIN_BYTES_PARALELO = int(os.environ.get('UNION_MIN_BYTES_PARALELO', 64 * 1024 * 1024))  # acumulados menores se leen en un proceso
+    
+    # Cola de trabajos en segundo plano para /procesar/<tipo>
+    JOBS_MAX_CONCURRENTES = int(os.environ.get('JOBS_MAX_CONCURRENTES', 2))  # transformaciones simultáneas (todos los workers)
+    JOBS_MAX_COLA = int(os.environ.get('JOBS_MAX_COLA', 20))  # trabajos pendientes antes de rechazar nuevos
+    JOBS_TTL = int(os.environ.get('JOBS_TTL', 24 * 3600))  # segundos que se conserva el estado de un trabajo
+    # Procesos de pool (unión de ventas, lotes) entre todos los trabajos simultáneos
+    PROCESOS_POOL_MAX = int(os.environ.get('PROCESOS_POOL_MAX', os.cpu_count() or 1))
+    # Lotes de /procesar-lote/<tipo>: cada lote ocupa un turno de la cola y reparte sus archivos en procesos
+    LOTE_TRABAJADORES = int(os.environ.get('LOTE_TRABAJADORES', os.cpu_count() or 1))  # 1 = un archivo a la vez
+    LOTE_MAX_ARCHIVOS = int(os.environ.get('LOTE_MAX_ARCHIVOS', 100))  # archivos por lote (incluidos los de los ZIP)
+    LOTE_MAX_BYTES = int(os.environ.get('LOTE_MAX_BYTES', 4 * 1024 * 1024 * 1024))  # tamaño descomprimido de los ZIP
+    # Medición de tiempo, filas y memoria por etapa de cada script (se adjunta al trabajo)
+    INSTRUMENTACION = os.environ.get('INSTRUMENTACION', '0').lower() in ('1', 'true', 'si')
+    # Memoria de los DataFrames por etapa (memory_usage deep=True: tan costoso como escribir el CSV)
+    INSTRUMENTACION_DATOS = os.environ.get('INSTRUMENTACION_DATOS', '0').lower() in ('1', 'true', 'si')
+    
+    # Cliente HTTP de n8n (sesión con pool de conexiones por worker)
+    N8N_POOL_CONEXIONES = int(os.environ.get('N8N_POOL_CONEXIONES', 4))  # hosts distintos con pool propio
+    N8N_POOL_MAX = int(os.environ.get('N8N_POOL_MAX', 8))  # conexiones keep-alive por host
+    N8N_MAX_CONCURRENTES = int(os.environ.get('N8N_MAX_CONCURRENTES', 4))  # envíos simultáneos por worker
+    # Timeouts por defecto; cada flujo de FLUJOS_N8N puede redefinirlos
+    N8N_TIMEOUT_CONEXION = float(os.environ.get('N8N_TIMEOUT_CONEXION', 10))
+    N8N_TIMEOUT_LECTURA = float(os.environ.get('N8N_TIMEOUT_LECTURA', 900))  # 15 minutos para archivos grandes
+    N8N_TIMEOUT_TOTAL = float(os.environ.get('N8N_TIMEOUT_TOTAL', 1800))  # envío completo, incluidos reintentos
+    
+    # Token opcional para /metrics (vacío = sin autenticación; restringir en nginx)
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+    
     # Extensiones permitidas
-    ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv'}
+    ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv', 'parquet'}
 
 class DevelopmentConfig(Config):
     DEBUG = True
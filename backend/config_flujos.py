@@ -1,8 +1,18 @@
 """
 Configuración de flujos de n8n para carga de datos a PostgreSQL
 Cada flujo define las columnas esperadas y su webhook
+
+Al importar el módulo los flujos se compilan en un índice invertido de nombres
+de columna normalizados (sin tildes, minúsculas, sin puntuación y con espacios
+colapsados) -> flujos que la usan. Así 'Cod. Asesor', 'cod asesor' y
+'COD_ASESOR' coinciden, y detectar un archivo cuesta una búsqueda por columna
+sin importar cuántos flujos haya registrados.
 """
 import os
+import re
+import difflib
+import unicodedata
+from collections import namedtuple
 
 FLUJOS_N8N = {
     'metas_numericas': {
@@ -33,7 +43,12 @@ FLUJOS_N8N = {
                                'Marca', 'Sub marca', 'Linea', 'Sub linea', 'Categoria', 'Sub categoria',
                                'Negocio', 'Ciudad', 'Cod. Asesor', 'Asesor'],
         'tabla_destino': 'ventas_mes_siz',
-        'icon': 'currency-dollar'
+        'icon': 'currency-dollar',
+        # Filas por parte al enviar CSV grandes a n8n (0 = enviar el archivo completo)
+        'filas_por_parte': int(os.environ.get('N8N_VENTAS_FILAS_POR_PARTE', 0)),
+        # Timeouts en segundos (sin definir = valores N8N_TIMEOUT_* de config.py)
+        'timeout_lectura': 900,
+        'timeout_total': 3600
     },
     'metas_numericas_asesor': {
         'nombre': 'Metas Numéricas por Asesor',
@@ -56,7 +71,7 @@ FLUJOS_N8N = {
         'columnas_requeridas': ['Region', 'Empresa', 'Asesor', 'Indicador', 'Prom Sem', 'Prom Acum Mes'],
         'columnas_opcionales': ['Mes', 'Semana', 'Dias Habiles', 'Dias', 'Lunes', 'Martes', 
                                'Miercoles', 'Jueves', 'Viernes', 'Sabado', 'Domingo', 'Total',
-                               'Ao?=', 'Año', 'Year', 'Ano'],
+                               'Año', 'Year', 'Ano'],
         'tabla_destino': 'indicadores_semanales_asesor',
         'icon': 'calendar-week'
     },
@@ -71,6 +86,155 @@ FLUJOS_N8N = {
     }
 }
 
+# Similitud mínima (difflib) para sugerir una columna del archivo en lugar de una faltante
+SIMILITUD_SUGERENCIA = 0.8
+
+_SEPARADORES = re.compile(r'[\W_]+')
+
+# Encabezados dañados que se ven en los archivos y que la reparación latin-1
+# no recupera (el carácter se perdió al exportar)
+_ENCABEZADOS_DANADOS = {
+    'Ao?=': 'Año',
+}
+
+FlujoCompilado = namedtuple('FlujoCompilado', ['flujo_id', 'config', 'orden', 'requeridas', 'opcionales'])
+
+# columna normalizada -> [(flujo_id, es_requerida)]
+_indice = {}
+_compilados = {}
+# Flujos sin columnas requeridas: coinciden con cualquier archivo
+_sin_requeridas = set()
+
+
+def _quitar_acentos(texto):
+    """'Año' -> 'Ano' (sin importar pandas desde scripts.normalizacion)"""
+    descompuesto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def normalizar_columna(columna):
+    """
+    Forma canónica de un nombre de columna para compararlo
+
+    'Venta - IVA' -> 'venta iva', 'Cod. Asesor' -> 'cod asesor', 'Año' -> 'ano'.
+    Si el nombre llegó con el UTF-8 leído como latin-1 ('AÃ±o') se repara antes;
+    los dañados sin reparación posible ('Ao?=') se toman de _ENCABEZADOS_DANADOS.
+    """
+    texto = str(columna)
+    texto = _ENCABEZADOS_DANADOS.get(texto.strip(), texto)
+    try:
+        texto = texto.encode('latin-1').decode('utf-8')
+    except UnicodeError:
+        pass
+    texto = _quitar_acentos(texto).lower()
+    return ' '.join(_SEPARADORES.sub(' ', texto).split())
+
+
+def _compilar(flujo_id, config, orden):
+    # dict normalizada -> nombre original (en el orden del flujo)
+    requeridas = {normalizar_columna(c): c for c in config.get('columnas_requeridas', [])}
+    opcionales = {normalizar_columna(c): c for c in config.get('columnas_opcionales', [])}
+    for columna in opcionales.keys() - requeridas.keys():
+        _indice.setdefault(columna, []).append((flujo_id, False))
+    for columna in requeridas:
+        _indice.setdefault(columna, []).append((flujo_id, True))
+    return FlujoCompilado(flujo_id, config, orden, requeridas, opcionales)
+
+
+def _quitar_del_indice(flujo_id):
+    for columna in list(_indice):
+        _indice[columna] = [entrada for entrada in _indice[columna] if entrada[0] != flujo_id]
+        if not _indice[columna]:
+            del _indice[columna]
+
+
+def registrar_flujo(flujo_id, config):
+    """
+    Agrega (o reemplaza) un flujo en FLUJOS_N8N y en el índice de detección
+
+    Un flujo nuevo queda al final: ante un empate de columnas gana el registrado antes.
+    """
+    if flujo_id in _compilados:
+        _quitar_del_indice(flujo_id)
+        orden = _compilados[flujo_id].orden
+    else:
+        orden = len(_compilados)
+    FLUJOS_N8N[flujo_id] = config
+    _compilados[flujo_id] = _compilar(flujo_id, config, orden)
+    if _compilados[flujo_id].requeridas:
+        _sin_requeridas.discard(flujo_id)
+    else:
+        _sin_requeridas.add(flujo_id)
+
+
+def _compilado(flujo_config):
+    """Flujo compilado de una config de FLUJOS_N8N (o compilado al vuelo si no está registrada)"""
+    for compilado in _compilados.values():
+        if compilado.config is flujo_config:
+            return compilado
+    compilado = FlujoCompilado(None, flujo_config, None, {}, {})
+    return compilado._replace(
+        requeridas={normalizar_columna(c): c for c in flujo_config.get('columnas_requeridas', [])},
+        opcionales={normalizar_columna(c): c for c in flujo_config.get('columnas_opcionales', [])}
+    )
+
+
+def _sugerencias(faltantes, columnas_libres):
+    """Columna del archivo más parecida a cada requerida faltante: {requerida: columna_archivo}"""
+    sugerencias = {}
+    libres = dict(columnas_libres)
+    for normalizada, original in faltantes.items():
+        parecidas = difflib.get_close_matches(normalizada, list(libres), n=1, cutoff=SIMILITUD_SUGERENCIA)
+        if parecidas:
+            sugerencias[original] = libres.pop(parecidas[0])
+    return sugerencias
+
+
+def analizar_columnas(columnas_archivo):
+    """
+    Detecta el flujo de un archivo y qué tan seguro es
+
+    Returns:
+        dict: flujo_id (None si ninguno tiene todas sus requeridas), confianza
+        (0-1, proporción de columnas del archivo que el flujo reconoce),
+        coincidencias (requeridas presentes), faltantes y sugerencias
+        {requerida: columna_del_archivo} del flujo detectado o del candidato más cercano
+    """
+    columnas = {}
+    for columna in columnas_archivo:
+        columnas.setdefault(normalizar_columna(columna), columna)
+
+    requeridas = {}
+    reconocidas = {}
+    for columna in columnas:
+        for flujo_id, es_requerida in _indice.get(columna, ()):
+            reconocidas[flujo_id] = reconocidas.get(flujo_id, 0) + 1
+            if es_requerida:
+                requeridas[flujo_id] = requeridas.get(flujo_id, 0) + 1
+
+    # Solo compiten los flujos con alguna requerida en el archivo (o sin requeridas)
+    candidatos = [_compilados[flujo_id] for flujo_id in requeridas]
+    candidatos += [_compilados[flujo_id] for flujo_id in _sin_requeridas]
+    if not candidatos or not columnas:
+        return {'flujo_id': None, 'confianza': 0.0, 'coincidencias': 0, 'candidato': None,
+                'faltantes': [], 'sugerencias': {}}
+
+    # Completos primero, luego más requeridas presentes; a igualdad, el flujo definido antes
+    mejor = max(candidatos, key=lambda c: (requeridas.get(c.flujo_id, 0) == len(c.requeridas),
+                                           requeridas.get(c.flujo_id, 0), -c.orden))
+    detectado = requeridas.get(mejor.flujo_id, 0) == len(mejor.requeridas)
+    faltantes = {n: o for n, o in mejor.requeridas.items() if n not in columnas}
+    libres = {n: o for n, o in columnas.items() if n not in mejor.requeridas and n not in mejor.opcionales}
+    return {
+        'flujo_id': mejor.flujo_id if detectado else None,
+        'confianza': round(reconocidas.get(mejor.flujo_id, 0) / len(columnas), 3) if detectado else 0.0,
+        'coincidencias': requeridas.get(mejor.flujo_id, 0),
+        'candidato': mejor.flujo_id,
+        'faltantes': list(faltantes.values()),
+        'sugerencias': _sugerencias(faltantes, libres)
+    }
+
+
 def detectar_flujo(columnas_archivo):
     """
     Detecta automáticamente qué flujo corresponde al archivo
@@ -82,52 +246,38 @@ def detectar_flujo(columnas_archivo):
     Returns:
         tuple: (flujo_id, flujo_config) o (None, None) si no coincide
     """
-    columnas_lower = [col.strip().lower() for col in columnas_archivo]
-    
-    # Priorizar por número de columnas coincidentes (más específico primero)
-    matches = []
-    
-    for flujo_id, config in FLUJOS_N8N.items():
-        columnas_req_lower = [col.lower() for col in config['columnas_requeridas']]
-        
-        # Contar cuántas columnas requeridas están presentes
-        coincidencias = sum(1 for col_req in columnas_req_lower if col_req in columnas_lower)
-        
-        # Si TODAS las columnas requeridas están presentes
-        if coincidencias == len(columnas_req_lower):
-            matches.append((flujo_id, config, coincidencias))
-    
-    # Ordenar por más coincidencias (el más específico)
-    if matches:
-        matches.sort(key=lambda x: x[2], reverse=True)
-        return matches[0][0], matches[0][1]
-    
-    return None, None
+    flujo_id = analizar_columnas(columnas_archivo)['flujo_id']
+    if flujo_id is None:
+        return None, None
+    return flujo_id, FLUJOS_N8N[flujo_id]
 
 def validar_columnas(columnas_archivo, flujo_config):
     """
     Valida que el archivo tenga las columnas necesarias
     
     Returns:
-        dict: {'valido': bool, 'mensaje': str, 'faltantes': list}
+        dict: {'valido': bool, 'mensaje': str, 'faltantes': list, 'sugerencias': dict}
     """
-    columnas_lower = [col.strip().lower() for col in columnas_archivo]
-    columnas_req_lower = [col.lower() for col in flujo_config['columnas_requeridas']]
+    compilado = _compilado(flujo_config)
+    columnas = {}
+    for columna in columnas_archivo:
+        columnas.setdefault(normalizar_columna(columna), columna)
     
-    faltantes = [col for col in flujo_config['columnas_requeridas'] 
-                 if col.lower() not in columnas_lower]
+    faltantes = {n: o for n, o in compilado.requeridas.items() if n not in columnas}
     
     if faltantes:
+        libres = {n: o for n, o in columnas.items()
+                  if n not in compilado.requeridas and n not in compilado.opcionales}
         return {
             'valido': False,
-            'mensaje': f"Faltan columnas requeridas: {', '.join(faltantes)}",
-            'faltantes': faltantes
+            'mensaje': f"Faltan columnas requeridas: {', '.join(faltantes.values())}",
+            'faltantes': list(faltantes.values()),
+            'sugerencias': _sugerencias(faltantes, libres)
         }
     
     # Validación especial: verificar que tenga al menos N columnas opcionales
     if 'validacion_minima' in flujo_config:
-        columnas_opc_lower = [col.lower() for col in flujo_config['columnas_opcionales']]
-        presentes = sum(1 for col_opc in columnas_opc_lower if col_opc in columnas_lower)
+        presentes = sum(1 for col_opc in compilado.opcionales if col_opc in columnas)
         
         min_requerido = flujo_config['validacion_minima']
         total_opcionales = len(flujo_config['columnas_opcionales'])
@@ -137,11 +287,17 @@ def validar_columnas(columnas_archivo, flujo_config):
             return {
                 'valido': False,
                 'mensaje': f"Se requieren al menos {min_requerido} numéricas (máximo {max_faltantes} pueden faltar). Solo se encontraron {presentes}",
-                'faltantes': []
+                'faltantes': [],
+                'sugerencias': {}
             }
     
     return {
         'valido': True,
         'mensaje': 'Archivo válido',
-        'faltantes': []
+        'faltantes': [],
+        'sugerencias': {}
     }
+
+
+for _flujo_id, _config in list(FLUJOS_N8N.items()):
+    registrar_flujo(_flujo_id, _config)
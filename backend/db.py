@@ -0,0 +1,200 @@
+"""
+Pool de conexiones MySQL y cache de la lista de usuarios
+
+Cada worker de gunicorn mantiene hasta DB_POOL_TAMANO conexiones abiertas y las
+reutiliza entre peticiones en lugar de hacer un handshake nuevo por petición.
+La espera por una conexión libre usa queue.Queue, que gevent parchea, así una
+petición esperando no bloquea al resto del worker.
+
+La lista de usuarios se guarda unos segundos por proceso. Crear, editar o
+eliminar un usuario incrementa un contador compartido en disco que invalida la
+copia de todos los workers.
+"""
+import os
+import time
+import queue
+import fcntl
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import MySQLdb
+
+from config import Config
+
+DB_DIR = os.path.join(tempfile.gettempdir(), 'convertidor_db')
+os.makedirs(DB_DIR, mode=0o755, exist_ok=True)
+GENERACION_USUARIOS = os.path.join(DB_DIR, 'usuarios.generacion')
+
+_pool = None
+_pool_pid = None
+_usuarios_cache = None
+
+
+class PoolAgotado(Exception):
+    """No se liberó ninguna conexión dentro de DB_POOL_TIMEOUT segundos"""
+
+
+class PoolConexiones:
+    """
+    Pool acotado de conexiones MySQL
+
+    Las conexiones se crean a demanda hasta 'tamano'. Al sacar una conexión que
+    estuvo inactiva más de 'ping_segundos' se verifica con ping() y, si el
+    servidor la cerró, se reemplaza por una nueva.
+    """
+
+    def __init__(self, tamano, timeout_checkout, ping_segundos, **parametros):
+        self.tamano = tamano
+        self.timeout_checkout = timeout_checkout
+        self.ping_segundos = ping_segundos
+        self.parametros = parametros
+        self._libres = queue.LifoQueue(maxsize=tamano)
+        self._creadas = 0
+        self._lock = threading.Lock()
+
+    def _crear(self):
+        return MySQLdb.connect(**self.parametros)
+
+    def _descartar(self, conexion):
+        try:
+            conexion.close()
+        except MySQLdb.Error:
+            pass
+        with self._lock:
+            self._creadas -= 1
+
+    def _sacar(self):
+        try:
+            return self._libres.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            crear = self._creadas < self.tamano
+            if crear:
+                self._creadas += 1
+        if crear:
+            try:
+                return self._crear(), time.monotonic()
+            except Exception:
+                with self._lock:
+                    self._creadas -= 1
+                raise
+
+        try:
+            return self._libres.get(timeout=self.timeout_checkout)
+        except queue.Empty:
+            raise PoolAgotado(f'Sin conexiones libres a MySQL después de {self.timeout_checkout}s')
+
+    @contextmanager
+    def conexion(self):
+        """Saca una conexión del pool y la devuelve al terminar el bloque"""
+        conexion, ultimo_uso = self._sacar()
+
+        if time.monotonic() - ultimo_uso > self.ping_segundos:
+            try:
+                conexion.ping()
+            except MySQLdb.Error:
+                print("[WARNING] Conexión MySQL caída, se reemplaza")
+                self._descartar(conexion)
+                with self._lock:
+                    self._creadas += 1
+                try:
+                    conexion = self._crear()
+                except Exception:
+                    with self._lock:
+                        self._creadas -= 1
+                    raise
+
+        try:
+            yield conexion
+        except MySQLdb.OperationalError:
+            # Error de conexión: no se devuelve al pool
+            self._descartar(conexion)
+            raise
+        except BaseException:
+            self._libres.put((conexion, time.monotonic()))
+            raise
+        else:
+            self._libres.put((conexion, time.monotonic()))
+
+
+def _obtener_pool():
+    """Pool por worker de gunicorn (se recrea tras un fork)"""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        _pool = PoolConexiones(
+            Config.DB_POOL_TAMANO,
+            Config.DB_POOL_TIMEOUT,
+            Config.DB_PING_SEGUNDOS,
+            host=Config.MYSQL_HOST,
+            port=Config.MYSQL_PORT,
+            user=Config.MYSQL_USER,
+            passwd=Config.MYSQL_PASSWORD,
+            db=Config.MYSQL_DB,
+            charset='utf8',
+            # Sin transacciones abiertas entre peticiones: cada SELECT ve los últimos cambios
+            autocommit=True
+        )
+        _pool_pid = os.getpid()
+    return _pool
+
+
+def conexion():
+    """
+    Conexión del pool del worker, para usar con 'with':
+
+        with db.conexion() as conn:
+            cur = conn.cursor()
+            ...
+    """
+    return _obtener_pool().conexion()
+
+
+def _generacion_usuarios():
+    try:
+        with open(GENERACION_USUARIOS, 'r') as f:
+            return int(f.read() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def invalidar_usuarios():
+    """Invalida la lista de usuarios en cache de todos los workers"""
+    global _usuarios_cache
+    with open(GENERACION_USUARIOS, 'a+') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.seek(0)
+            contenido = f.read().strip()
+            generacion = int(contenido) + 1 if contenido.isdigit() else 1
+            f.seek(0)
+            f.truncate()
+            f.write(str(generacion))
+            f.flush()
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+    _usuarios_cache = None
+
+
+def listar_usuarios():
+    """
+    Usuarios (id, usuario, rol) ordenados por id descendente, desde el cache
+    del proceso si tiene menos de USUARIOS_CACHE_TTL segundos y nadie los modificó
+    """
+    global _usuarios_cache
+    generacion = _generacion_usuarios()
+    if (_usuarios_cache is not None
+            and _usuarios_cache[0] == generacion
+            and time.monotonic() < _usuarios_cache[1]):
+        return _usuarios_cache[2]
+
+    with conexion() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT id, usuario, rol FROM usuarios ORDER BY id DESC")
+        users = cur.fetchall()
+        cur.close()
+
+    _usuarios_cache = (generacion, time.monotonic() + Config.USUARIOS_CACHE_TTL, users)
+    return users
@@ -0,0 +1,320 @@
+"""
+Cola de trabajos en segundo plano para /procesar/<tipo> y /procesar-lote/<tipo>
+
+Las transformaciones se ejecutan en un pool de procesos acotado para no bloquear
+el event loop de los workers gevent. El estado de cada trabajo se guarda como
+JSON en JOBS_DIR, así cualquier worker de gunicorn puede responder la consulta.
+"""
+import os
+import json
+import time
+import uuid
+import fcntl
+import shutil
+import tempfile
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from config import Config
+import metricas
+
+JOBS_DIR = os.path.join(tempfile.gettempdir(), 'convertidor_jobs')
+os.makedirs(JOBS_DIR, mode=0o755, exist_ok=True)
+
+EN_COLA = 'en_cola'
+PROCESANDO = 'procesando'
+COMPLETADO = 'completado'
+ERROR = 'error'
+ESTADOS_ACTIVOS = (EN_COLA, PROCESANDO)
+
+# Histórico de mediciones por etapa (una línea JSON por trabajo)
+ETAPAS_ARCHIVO = os.path.join(JOBS_DIR, 'etapas.jsonl')
+ETAPAS_MAX_BYTES = 5 * 1024 * 1024
+
+_executor = None
+_executor_pid = None
+
+
+class ColaLlena(Exception):
+    """Se alcanzó JOBS_MAX_COLA trabajos pendientes"""
+
+
+def _ruta_estado(job_id):
+    return os.path.join(JOBS_DIR, f'job_{job_id}.json')
+
+
+def _escribir_estado(estado):
+    """Escritura atómica para que los lectores nunca vean un JSON a medias"""
+    ruta = _ruta_estado(estado['id'])
+    temporal = f'{ruta}.{os.getpid()}.tmp'
+    with open(temporal, 'w') as f:
+        json.dump(estado, f)
+    os.replace(temporal, ruta)
+
+
+def obtener(job_id):
+    """Devuelve el estado del trabajo o None si no existe"""
+    try:
+        with open(_ruta_estado(job_id), 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def actualizar(job_id, **campos):
+    estado = obtener(job_id)
+    if estado is None:
+        return None
+    estado.update(campos)
+    estado['actualizado'] = datetime.now().isoformat()
+    _escribir_estado(estado)
+    return estado
+
+
+def listar(user_id=None):
+    """Trabajos registrados, más recientes primero"""
+    trabajos = []
+    for nombre in os.listdir(JOBS_DIR):
+        if not (nombre.startswith('job_') and nombre.endswith('.json')):
+            continue
+        estado = obtener(nombre[len('job_'):-len('.json')])
+        if estado and (user_id is None or estado.get('user_id') == user_id):
+            trabajos.append(estado)
+    trabajos.sort(key=lambda t: t['creado'], reverse=True)
+    return trabajos
+
+
+def limpiar_antiguos():
+    """Elimina el estado (y la carpeta de trabajo) de trabajos más viejos que JOBS_TTL"""
+    limite = time.time() - Config.JOBS_TTL
+    for nombre in os.listdir(JOBS_DIR):
+        ruta = os.path.join(JOBS_DIR, nombre)
+        try:
+            if nombre.startswith('job_') and nombre.endswith('.json') and os.path.getmtime(ruta) < limite:
+                estado = obtener(nombre[len('job_'):-len('.json')])
+                if estado and estado.get('carpeta'):
+                    shutil.rmtree(estado['carpeta'], ignore_errors=True)
+                os.remove(ruta)
+        except FileNotFoundError:
+            continue
+
+
+def trabajos_activos():
+    return sum(1 for t in listar() if t['estado'] in ESTADOS_ACTIVOS)
+
+
+def _obtener_executor():
+    """Pool de procesos por worker de gunicorn (se recrea tras un fork)"""
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        # 'spawn' evita heredar el estado de gevent del worker
+        _executor = ProcessPoolExecutor(
+            max_workers=Config.JOBS_MAX_CONCURRENTES,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+        _executor_pid = os.getpid()
+    return _executor
+
+
+def encolar(tipo, user_id, archivos, parametros, carpeta_trabajo, clave, lote=False):
+    """
+    Registra el trabajo y lo envía al pool de procesos
+
+    Args:
+        clave: clave de contenido con la que se guarda el resultado en cache
+        lote: archivos es un lote de /procesar-lote (dict nombre -> ruta, ver lotes.py)
+
+    Returns:
+        str: id del trabajo
+    """
+    limpiar_antiguos()
+    if trabajos_activos() >= Config.JOBS_MAX_COLA:
+        raise ColaLlena(f'Hay {Config.JOBS_MAX_COLA} trabajos en cola. Intente de nuevo en unos minutos.')
+
+    job_id = uuid.uuid4().hex
+    ahora = datetime.now().isoformat()
+    _escribir_estado({
+        'id': job_id,
+        'tipo': tipo,
+        'lote': lote,
+        'user_id': user_id,
+        'estado': EN_COLA,
+        'progreso': 0,
+        'mensaje': 'En cola',
+        'resultado': None,
+        'error': None,
+        'carpeta': carpeta_trabajo,
+        'creado': ahora,
+        'actualizado': ahora
+    })
+
+    future = _obtener_executor().submit(_ejecutar_trabajo, job_id, tipo, user_id, archivos, parametros, carpeta_trabajo, clave, lote)
+    future.add_done_callback(lambda f: _registrar_fallo(job_id, f))
+    print(f"[INFO] Trabajo {job_id} ({tipo}{' por lotes' if lote else ''}) encolado para user_id: {user_id}")
+    return job_id
+
+
+def _registrar_fallo(job_id, future):
+    """Marca el trabajo como fallido si el proceso murió sin actualizar su estado"""
+    excepcion = future.exception()
+    if excepcion is None:
+        return
+    estado = obtener(job_id)
+    if estado and estado['estado'] in ESTADOS_ACTIVOS:
+        actualizar(job_id, estado=ERROR, error=f'Error al procesar: {excepcion}', mensaje='Error')
+
+
+def _registrar_etapas(tipo, exito, medicion):
+    """Agrega la medición del trabajo al histórico (se rota al superar ETAPAS_MAX_BYTES)"""
+    linea = json.dumps({'tipo': tipo, 'exito': exito, 'fecha': datetime.now().isoformat(), **medicion})
+    with open(ETAPAS_ARCHIVO, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            if f.tell() > ETAPAS_MAX_BYTES:
+                os.replace(ETAPAS_ARCHIVO, f'{ETAPAS_ARCHIVO}.1')
+            f.write(linea + '\n')
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def resumen_etapas():
+    """
+    Agrega el histórico de mediciones por tipo y etapa
+
+    Returns:
+        dict: tipo -> {'trabajos', 'segundos_promedio', 'etapas': [{'etapa', 'veces',
+              'segundos_total', 'segundos_promedio', 'segundos_max', 'filas_salida',
+              'memoria_delta_max_mb'}]}
+    """
+    resumen = {}
+    for ruta in (f'{ETAPAS_ARCHIVO}.1', ETAPAS_ARCHIVO):
+        try:
+            with open(ruta, 'r') as f:
+                lineas = f.readlines()
+        except FileNotFoundError:
+            continue
+        for linea in lineas:
+            try:
+                medicion = json.loads(linea)
+            except ValueError:
+                continue
+            tipo = resumen.setdefault(medicion['tipo'], {'trabajos': 0, 'segundos_total': 0.0, 'etapas': {}})
+            tipo['trabajos'] += 1
+            tipo['segundos_total'] += medicion['segundos_total']
+            for etapa in medicion['etapas']:
+                total = tipo['etapas'].setdefault(etapa['etapa'], {
+                    'etapa': etapa['etapa'], 'trabajos': 0, 'segundos_total': 0.0,
+                    'segundos_max': 0.0, 'filas_salida': 0, 'memoria_delta_max_mb': 0.0
+                })
+                total['trabajos'] += 1
+                total['segundos_total'] += etapa['segundos']
+                total['segundos_max'] = max(total['segundos_max'], etapa['segundos'])
+                total['filas_salida'] += etapa['filas_salida'] or 0
+                total['memoria_delta_max_mb'] = max(total['memoria_delta_max_mb'], etapa['memoria_delta_mb'])
+
+    for tipo in resumen.values():
+        tipo['segundos_promedio'] = round(tipo.pop('segundos_total') / tipo['trabajos'], 3)
+        etapas = []
+        for etapa in tipo['etapas'].values():
+            etapa['segundos_promedio'] = round(etapa['segundos_total'] / etapa['trabajos'], 3)
+            etapa['segundos_total'] = round(etapa['segundos_total'], 3)
+            etapa['segundos_max'] = round(etapa['segundos_max'], 3)
+            etapas.append(etapa)
+        # Las etapas más costosas primero
+        tipo['etapas'] = sorted(etapas, key=lambda e: e['segundos_total'], reverse=True)
+    return resumen
+
+
+class _Turno:
+    """
+    Semáforo entre procesos basado en flock: limita a JOBS_MAX_CONCURRENTES
+    las transformaciones simultáneas aunque cada worker tenga su propio pool.
+    """
+
+    def __init__(self, espera=0.5):
+        self.espera = espera
+        self.lock = None
+
+    def __enter__(self):
+        while True:
+            for i in range(Config.JOBS_MAX_CONCURRENTES):
+                lock = open(os.path.join(JOBS_DIR, f'turno_{i}.lock'), 'w')
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    self.lock = lock
+                    return self
+                except BlockingIOError:
+                    lock.close()
+            time.sleep(self.espera)
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.lock, fcntl.LOCK_UN)
+        self.lock.close()
+        return False
+
+
+def _progreso_lote(job_id, terminados, total):
+    actualizar(job_id, progreso=10 + 80 * terminados // total, mensaje=f'Procesados {terminados} de {total} archivos')
+
+
+def _ejecutar_trabajo(job_id, tipo, user_id, archivos, parametros, carpeta_trabajo, clave, lote=False):
+    """Punto de entrada en el proceso hijo"""
+    # Importaciones pesadas (pandas) solo en el proceso hijo
+    import cache
+    import procesamiento
+    import lotes
+    from scripts import instrumentacion, lectura
+
+    # Los lotes se miden aparte para no mezclar sus tiempos con los de un archivo
+    etiqueta = f'{tipo}_lote' if lote else tipo
+    exito = False
+    medicion = None
+    inicio = None
+    try:
+        with _Turno():
+            actualizar(job_id, estado=PROCESANDO, progreso=10, mensaje='Procesando archivo')
+            inicio = time.perf_counter()
+            instrumentacion.iniciar(Config.INSTRUMENTACION, datos=Config.INSTRUMENTACION_DATOS)
+            # Los pools de los trabajos simultáneos comparten PROCESOS_POOL_MAX procesos
+            lectura.limitar_procesos(JOBS_DIR, Config.PROCESOS_POOL_MAX)
+            if lote:
+                resultado = lotes.ejecutar(tipo, archivos, parametros, carpeta_trabajo,
+                                           progreso=lambda terminados, total: _progreso_lote(job_id, terminados, total))
+            else:
+                resultado = procesamiento.ejecutar_tipo(tipo, archivos, parametros, carpeta_trabajo)
+            medicion = instrumentacion.finalizar()
+
+            if resultado['origen'] == 'cache':
+                actualizar(job_id, progreso=90, mensaje='Guardando resultado')
+                cache.save_to_cache(user_id, resultado['archivo'], resultado['ruta'], clave)
+                resultado['clave'] = clave
+
+        actualizar(
+            job_id,
+            estado=COMPLETADO,
+            progreso=100,
+            mensaje='Archivo procesado correctamente',
+            etapas=medicion,
+            resultado={k: v for k, v in resultado.items() if k != 'ruta'}
+        )
+        exito = True
+    except ValueError as e:
+        traceback.print_exc()
+        actualizar(job_id, estado=ERROR, error=f'Error al leer archivo: {str(e)}', mensaje='Error')
+    except Exception as e:
+        traceback.print_exc()
+        actualizar(job_id, estado=ERROR, error=f'Error al procesar archivo: {str(e)}', mensaje='Error')
+    finally:
+        shutil.rmtree(carpeta_trabajo, ignore_errors=True)
+        if inicio is not None:
+            # Sin la espera por turno
+            metricas.TRANSFORMACION_SEGUNDOS.labels(tipo=etiqueta, resultado='ok' if exito else 'error').observe(time.perf_counter() - inicio)
+        if medicion is None:
+            # El script falló: se guarda lo medido hasta el error
+            medicion = instrumentacion.finalizar()
+        if medicion:
+            if not exito:
+                actualizar(job_id, etapas=medicion)
+            _registrar_etapas(etiqueta, exito, medicion)
@@ -0,0 +1,260 @@
+"""
+Procesamiento por lotes de /procesar-lote/<tipo>
+
+Varios archivos del mismo tipo (sueltos o dentro de ZIP) se transforman en un
+solo trabajo de la cola: cada archivo por separado con su transformación
+registrada, repartidos en un pool de procesos. Los resultados se entregan en
+un ZIP (un archivo por entrada) o combinados en un solo archivo.
+"""
+import os
+import shutil
+import zipfile
+from concurrent.futures import as_completed
+
+from config import Config
+import procesamiento
+from scripts import instrumentacion, lectura
+
+SALIDAS = ('zip', 'combinado')
+# Errores por archivo dentro del ZIP de resultados
+ARCHIVO_ERRORES = 'errores.txt'
+# Compresión rápida: los CSV se comprimen bien incluso en el nivel más bajo
+NIVEL_COMPRESION = 1
+
+
+def validar_salida(salida):
+    salida = (salida or 'zip').lower()
+    if salida not in SALIDAS:
+        raise ValueError(f"Salida de lote no soportada: {salida}. Use {' o '.join(SALIDAS)}")
+    return salida
+
+
+def es_zip(nombre):
+    return nombre.lower().endswith('.zip')
+
+
+def nombre_unico(nombre, usados):
+    """ventas.csv -> ventas_2.csv si ya está en usados"""
+    base, extension = os.path.splitext(nombre)
+    candidato, n = nombre, 1
+    while candidato in usados:
+        n += 1
+        candidato = f'{base}_{n}{extension}'
+    return candidato
+
+
+def _es_dato(miembro, extensiones):
+    """Archivo de datos dentro del ZIP (se ignoran carpetas, ocultos y metadatos de macOS)"""
+    nombre = os.path.basename(miembro.filename)
+    return (not miembro.is_dir() and not miembro.filename.startswith('__MACOSX/')
+            and not nombre.startswith('.') and '.' in nombre
+            and nombre.rsplit('.', 1)[1].lower() in extensiones)
+
+
+def listar_entradas(archivos, extensiones):
+    """
+    Entradas del lote: cada archivo suelto y cada archivo de datos de los ZIP.
+    Solo lee el índice de los ZIP, no los descomprime.
+
+    Args:
+        archivos: dict nombre -> ruta de los archivos subidos
+        extensiones: extensiones de datos aceptadas (sin punto)
+
+    Returns:
+        list: (nombre, ruta del archivo subido, miembro del ZIP o None), ordenadas por nombre
+
+    Raises:
+        ValueError: ZIP inválido, lote vacío o que supera LOTE_MAX_ARCHIVOS / LOTE_MAX_BYTES
+    """
+    entradas = {}
+    bytes_zip = 0
+    for nombre, ruta in archivos.items():
+        if not es_zip(nombre):
+            entradas[nombre_unico(nombre, entradas)] = (ruta, None)
+            continue
+        try:
+            with zipfile.ZipFile(ruta) as z:
+                miembros = [m for m in z.infolist() if _es_dato(m, extensiones)]
+        except zipfile.BadZipFile:
+            raise ValueError(f'{nombre} no es un ZIP válido')
+        for miembro in miembros:
+            bytes_zip += miembro.file_size
+            entradas[nombre_unico(os.path.basename(miembro.filename), entradas)] = (ruta, miembro.filename)
+
+    if not entradas:
+        raise ValueError('El lote no contiene archivos de datos')
+    if len(entradas) > Config.LOTE_MAX_ARCHIVOS:
+        raise ValueError(f'El lote tiene {len(entradas)} archivos; el máximo es {Config.LOTE_MAX_ARCHIVOS}')
+    if bytes_zip > Config.LOTE_MAX_BYTES:
+        raise ValueError(f'Los ZIP del lote ocupan {bytes_zip // (1024 * 1024)} MB descomprimidos; '
+                         f'el máximo es {Config.LOTE_MAX_BYTES // (1024 * 1024)} MB')
+    return [(nombre, ruta, miembro) for nombre, (ruta, miembro) in sorted(entradas.items())]
+
+
+def _extraer(entradas, carpeta):
+    """Descomprime los miembros de ZIP; los archivos sueltos se usan donde están"""
+    os.makedirs(carpeta, exist_ok=True)
+    rutas = {}
+    for i, (nombre, ruta, miembro) in enumerate(entradas):
+        if miembro is None:
+            rutas[nombre] = ruta
+            continue
+        # Nombre propio en disco: el del ZIP puede traer carpetas o '..'
+        destino = os.path.join(carpeta, f'{i}_{nombre}')
+        with zipfile.ZipFile(ruta) as z, z.open(miembro) as origen, open(destino, 'wb') as f:
+            shutil.copyfileobj(origen, f, 1024 * 1024)
+        rutas[nombre] = destino
+    return rutas
+
+
+def _procesar_entrada(tipo, ruta, parametros, carpeta):
+    """Punto de entrada en el proceso del pool: transforma un archivo del lote"""
+    transformacion = procesamiento.obtener(tipo)
+    return procesamiento.ejecutar_tipo(tipo, {transformacion.campos[0]: ruta}, parametros, carpeta)
+
+
+def _procesar(tipo, rutas, parametros, carpeta, trabajadores, progreso):
+    """
+    Transforma cada entrada en su propia carpeta, repartidas entre los procesos
+
+    Returns:
+        tuple: (dict nombre -> resultado, dict nombre -> mensaje de error)
+    """
+    resultados, errores = {}, {}
+    carpetas = {nombre: os.path.join(carpeta, str(i)) for i, nombre in enumerate(rutas)}
+
+    def registrar(nombre, obtener_resultado):
+        try:
+            resultados[nombre] = obtener_resultado()
+        except Exception as e:
+            print(f"❌ Error en {nombre}: {e}")
+            errores[nombre] = str(e)
+        if progreso:
+            progreso(len(resultados) + len(errores), len(rutas))
+
+    # El cupo de procesos se comparte con los demás trabajos en curso
+    with lectura.reservar_procesos(trabajadores) as trabajadores:
+        if trabajadores < 2:
+            for nombre, ruta in rutas.items():
+                registrar(nombre, lambda: _procesar_entrada(tipo, ruta, parametros, carpetas[nombre]))
+            return resultados, errores
+
+        with lectura.crear_pool(trabajadores) as executor:
+            futuros = {executor.submit(_procesar_entrada, tipo, ruta, parametros, carpetas[nombre]): nombre
+                       for nombre, ruta in rutas.items()}
+            for futuro in as_completed(futuros):
+                registrar(futuros[futuro], futuro.result)
+    return resultados, errores
+
+
+def _nombre_resultado(entrada, archivo):
+    """ventas_norte.csv + ventas_mes.csv -> ventas_norte_ventas_mes.csv"""
+    return f'{os.path.splitext(entrada)[0]}_{archivo}'
+
+
+def _empaquetar(resultados, errores, destino):
+    with zipfile.ZipFile(destino, 'w', zipfile.ZIP_DEFLATED, compresslevel=NIVEL_COMPRESION) as z:
+        for entrada, resultado in sorted(resultados.items()):
+            # Parquet ya viene comprimido
+            compresion = zipfile.ZIP_STORED if lectura.es_parquet(resultado['archivo']) else zipfile.ZIP_DEFLATED
+            z.write(resultado['ruta'], _nombre_resultado(entrada, resultado['archivo']), compress_type=compresion)
+        if errores:
+            z.writestr(ARCHIVO_ERRORES, ''.join(f'{entrada}: {error}\n' for entrada, error in sorted(errores.items())))
+
+
+def _combinar_csv(rutas, destino):
+    """Concatena los CSV con un solo encabezado (todos salen del mismo script y encoding)"""
+    encabezado = None
+    with open(destino, 'wb') as salida:
+        for ruta in rutas:
+            with open(ruta, 'rb') as f:
+                primera = f.readline()
+                if encabezado is None:
+                    encabezado = primera
+                    salida.write(primera)
+                elif primera != encabezado:
+                    raise ValueError('Los resultados del lote no tienen las mismas columnas; use la salida zip')
+                shutil.copyfileobj(f, salida, 1024 * 1024)
+
+
+def _combinar_parquet(rutas, destino):
+    """Copia los row groups de cada Parquet al esquema del primero"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for ruta in rutas:
+            archivo = pq.ParquetFile(ruta)
+            if writer is None:
+                writer = pq.ParquetWriter(destino, archivo.schema_arrow)
+            for i in range(archivo.num_row_groups):
+                try:
+                    tabla = archivo.read_row_group(i).cast(writer.schema)
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError, ValueError) as e:
+                    raise ValueError(f'Los resultados del lote no tienen las mismas columnas o tipos; use la salida zip ({e})')
+                writer.write_table(tabla)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def ejecutar(tipo, archivos, parametros, carpeta_trabajo, trabajadores=None, progreso=None):
+    """
+    Transforma todos los archivos del lote y reúne los resultados
+
+    Args:
+        archivos: dict nombre -> ruta de los archivos subidos (sueltos o ZIP)
+        parametros: parámetros de la transformación más 'salida' (zip | combinado)
+        trabajadores: procesos del pool (por defecto Config.LOTE_TRABAJADORES; se usan
+                      menos si otros trabajos ocupan el cupo de procesos)
+        progreso: progreso(terminados, total) tras cada archivo
+
+    Returns:
+        dict: {'archivo', 'ruta', 'origen': 'cache', 'archivos': procesados,
+               'errores': [{'archivo', 'error'}]}
+    """
+    transformacion = procesamiento.obtener(tipo)
+    if not transformacion.admite_lote:
+        raise ValueError(f'El tipo "{tipo}" no admite procesamiento por lotes')
+    salida = validar_salida(parametros.get('salida'))
+
+    entradas = listar_entradas(archivos, Config.ALLOWED_EXTENSIONS)
+    trabajadores = max(1, min(trabajadores or Config.LOTE_TRABAJADORES, len(entradas)))
+    print(f"\n🗂️ Procesamiento por lotes: {len(entradas)} archivos de {tipo} en hasta {trabajadores} procesos")
+
+    with instrumentacion.etapa('lote_extraer'):
+        rutas = _extraer(entradas, os.path.join(carpeta_trabajo, 'entradas'))
+    with instrumentacion.etapa('lote_procesar'):
+        resultados, errores = _procesar(tipo, rutas, parametros, os.path.join(carpeta_trabajo, 'salidas'),
+                                        trabajadores, progreso)
+    if not resultados:
+        primero = min(errores)
+        raise ValueError(f'Ningún archivo del lote se pudo procesar ({primero}: {errores[primero]})')
+
+    # Nombre del resultado de un archivo (ej. ventas_mes.csv) -> ventas_mes_lote.zip / .csv
+    base, extension = os.path.splitext(next(iter(resultados.values()))['archivo'])
+    carpeta_resultado = os.path.join(carpeta_trabajo, 'resultado')
+    os.makedirs(carpeta_resultado, exist_ok=True)
+    with instrumentacion.etapa('lote_reunir'):
+        if salida == 'zip':
+            archivo = f'{base}_lote.zip'
+            ruta = os.path.join(carpeta_resultado, archivo)
+            _empaquetar(resultados, errores, ruta)
+        else:
+            archivo = f'{base}_lote{extension}'
+            ruta = os.path.join(carpeta_resultado, archivo)
+            rutas_resultado = [resultados[entrada]['ruta'] for entrada in sorted(resultados)]
+            if lectura.es_parquet(archivo):
+                _combinar_parquet(rutas_resultado, ruta)
+            else:
+                _combinar_csv(rutas_resultado, ruta)
+
+    print(f"✅ Lote terminado: {len(resultados)} de {len(entradas)} archivos en {archivo}")
+    return {
+        'archivo': archivo,
+        'ruta': ruta,
+        'origen': 'cache',
+        'archivos': len(resultados),
+        'errores': [{'archivo': entrada, 'error': error} for entrada, error in sorted(errores.items())]
+    }
@@ -0,0 +1,98 @@
+"""
+Métricas Prometheus de la aplicación (expuestas en /metrics)
+
+Con varios workers de gunicorn (y los procesos de la cola de trabajos) cada
+proceso escribe sus valores en PROMETHEUS_MULTIPROC_DIR y /metrics los suma
+con MultiProcessCollector. start_gunicorn.sh define y vacía esa carpeta al
+iniciar. Sin la variable (desarrollo) se usa el registro del proceso.
+"""
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+)
+
+# Buckets en segundos desde una petición rápida hasta el timeout de gunicorn (1 hora)
+BUCKETS_SEGUNDOS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+# Buckets en bytes de 10 KB a 2 GB (MAX_CONTENT_LENGTH)
+BUCKETS_BYTES = tuple(10 * 1024 * 4 ** i for i in range(9)) + (2 * 1024 ** 3,)
+
+PETICION_SEGUNDOS = Histogram(
+    'convertidor_peticion_segundos', 'Latencia de las peticiones HTTP por ruta',
+    ['ruta', 'metodo', 'estado'], buckets=BUCKETS_SEGUNDOS
+)
+SUBIDA_BYTES = Histogram(
+    'convertidor_subida_bytes', 'Tamaño de los archivos subidos para procesar',
+    ['tipo'], buckets=BUCKETS_BYTES
+)
+TRANSFORMACION_SEGUNDOS = Histogram(
+    'convertidor_transformacion_segundos', 'Duración de la transformación de cada trabajo',
+    ['tipo', 'resultado'], buckets=BUCKETS_SEGUNDOS
+)
+CACHE_CONSULTAS = Counter(
+    'convertidor_cache_consultas_total', 'Consultas al cache de resultados (al procesar y al descargar)',
+    ['operacion', 'resultado']
+)
+CACHE_BYTES = Counter(
+    'convertidor_cache_bytes_total', 'Bytes guardados en el cache y servidos desde él',
+    ['operacion']
+)
+N8N_SEGUNDOS = Histogram(
+    'convertidor_n8n_segundos', 'Latencia de cada petición a los webhooks de n8n',
+    ['flujo', 'status'], buckets=BUCKETS_SEGUNDOS
+)
+N8N_BYTES = Counter(
+    'convertidor_n8n_bytes_total', 'Bytes enviados y recibidos de los webhooks de n8n',
+    ['flujo', 'direccion']
+)
+
+
+def _registro():
+    """Registro con los valores de todos los procesos (o el del proceso, sin multiproceso)"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+        return registro
+    from prometheus_client import REGISTRY
+    return REGISTRY
+
+
+def generar():
+    """Texto de exposición de Prometheus y su Content-Type, sumando todos los procesos"""
+    return generate_latest(_registro()), CONTENT_TYPE_LATEST
+
+
+def resumen_n8n():
+    """
+    Peticiones, errores, latencia y bytes por flujo de n8n, a partir de
+    N8N_SEGUNDOS y N8N_BYTES (todos los procesos)
+
+    Returns:
+        dict: flujo -> {'peticiones', 'errores', 'segundos_total', 'segundos_promedio',
+                        'bytes_enviados', 'bytes_recibidos', 'por_status'}
+    """
+    resumen = {}
+    for metrica in _registro().collect():
+        for muestra in metrica.samples:
+            if muestra.name not in ('convertidor_n8n_segundos_count', 'convertidor_n8n_segundos_sum',
+                                    'convertidor_n8n_bytes_total'):
+                continue
+            m = resumen.setdefault(muestra.labels['flujo'], {
+                'peticiones': 0, 'errores': 0, 'segundos_total': 0.0,
+                'bytes_enviados': 0, 'bytes_recibidos': 0, 'por_status': {}
+            })
+            if muestra.name == 'convertidor_n8n_segundos_count':
+                status = muestra.labels['status']
+                m['peticiones'] += int(muestra.value)
+                m['por_status'][status] = m['por_status'].get(status, 0) + int(muestra.value)
+                if status != '200':
+                    m['errores'] += int(muestra.value)
+            elif muestra.name == 'convertidor_n8n_segundos_sum':
+                m['segundos_total'] += muestra.value
+            else:
+                m[f"bytes_{muestra.labels['direccion']}"] += int(muestra.value)
+
+    for m in resumen.values():
+        m['segundos_promedio'] = round(m['segundos_total'] / m['peticiones'], 3) if m['peticiones'] else 0.0
+        m['segundos_total'] = round(m['segundos_total'], 3)
+    return resumen
@@ -0,0 +1,303 @@
+"""
+Envío de archivos a los webhooks de n8n
+
+El archivo se envía como multipart/form-data generado por bloques desde disco
+(nunca se carga completo en memoria). Los CSV grandes se pueden dividir en
+partes alineadas por filas, cada una con su encabezado, que n8n ingiere por
+separado. Las partes fallidas se reintentan con backoff y las aceptadas se
+registran, así un reenvío del mismo archivo continúa desde la última buena.
+
+Cada worker usa una sesión HTTP con pool de conexiones keep-alive hacia n8n y
+limita los envíos simultáneos. La latencia y los bytes de cada flujo se
+registran en las métricas Prometheus (metricas.py).
+"""
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
+import tempfile
+import threading
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+import cache
+import metricas
+
+ENVIOS_DIR = os.path.join(tempfile.gettempdir(), 'convertidor_envios_n8n')
+os.makedirs(ENVIOS_DIR, mode=0o755, exist_ok=True)
+
+BLOQUE_BYTES = 64 * 1024
+REINTENTOS = 3
+BACKOFF_SEGUNDOS = 2
+ESTADOS_REINTENTABLES = {429, 500, 502, 503, 504}
+SEPARADORES = re.compile(rb'["\n]')
+
+_sesion = None
+_semaforo = None
+_sesion_pid = None
+
+
+class CuerpoMultipart:
+    """
+    Cuerpo multipart/form-data iterable con longitud conocida: requests lo envía
+    por bloques con Content-Length, y se puede volver a iterar en cada reintento.
+
+    Args:
+        campos: dict de campos de texto
+        nombre_archivo: nombre con el que se envía el archivo en el campo 'data'
+        ruta: archivo en disco
+        inicio, fin: rango de bytes del archivo a enviar (fin=None hasta el final)
+        prefijo: bytes que se anteponen al rango (ej. la fila de encabezado)
+    """
+
+    def __init__(self, campos, nombre_archivo, ruta, inicio=0, fin=None, prefijo=b''):
+        self.ruta = ruta
+        self.inicio = inicio
+        self.fin = os.path.getsize(ruta) if fin is None else fin
+        self.prefijo = prefijo
+        self.boundary = uuid.uuid4().hex
+
+        partes = []
+        for nombre, valor in campos.items():
+            partes.append(
+                f'--{self.boundary}\r\n'
+                f'Content-Disposition: form-data; name="{nombre}"\r\n\r\n'
+                f'{"" if valor is None else valor}\r\n'.encode('utf-8')
+            )
+        partes.append(
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="data"; filename="{nombre_archivo}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n'.encode('utf-8')
+        )
+        self.cabecera = b''.join(partes)
+        self.cierre = f'\r\n--{self.boundary}--\r\n'.encode('utf-8')
+
+    @property
+    def content_type(self):
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    def __len__(self):
+        return len(self.cabecera) + len(self.prefijo) + (self.fin - self.inicio) + len(self.cierre)
+
+    def __iter__(self):
+        yield self.cabecera
+        if self.prefijo:
+            yield self.prefijo
+        with open(self.ruta, 'rb') as f:
+            f.seek(self.inicio)
+            pendientes = self.fin - self.inicio
+            while pendientes > 0:
+                bloque = f.read(min(BLOQUE_BYTES, pendientes))
+                if not bloque:
+                    break
+                pendientes -= len(bloque)
+                yield bloque
+        yield self.cierre
+
+
+def dividir_en_partes(ruta, filas_por_parte):
+    """
+    Divide un CSV en rangos de bytes de hasta filas_por_parte filas, cortando
+    solo en saltos de línea fuera de comillas.
+
+    Returns:
+        tuple: (encabezado en bytes, lista de (inicio, fin))
+    """
+    with open(ruta, 'rb') as f:
+        encabezado = f.readline()
+        posicion = inicio = len(encabezado)
+        filas = 0
+        en_comillas = False
+        rangos = []
+
+        for bloque in iter(lambda: f.read(1024 * 1024), b''):
+            if not en_comillas and b'"' not in bloque and filas + bloque.count(b'\n') < filas_por_parte:
+                # Camino rápido: el bloque completo cabe en la parte actual
+                filas += bloque.count(b'\n')
+            else:
+                for marca in SEPARADORES.finditer(bloque):
+                    if marca.group() == b'"':
+                        en_comillas = not en_comillas
+                    elif not en_comillas:
+                        filas += 1
+                        if filas == filas_por_parte:
+                            fin = posicion + marca.end()
+                            rangos.append((inicio, fin))
+                            inicio, filas = fin, 0
+            posicion += len(bloque)
+
+    if posicion > inicio or not rangos:
+        # Última parte (o solo encabezado si el archivo no tiene filas)
+        rangos.append((inicio, posicion))
+    return encabezado, rangos
+
+
+def _ruta_envio(envio_id):
+    return os.path.join(ENVIOS_DIR, f'{envio_id}.json')
+
+
+def _leer_envio(envio_id):
+    try:
+        with open(_ruta_envio(envio_id), 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _guardar_envio(envio):
+    ruta = _ruta_envio(envio['id'])
+    temporal = f'{ruta}.{os.getpid()}.tmp'
+    with open(temporal, 'w') as f:
+        json.dump(envio, f)
+    os.replace(temporal, ruta)
+
+
+def _obtener_sesion():
+    """Sesión con pool de conexiones y semáforo de envíos por worker (se recrean tras un fork)"""
+    global _sesion, _semaforo, _sesion_pid
+    if _sesion is None or _sesion_pid != os.getpid():
+        _sesion = requests.Session()
+        adaptador = HTTPAdapter(
+            pool_connections=Config.N8N_POOL_CONEXIONES,
+            pool_maxsize=Config.N8N_POOL_MAX,
+            pool_block=True
+        )
+        _sesion.mount('https://', adaptador)
+        _sesion.mount('http://', adaptador)
+        _semaforo = threading.BoundedSemaphore(Config.N8N_MAX_CONCURRENTES)
+        _sesion_pid = os.getpid()
+    return _sesion, _semaforo
+
+
+def _timeouts(config_flujo):
+    """(conexión, lectura, total) en segundos, del flujo o de config.py"""
+    return (
+        float(config_flujo.get('timeout_conexion') or Config.N8N_TIMEOUT_CONEXION),
+        float(config_flujo.get('timeout_lectura') or Config.N8N_TIMEOUT_LECTURA),
+        float(config_flujo.get('timeout_total') or Config.N8N_TIMEOUT_TOTAL)
+    )
+
+
+def _registrar_metrica(flujo, segundos, bytes_enviados, bytes_recibidos=0, status_code=None):
+    """Registra una petición al webhook en las métricas Prometheus del flujo"""
+    metricas.N8N_SEGUNDOS.labels(flujo=flujo, status=str(status_code or 'error')).observe(segundos)
+    metricas.N8N_BYTES.labels(flujo=flujo, direccion='enviados').inc(bytes_enviados)
+    metricas.N8N_BYTES.labels(flujo=flujo, direccion='recibidos').inc(bytes_recibidos)
+
+
+def _post_con_reintentos(flujo, webhook_url, cuerpo, descripcion, timeouts, limite):
+    """
+    POST del cuerpo con reintentos y backoff exponencial ante errores de red o 5xx/429.
+    limite es el instante (time.monotonic) en que vence el timeout total del envío.
+    """
+    sesion, semaforo = _obtener_sesion()
+    conexion, lectura, _ = timeouts
+
+    for intento in range(1, REINTENTOS + 1):
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            raise requests.exceptions.Timeout(f'{descripcion}: se agotó el tiempo total del envío')
+
+        inicio = time.monotonic()
+        try:
+            with semaforo:
+                response = sesion.post(
+                    webhook_url,
+                    data=cuerpo,
+                    headers={'Content-Type': cuerpo.content_type},
+                    timeout=(conexion, min(lectura, restante))
+                )
+            _registrar_metrica(flujo, time.monotonic() - inicio, len(cuerpo), len(response.content), response.status_code)
+            if response.status_code not in ESTADOS_REINTENTABLES or intento == REINTENTOS:
+                return response
+            print(f"[WARNING] {descripcion}: n8n respondió {response.status_code}, reintento {intento}/{REINTENTOS}")
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            _registrar_metrica(flujo, time.monotonic() - inicio, len(cuerpo))
+            if intento == REINTENTOS:
+                raise
+            print(f"[WARNING] {descripcion}: {type(e).__name__}, reintento {intento}/{REINTENTOS}")
+        time.sleep(min(BACKOFF_SEGUNDOS ** intento, max(limite - time.monotonic(), 0)))
+
+
+def enviar_archivo(flujo, config_flujo, ruta, nombre_archivo, usuario, hash_contenido=None):
+    """
+    Envía el archivo al webhook del flujo, en partes si el flujo define
+    'filas_por_parte' y el archivo es CSV. hash_contenido (SHA-256 ya calculado
+    al recibir la subida) evita volver a leer el archivo para identificar el envío.
+
+    Returns:
+        dict: {'exito': bool, 'total_partes', 'aceptadas', 'status_code', 'response'}
+    """
+    webhook_url = config_flujo['webhook_url']
+    campos = {
+        'archivo': nombre_archivo,
+        'usuario': usuario,
+        'tipo_flujo': flujo
+    }
+
+    timeouts = _timeouts(config_flujo)
+    limite = time.monotonic() + timeouts[2]
+
+    filas_por_parte = config_flujo.get('filas_por_parte') or 0
+    if not (filas_por_parte and nombre_archivo.lower().endswith('.csv')):
+        print(f"[INFO] Enviando archivo {nombre_archivo} ({os.path.getsize(ruta)} bytes) a {config_flujo['nombre']}")
+        response = _post_con_reintentos(flujo, webhook_url, CuerpoMultipart(campos, nombre_archivo, ruta), nombre_archivo, timeouts, limite)
+        return {
+            'exito': response.status_code == 200,
+            'total_partes': 1,
+            'aceptadas': 1 if response.status_code == 200 else 0,
+            'status_code': response.status_code,
+            'response': response
+        }
+
+    # Mismo archivo + flujo + tamaño de parte = mismo envío: se retoman las partes pendientes
+    hash_contenido = hash_contenido or cache.hash_archivo(ruta)
+    envio_id = hashlib.sha256(f'{hash_contenido}:{flujo}:{filas_por_parte}'.encode()).hexdigest()
+    encabezado, rangos = dividir_en_partes(ruta, filas_por_parte)
+    envio = _leer_envio(envio_id) or {
+        'id': envio_id,
+        'archivo': nombre_archivo,
+        'flujo': flujo,
+        'total_partes': len(rangos),
+        'aceptadas': [],
+        'creado': datetime.now().isoformat()
+    }
+    aceptadas = set(envio['aceptadas'])
+    if aceptadas:
+        print(f"[INFO] Reanudando envío {envio_id[:12]}: {len(aceptadas)}/{len(rangos)} partes ya aceptadas")
+
+    response = None
+    for numero, (inicio, fin) in enumerate(rangos, start=1):
+        if numero in aceptadas:
+            continue
+
+        campos_parte = dict(campos, envio_id=envio_id, parte=numero, total_partes=len(rangos))
+        cuerpo = CuerpoMultipart(campos_parte, nombre_archivo, ruta, inicio, fin, prefijo=encabezado)
+        descripcion = f"{nombre_archivo} parte {numero}/{len(rangos)}"
+        print(f"[INFO] Enviando {descripcion} ({len(cuerpo)} bytes) a {config_flujo['nombre']}")
+
+        response = _post_con_reintentos(flujo, webhook_url, cuerpo, descripcion, timeouts, limite)
+        if response.status_code != 200:
+            break
+
+        aceptadas.add(numero)
+        envio['aceptadas'] = sorted(aceptadas)
+        _guardar_envio(envio)
+
+    exito = len(aceptadas) == len(rangos)
+    if exito and os.path.exists(_ruta_envio(envio_id)):
+        # Envío completo: un reenvío posterior del mismo archivo vuelve a empezar
+        os.remove(_ruta_envio(envio_id))
+
+    return {
+        'exito': exito,
+        'total_partes': len(rangos),
+        'aceptadas': len(aceptadas),
+        'status_code': response.status_code if response is not None else 200,
+        'response': response
+    }
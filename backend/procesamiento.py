@@ -0,0 +1,58 @@
+"""
+Ejecución de las transformaciones de /procesar/<tipo>
+Se usa desde los procesos de la cola de trabajos (jobs.py)
+
+Cada script registra su transformación en scripts.pipeline al importarse; aquí
+solo se agregan las opciones que vienen de Config.
+"""
+import os
+from config import Config
+from scripts import pipeline
+# Registran sus transformaciones
+from scripts import clientes, venta_material, unir_ventas, exhibidores  # noqa: F401
+
+TIPOS_VALIDOS = set(pipeline.REGISTRO)
+
+# Filas por lote de cada pipeline (los demás usan Config.PIPELINE_FILAS_POR_LOTE)
+FILAS_POR_LOTE = {
+    'venta_material': Config.VENTA_MATERIAL_CHUNKSIZE,
+    'clientes': Config.CLIENTES_FILAS_POR_LOTE,
+}
+
+
+def obtener(tipo):
+    """Transformación registrada para el tipo (ValueError si no existe)"""
+    return pipeline.obtener(tipo)
+
+
+def por_ruta(ruta):
+    """Transformación de /transform/<ruta>, o None"""
+    return pipeline.por_ruta(ruta)
+
+
+def opciones(tipo):
+    """Opciones de Config para ejecutar (y validar) la transformación"""
+    return {
+        'filas_por_lote': FILAS_POR_LOTE.get(tipo, Config.PIPELINE_FILAS_POR_LOTE),
+        'carpeta_almacen': os.path.abspath(Config.VENTAS_ACUM_FOLDER),
+        'trabajadores': Config.UNION_TRABAJADORES,
+        'min_bytes_paralelo': Config.UNION_MIN_BYTES_PARALELO,
+    }
+
+
+def ejecutar_tipo(tipo, archivos, parametros, carpeta_trabajo):
+    """
+    Ejecuta la transformación registrada para el tipo de procesamiento
+
+    Args:
+        tipo: clientes, venta_material, exhibidores, union_ventas o cualquier otro registrado
+        archivos: dict campo del formulario -> ruta del archivo subido
+        parametros: dict con parámetros adicionales (ej. 'mes', 'formato' csv | parquet)
+        carpeta_trabajo: carpeta temporal donde se escribe el resultado
+
+    Returns:
+        dict: {'archivo': nombre, 'ruta': ruta del resultado o None, 'origen': 'cache' | 'ventas_acumuladas'}
+    """
+    transformacion = obtener(tipo)
+    print(f"[INFO] Procesando {tipo} con su transformación registrada")
+    return transformacion.ejecutar_trabajo(archivos, parametros, carpeta_trabajo, opciones(tipo))
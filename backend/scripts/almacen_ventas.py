@@ -0,0 +1,234 @@
+"""
+Almacén particionado de ventas acumuladas.
+
+Cada mes se guarda en su propia partición CSV (mes_<valor>.csv) dentro de la
+carpeta del almacén. Unir un mes nuevo solo reemplaza su partición, y el
+acumulado completo se genera concatenando las particiones en orden de mes.
+"""
+import os
+import re
+import time
+import fcntl
+import tempfile
+from contextlib import contextmanager
+
+import pandas as pd
+
+PREFIJO = 'mes_'
+BLOQUE_BYTES = 1024 * 1024
+# Filas por lote al alinear columnas de particiones con encabezados distintos
+FILAS_POR_LOTE = 100000
+
+
+def _clave_mes(mes):
+    """Normaliza el valor de la columna 'Mes' a un texto apto para nombre de archivo"""
+    if mes is None or pd.isna(mes):
+        return 'nan'
+    if isinstance(mes, float) and mes.is_integer():
+        mes = int(mes)
+    clave = re.sub(r'[^0-9A-Za-z_-]', '_', str(mes).strip())
+    return clave or 'nan'
+
+
+def _orden_clave(clave):
+    """Orden equivalente a sort_values(by='Mes'): numéricos primero, 'nan' al final"""
+    if clave == 'nan':
+        return (2, 0, '')
+    try:
+        return (0, float(clave), '')
+    except ValueError:
+        return (1, 0, clave)
+
+
+def ruta_particion(carpeta, mes):
+    return os.path.join(carpeta, f"{PREFIJO}{_clave_mes(mes)}.csv")
+
+
+def listar_particiones(carpeta):
+    """Devuelve las rutas de las particiones ordenadas por mes"""
+    if not os.path.isdir(carpeta):
+        return []
+    claves = [
+        nombre[len(PREFIJO):-len('.csv')]
+        for nombre in os.listdir(carpeta)
+        if nombre.startswith(PREFIJO) and nombre.endswith('.csv')
+    ]
+    claves.sort(key=_orden_clave)
+    return [os.path.join(carpeta, f"{PREFIJO}{clave}.csv") for clave in claves]
+
+
+def almacen_vacio(carpeta):
+    return not listar_particiones(carpeta)
+
+
+@contextmanager
+def bloqueo(carpeta, compartido=False, espera=0.05):
+    """
+    Bloqueo entre procesos sobre el almacén: exclusivo mientras se modifica,
+    compartido mientras se abren las particiones para leerlas. La espera es con
+    sleep para no detener el event loop de los workers gevent.
+    """
+    os.makedirs(carpeta, exist_ok=True)
+    modo = fcntl.LOCK_SH if compartido else fcntl.LOCK_EX
+    with open(os.path.join(carpeta, '.lock'), 'w') as lock:
+        while True:
+            try:
+                fcntl.flock(lock, modo | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                time.sleep(espera)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _leer_encabezado(ruta):
+    with open(ruta, 'rb') as f:
+        return f.readline()
+
+
+def _escribir_atomico(df, ruta):
+    """Escribe la partición en un temporal y la reemplaza con os.replace"""
+    carpeta = os.path.dirname(ruta)
+    fd, temporal = tempfile.mkstemp(dir=carpeta, suffix='.tmp')
+    os.close(fd)
+    try:
+        df.to_csv(temporal, index=False, encoding='utf-8')
+        os.replace(temporal, ruta)
+    except Exception:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+
+def _alinear_columnas(df, carpeta):
+    """Reordena las columnas según las particiones existentes si son las mismas"""
+    particiones = listar_particiones(carpeta)
+    if not particiones:
+        return df
+    encabezado = pd.read_csv(particiones[0], nrows=0, encoding='utf-8').columns.tolist()
+    if set(encabezado) == set(df.columns) and len(encabezado) == len(df.columns):
+        return df[encabezado]
+    return df
+
+
+def _por_particion(df):
+    """
+    Divide el DataFrame por partición (clave de 'Mes'), conservando el orden de
+    las filas. Valores de mes distintos con la misma clave (ej. 5 y 5.0) van juntos.
+    """
+    grupos = {}
+    for mes, df_particion in df.groupby('Mes', sort=False, dropna=False):
+        grupos.setdefault(_clave_mes(mes), []).append(df_particion)
+    for clave, partes in grupos.items():
+        yield clave, partes[0] if len(partes) == 1 else pd.concat(partes).sort_index()
+
+
+def escribir_meses(df, carpeta):
+    """
+    Reemplaza la partición de cada mes presente en df (un archivo mensual puede
+    traer filas de varios meses)
+
+    Returns:
+        list: rutas de las particiones escritas
+    """
+    if 'Mes' not in df.columns:
+        raise ValueError("El archivo mensual debe contener una columna 'Mes'")
+
+    rutas = []
+    with bloqueo(carpeta):
+        df = _alinear_columnas(df, carpeta)
+        for clave, df_particion in _por_particion(df):
+            ruta = ruta_particion(carpeta, clave)
+            _escribir_atomico(df_particion, ruta)
+            rutas.append(ruta)
+            print(f"[INFO] Partición actualizada: {os.path.basename(ruta)} ({len(df_particion)} filas)")
+    return rutas
+
+
+def inicializar_desde_acumulado(df_acum, carpeta):
+    """Reconstruye el almacén completo a partir de un DataFrame acumulado"""
+    if 'Mes' not in df_acum.columns:
+        raise ValueError("El archivo acumulado no contiene columna 'Mes'")
+
+    with bloqueo(carpeta):
+        for ruta in listar_particiones(carpeta):
+            os.remove(ruta)
+        for clave, df_particion in _por_particion(df_acum):
+            _escribir_atomico(df_particion, ruta_particion(carpeta, clave))
+    print(f"[INFO] Almacén inicializado con {len(listar_particiones(carpeta))} particiones")
+
+
+@contextmanager
+def _particiones_abiertas(carpeta):
+    """
+    Abre todas las particiones bajo el bloqueo compartido. Los archivos abiertos
+    siguen leyendo esa versión aunque luego se reemplacen o eliminen, así una
+    descarga nunca mezcla particiones de antes y después de una escritura.
+    """
+    archivos = []
+    try:
+        with bloqueo(carpeta, compartido=True):
+            for ruta in listar_particiones(carpeta):
+                archivos.append(open(ruta, 'rb'))
+        yield archivos
+    finally:
+        for f in archivos:
+            f.close()
+
+
+def _bloques(f):
+    while True:
+        bloque = f.read(BLOQUE_BYTES)
+        if not bloque:
+            break
+        yield bloque
+
+
+def iterar_bytes(carpeta):
+    """
+    Genera el acumulado completo concatenando las particiones en orden de mes,
+    sin parsearlas. Si los encabezados difieren entre particiones, las columnas
+    se unen como lo haría pd.concat y cada partición distinta se alinea por lotes.
+    """
+    if almacen_vacio(carpeta):
+        return
+
+    with _particiones_abiertas(carpeta) as archivos:
+        encabezados = [f.readline() for f in archivos]
+        if len(set(encabezados)) == 1:
+            yield encabezados[0]
+            for f in archivos:
+                yield from _bloques(f)
+            return
+
+        print("[WARNING] Particiones con columnas distintas, alineando por lotes")
+        columnas = []
+        for f in archivos:
+            f.seek(0)
+            for columna in pd.read_csv(f, nrows=0, encoding='utf-8').columns:
+                if columna not in columnas:
+                    columnas.append(columna)
+        encabezado = pd.DataFrame(columns=columnas).to_csv(index=False).encode('utf-8')
+        yield encabezado
+
+        for f in archivos:
+            f.seek(0)
+            if f.readline() == encabezado:
+                yield from _bloques(f)
+                continue
+            f.seek(0)
+            # Como texto: los valores salen tal como están en la partición
+            for lote in pd.read_csv(f, dtype=str, keep_default_na=False, encoding='utf-8',
+                                    chunksize=FILAS_POR_LOTE):
+                yield lote.reindex(columns=columnas, fill_value='').to_csv(index=False, header=False).encode('utf-8')
+
+
+def exportar(carpeta, ruta_salida):
+    """Escribe el acumulado completo en ruta_salida"""
+    with open(ruta_salida, 'wb') as salida:
+        for bloque in iterar_bytes(carpeta):
+            salida.write(bloque)
+    return ruta_salida
+
@@ -1,56 +1,62 @@
-import pandas as pd
-import os
-
-def ejecutar(archivo_entrada, carpeta_salida):
-    print("\n📊 Procesamiento: Base de datos de clientes")
-
-    os.makedirs(carpeta_salida, exist_ok=True)
-    archivo_salida = os.path.join(carpeta_salida, "maestra_clientes.csv")
-
+from scripts import lectura, pipeline, tipos
+
+# Correcciones de valores mal codificados en el maestro de clientes
+REEMPLAZOS = {
+    'Ciudad': {'MOQITOS': 'MONITOS'},
+    'Segmento': {
+        'Reposicisn': 'Reposicion',
+        'AU Multimisisn': 'AU Multimision',
+        'Servicios de Alimentacisn': 'Servicios de Alimentacion',
+        'Centros de diversisn': 'Centros de diversion'
+    }
+}
+
+# Columnas esperadas
+COLUMNAS = [
+    'Codigo Ecom', 'Sucursal', 'Documento', 'Ra. Social', 'Nombre Neg',
+    'Dpto', 'Ciudad', 'Barrio', 'Segmento', 'Fecha',
+    'Coordenada Y', 'Coordenada X', 'Exhibidor', 'Cod.Asesor',
+    'Asesor', 'Coordenadas Gis', 'Socios Nutresa'
+]
+
+# Columnas con pocos valores distintos que se guardan como category. Codigo Ecom,
+# Documento, Exhibidor y Cod.Asesor no: se pasan a texto y sus nulos deben quedar 'nan'
+PLAN_TIPOS = {
+    'Dpto': tipos.CATEGORIA,
+    'Ciudad': tipos.CATEGORIA,
+    'Barrio': tipos.CATEGORIA,
+    'Segmento': tipos.CATEGORIA,
+    'Asesor': tipos.CATEGORIA,
+    'Socios Nutresa': tipos.CATEGORIA,
+}
+
+# Los .xlsx se leen por lotes (solo COLUMNAS) con sus correcciones; antes de
+# pasar columnas a texto cada lote toma los tipos que pd.read_excel daría al
+# libro completo, sin concatenarlos. Los CSV (separador detectado) se leen completos.
+PIPELINE = pipeline.registrar(pipeline.Pipeline('clientes', 'maestra_clientes.csv', [
+    pipeline.Leer(extensiones=('.xlsx', '.csv'), dtype={'Codigo Ecom': str}, plan_tipos=PLAN_TIPOS,
+                  lotes=('.xlsx',), sep=None, engine="python"),
+    pipeline.Seleccionar(COLUMNAS),
+    # Correcciones
+    pipeline.Reemplazar(REEMPLAZOS),
+    pipeline.UnificarTipos(),
+    # Conversión de tipos
+    pipeline.Convertir({
+        'Codigo Ecom': 'texto',
+        'Documento': 'texto',
+        'Exhibidor': 'texto',
+        'Cod.Asesor': 'texto',
+    }),
+    pipeline.ConvertirFecha('Fecha', '%d-%m-%Y'),
+    pipeline.Escribir(encoding="utf-8"),
+], titulo="📊 Procesamiento: Base de datos de clientes"))
+
+def ejecutar(archivo_entrada, carpeta_salida, formato='csv', filas_por_lote=lectura.FILAS_POR_LOTE_EXCEL):
+    """
+    Los .xlsx se leen por lotes de filas_por_lote filas (solo las columnas
+    usadas); con filas_por_lote=0 se carga el libro completo con pd.read_excel.
+    """
     try:
-        # Detectar extensión del archivo cargado
-        extension = os.path.splitext(archivo_entrada)[1].lower()
-        nombre_archivo = os.path.basename(archivo_entrada)
-        print(f"✅ Archivo recibido: {nombre_archivo}")
-
-        # Leer según el tipo de archivo
-    
-        if extension == ".xlsx":
-            df = pd.read_excel(archivo_entrada, engine="openpyxl", dtype={'Codigo Ecom': str})
-        elif extension == ".csv":
-            df = pd.read_csv(archivo_entrada, sep=None, engine="python", dtype={'Codigo Ecom': str})
-        else:
-            raise ValueError("❌ Formato de archivo no soportado.")
-
-        # Columnas esperadas
-        columnas = [
-            'Codigo Ecom', 'Sucursal', 'Documento', 'Ra. Social', 'Nombre Neg',
-            'Dpto', 'Ciudad', 'Barrio', 'Segmento', 'Fecha',
-            'Coordenada Y', 'Coordenada X', 'Exhibidor', 'Cod.Asesor',
-            'Asesor', 'Coordenadas Gis', 'Socios Nutresa'
-        ]
-        df = df[columnas].copy()
-
-        # Correcciones
-        df['Ciudad'] = df['Ciudad'].replace({'MOQITOS': 'MONITOS'})
-        df['Segmento'] = df['Segmento'].replace({
-            'Reposicisn': 'Reposicion',
-            'AU Multimisisn': 'AU Multimision',
-            'Servicios de Alimentacisn': 'Servicios de Alimentacion',
-            'Centros de diversisn': 'Centros de diversion'
-        })
-
-        # Conversión de tipos
-        df['Codigo Ecom'] = df['Codigo Ecom'].astype(str)
-        df['Documento'] = df['Documento'].astype(str)
-        df['Exhibidor'] = df['Exhibidor'].astype(str)
-        df['Cod.Asesor'] = df['Cod.Asesor'].astype(str)
-        df['Fecha'] = pd.to_datetime(df['Fecha'], errors='coerce')
-        df['Fecha'] = df['Fecha'].dt.strftime('%d-%m-%Y')
-
-        df.to_csv(archivo_salida, index=False, encoding="utf-8")
-        print(f"📁 Archivo transformado guardado en: {archivo_salida}")
-    
+        PIPELINE.ejecutar(archivo_entrada, carpeta_salida, formato, filas_por_lote=filas_por_lote)
     except Exception as e:
         print(f"❌ Error durante el procesamiento: {e}")
-
@@ -0,0 +1,163 @@
+"""
+Escritura de resultados en CSV o Parquet.
+
+Parquet guarda los tipos de columna (Cliente y Documento siguen siendo texto),
+así la unión de ventas y otras cargas no tienen que volver a parsear texto ni
+adivinar tipos. El encoding que tendría el CSV equivalente se guarda en los
+metadatos del archivo para convertirlo a CSV al descargarlo.
+"""
+import os
+import pandas as pd
+
+FORMATOS = ('csv', 'parquet')
+META_ENCODING_CSV = b'convertidor.encoding_csv'
+FILAS_POR_LOTE_CSV = 100000
+
+
+def validar_formato(formato):
+    formato = (formato or 'csv').lower()
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de salida no soportado: {formato}. Use {' o '.join(FORMATOS)}")
+    return formato
+
+
+def nombre_salida(nombre_csv, formato):
+    """maestra_clientes.csv -> maestra_clientes.parquet según el formato"""
+    return f"{os.path.splitext(nombre_csv)[0]}.{validar_formato(formato)}"
+
+
+def _valores_mixtos(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # category del plan de tipos: se revisan sus categorías
+        serie = serie.cat.categories
+    elif serie.dtype != object:
+        return False
+    return pd.api.types.infer_dtype(serie, skipna=True).startswith('mixed')
+
+
+def _texto_en_mixtas(df, texto=()):
+    """
+    Columnas object con tipos mezclados (ej. 5 y 'A5') se guardan como texto,
+    igual que en el CSV. 'texto': columnas que se mezclan entre lotes aunque
+    este lote no lo haga.
+    """
+    mixtas = [columna for columna in df.columns if columna in texto or _valores_mixtos(df[columna])]
+    if not mixtas:
+        return df
+    df = df.copy()
+    for columna in mixtas:
+        serie = df[columna].astype(object)
+        df[columna] = serie.where(serie.isna(), serie.astype(str))
+    return df
+
+
+def _tipo_arrow(tipo):
+    """
+    Tipo de Arrow con que se guarda una columna: el mismo que sin el plan de
+    tipos (category -> sus valores, string[pyarrow] -> string, int8/16/32 -> int64)
+    """
+    import pyarrow as pa
+
+    if pa.types.is_dictionary(tipo):
+        tipo = tipo.value_type
+    if pa.types.is_large_string(tipo):
+        return pa.string()
+    if pa.types.is_signed_integer(tipo):
+        return pa.int64()
+    # Columnas completamente vacías en el primer lote se guardan como texto
+    if pa.types.is_null(tipo):
+        return pa.string()
+    return tipo
+
+
+def _tabla_arrow(df, encoding_csv, schema=None, texto=()):
+    import pyarrow as pa
+
+    tabla = pa.Table.from_pandas(_texto_en_mixtas(df, texto), preserve_index=False)
+    if schema is not None:
+        return tabla.cast(schema)
+
+    campos = [pa.field(campo.name, _tipo_arrow(campo.type)) for campo in tabla.schema]
+    metadatos = dict(tabla.schema.metadata or {})
+    metadatos[META_ENCODING_CSV] = encoding_csv.encode()
+    return tabla.cast(pa.schema(campos, metadata=metadatos))
+
+
+def escribir(df, ruta, formato='csv', encoding='utf-8'):
+    """Escribe el DataFrame completo en el formato indicado"""
+    if validar_formato(formato) == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(_tabla_arrow(df, encoding), ruta)
+    else:
+        df.to_csv(ruta, index=False, encoding=encoding)
+
+
+class EscritorPorLotes:
+    """
+    Agrega lotes de un DataFrame al archivo de salida.
+
+    En Parquet cada lote es un row group con el esquema del primer lote; un lote
+    cuyos tipos no se puedan convertir a ese esquema produce ValueError.
+    """
+
+    def __init__(self, ruta, formato='csv', encoding='utf-8'):
+        self.ruta = ruta
+        self.formato = validar_formato(formato)
+        self.encoding = encoding
+        self.lotes = 0
+        self._writer = None
+        self._schema = None
+
+    def escribir(self, lote, texto=()):
+        """
+        Args:
+            texto: columnas que en Parquet se guardan como texto en todos los lotes
+                   (sus valores mezclan tipos entre lotes)
+        """
+        if self.formato == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            try:
+                tabla = _tabla_arrow(lote, self.encoding, self._schema, texto)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                raise ValueError(f"Los tipos de columna cambiaron entre lotes: {e}")
+            if self._writer is None:
+                self._schema = tabla.schema
+                self._writer = pq.ParquetWriter(self.ruta, self._schema)
+            self._writer.write_table(tabla)
+        else:
+            lote.to_csv(self.ruta, index=False, encoding=self.encoding,
+                        mode='w' if self.lotes == 0 else 'a', header=(self.lotes == 0))
+        self.lotes += 1
+
+    def cerrar(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+        return False
+
+
+def iterar_csv(origen, filas_por_lote=FILAS_POR_LOTE_CSV):
+    """
+    Convierte un Parquet (ruta o archivo abierto) a CSV por lotes de bytes, con
+    el encoding que habría usado el script, sin cargarlo completo en memoria.
+    """
+    import pyarrow.parquet as pq
+
+    archivo = pq.ParquetFile(origen)
+    metadatos = archivo.schema_arrow.metadata or {}
+    encoding = metadatos.get(META_ENCODING_CSV, b'utf-8').decode()
+
+    encabezado = True
+    for lote in archivo.iter_batches(batch_size=filas_por_lote):
+        yield lote.to_pandas().to_csv(index=False, header=encabezado).encode(encoding)
+        encabezado = False
+    if encabezado:
+        yield pd.DataFrame(columns=archivo.schema_arrow.names).to_csv(index=False).encode(encoding)
@@ -1,56 +1,49 @@
-import os
-import glob
-import pandas as pd
 import numpy as np
-
-def ejecutar(archivo_entrada, carpeta_salida):
-    print("\n📊 Procesamiento: Base de datos de exhibidores")
-
-    
-    os.makedirs(carpeta_salida, exist_ok=True)
-    archivo_salida = os.path.join(carpeta_salida, "Exhibidores.csv")
-
+from scripts import pipeline, tipos
+
+# Columnas con pocos valores distintos (Numero y Cod. Cliente se leen como texto)
+PLAN_TIPOS = {
+    'Tipo': tipos.CATEGORIA,
+    'Estado': tipos.CATEGORIA,
+    'Ciudad': tipos.CATEGORIA,
+}
+
+# Tipos que no se incluyen en la base
+TIPO_EXCLUIDO = '40089999-MUEBLE SNACKERO ABARROTERO MOSTRADOR'
+# Muebles con nevera que se clasifican como Snackero
+SNACKEROS_CON_NEVERA = [
+    '40089141-MUEBLE SNACKERO PISO GRANDE CON NEVERA',
+    '40089142-MUEBLE SNACKERO PISO CON NEVERA'
+]
+
+def _comodato(serie):
+    return serie.astype(str).str.replace(';', '')
+
+def _categoria(df, parametros):
+    categoria = np.where(df['Tipo'].str.contains('NEVERA'), 'Nevera', 'Snackero')
+    categoria[df['Tipo'].isin(SNACKEROS_CON_NEVERA).to_numpy()] = 'Snackero'
+    return categoria
+
+def _cod_cliente(serie):
+    return serie.str.replace('.0', '', regex=False)
+
+PIPELINE = pipeline.registrar(pipeline.Pipeline('exhibidores', 'Exhibidores.csv', [
+    pipeline.Leer(dtype={'Numero': str, 'Cod. Cliente': str}, plan_tipos=PLAN_TIPOS, sep='|'),
+    # Tipos como en la lectura completa (un Valor vacío deja la columna float en todo el archivo)
+    pipeline.UnificarTipos(),
+    # Correcciones y transformaciones
+    pipeline.Convertir({'Numero': 'texto', 'Cod. Cliente': 'texto', 'Num. Comodato': _comodato}),
+    pipeline.Descartar(['Unnamed: 12']),
+    pipeline.Filtrar('Estado', igual='A'),
+    pipeline.Filtrar('Tipo', distinto=TIPO_EXCLUIDO),
+    pipeline.Agregar('Categoria', _categoria),
+    pipeline.Convertir({'Cod. Cliente': _cod_cliente}),
+    pipeline.Deduplicar(['Numero']),
+    pipeline.Escribir(),
+], titulo="📊 Procesamiento: Base de datos de exhibidores"))
+
+def ejecutar(archivo_entrada, carpeta_salida, formato='csv', filas_por_lote=pipeline.FILAS_POR_LOTE):
     try:
-        extension = os.path.splitext(archivo_entrada)[1].lower()
-        
-
-        # Leer el archivo CSV con multi-encoding fallback
-        if extension != ".csv":
-            raise ValueError("Formato no soportado.")
-        elif extension == ".csv":
-            for encoding in ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']:
-                try:
-                    df = pd.read_csv(archivo_entrada, sep='|', encoding=encoding, dtype={'Numero': str,'Cod. Cliente': str})
-                    print(f"[INFO] CSV leído con encoding: {encoding}")
-                    break
-                except (UnicodeDecodeError, UnicodeError):
-                    continue
-            else:
-                raise ValueError("No se pudo leer el archivo CSV con los encodings disponibles.")
-
-        # Correcciones y transformaciones
-        df['Numero'] = df['Numero'].astype(str)
-        df['Cod. Cliente'] = df['Cod. Cliente'].astype(str)
-        df['Num. Comodato'] = df['Num. Comodato'].astype(str)
-
-        if 'Unnamed: 12' in df.columns:
-            df = df.drop(columns=['Unnamed: 12'])
-
-        df['Num. Comodato'] = df['Num. Comodato'].str.replace(';', '')
-        df = df[df['Estado'] == 'A']
-        df = df[df['Tipo'] != '40089999-MUEBLE SNACKERO ABARROTERO MOSTRADOR']
-
-        df['Categoria'] = np.where(df['Tipo'].str.contains('NEVERA'), 'Nevera', 'Snackero')
-        df.loc[df['Tipo'].isin([
-            '40089141-MUEBLE SNACKERO PISO GRANDE CON NEVERA',
-            '40089142-MUEBLE SNACKERO PISO CON NEVERA'
-        ]), 'Categoria'] = 'Snackero'
-
-        df['Cod. Cliente'] = df['Cod. Cliente'].str.replace('.0', '', regex=False)
-        df.drop_duplicates(subset=['Numero'], inplace=True)
-
-        df.to_csv(archivo_salida, index=False)
-        print(f"📁 Archivo transformado guardado en: {archivo_salida}")
-
+        PIPELINE.ejecutar(archivo_entrada, carpeta_salida, formato, filas_por_lote=filas_por_lote)
     except Exception as e:
         print(f"❌ Error durante el procesamiento: {e}")
@@ -0,0 +1,79 @@
+"""
+Conversión de columnas de fecha sobre sus valores distintos.
+
+pd.to_datetime(serie, errors='coerce') adivina el formato con el primer valor
+de texto y luego parsea fila por fila, y .dt.strftime / .dt.month recorren de
+nuevo cada fila. Columnas como Fecha (maestra de clientes) o Mes (ventas)
+repiten unos pocos valores, así que aquí el formato se detecta una sola vez,
+se convierte cada valor distinto con ese formato explícito y el resultado se
+reconstruye con los códigos de pd.factorize. La salida es idéntica.
+"""
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+# Textos que pandas trata como fecha nula al buscar el primer valor
+_TEXTOS_NULOS = {'', 'NaT', 'nat', 'NAT', 'nan', 'NaN', 'NAN'}
+
+
+def primer_valor(valores, muestra=1000):
+    """Primer valor no nulo de 'valores' (los textos como 'NaT' o 'nan' cuentan como nulos) o None"""
+    for valor in valores[:muestra]:
+        if isinstance(valor, str):
+            if valor in _TEXTOS_NULOS:
+                continue
+            return valor
+        if not pd.isna(valor):
+            return valor
+    return None
+
+
+def detectar_formato(valores, muestra=1000):
+    """
+    Formato del primer valor no nulo, igual que la inferencia de pd.to_datetime
+
+    Args:
+        valores: valores a revisar en orden (ej. los distintos de la columna)
+        muestra: máximo de valores a revisar
+
+    Returns:
+        str o None: None si el primer valor no es texto o no se reconoce el formato
+    """
+    valor = primer_valor(valores, muestra)
+    return guess_datetime_format(valor) if isinstance(valor, str) else None
+
+
+def _por_valores_unicos(serie, funcion):
+    """Aplica 'funcion' (de Series a Series, elemento a elemento) solo a los valores distintos"""
+    # use_na_sentinel=False: el nulo es un valor más y también pasa por la función
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=False)
+    convertidos = funcion(pd.Series(unicos))
+    return pd.Series(convertidos.to_numpy().take(codigos), index=serie.index, name=serie.name)
+
+
+def _a_fecha(unicos, formato=None, detectar=True):
+    if detectar:
+        formato = detectar_formato(unicos.to_numpy()) if unicos.dtype == object else None
+    if formato is None:
+        return pd.to_datetime(unicos, errors='coerce')
+    return pd.to_datetime(unicos, errors='coerce', format=formato)
+
+
+def a_fecha(serie):
+    """pd.to_datetime(serie, errors='coerce') convirtiendo cada valor distinto una vez"""
+    return _por_valores_unicos(serie, _a_fecha)
+
+
+def reformatear(serie, formato_salida, formato=None, detectar=True):
+    """
+    pd.to_datetime(serie, errors='coerce').dt.strftime(formato_salida) sobre los valores distintos
+
+    Args:
+        formato: formato de entrada ya conocido (ej. detectado en un lote anterior), con detectar=False
+    """
+    return _por_valores_unicos(
+        serie, lambda unicos: _a_fecha(unicos, formato, detectar).dt.strftime(formato_salida))
+
+
+def mes(serie):
+    """pd.to_datetime(serie, errors='coerce').dt.month sobre los valores distintos"""
+    return _por_valores_unicos(serie, lambda unicos: _a_fecha(unicos).dt.month)
@@ -0,0 +1,196 @@
+"""
+Medición por etapas de los scripts de transformación.
+
+Los scripts envuelven cada etapa (leer, renombrar, reemplazar, escribir...) en
+instrumentacion.etapa(). Si no hay una medición iniciada con iniciar(), etapa()
+devuelve un contexto vacío compartido y el costo es una llamada de función.
+
+    instrumentacion.iniciar()
+    with instrumentacion.etapa('reemplazar', df) as e:
+        df = ...
+        e.salida(df)
+    etapas = instrumentacion.finalizar()
+
+Una etapa que se repite (por ejemplo en cada lote) se acumula en una sola
+entrada: suma de tiempos y filas, máximo de memoria y número de veces.
+
+instrumentacion.datos('leer', df) registra además la memoria que ocupan los
+datos del DataFrame en ese punto (memory_usage con deep=True, máximo entre
+lotes), para comparar el plan de tipos de cada script. Recorre todas las
+columnas de texto y cuesta tanto como escribirlas: solo se calcula si la
+medición se inició con iniciar(datos=True), como en los benchmarks.
+"""
+import time
+import resource
+
+_PAGINA_MB = resource.getpagesize() / 1024 / 1024
+
+_actual = None
+
+
+def memoria_mb():
+    """Memoria residente del proceso en MB (sin parsear /proc/self/status)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGINA_MB
+    except (OSError, IndexError, ValueError):
+        return 0.0
+
+
+def _filas(datos):
+    if datos is None or isinstance(datos, int):
+        return datos
+    try:
+        return len(datos)
+    except TypeError:
+        return None
+
+
+class _EtapaNula:
+    """Contexto sin efecto que se usa cuando la medición está desactivada"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def salida(self, datos):
+        pass
+
+
+_ETAPA_NULA = _EtapaNula()
+
+
+class _Etapa:
+    def __init__(self, medidor, nombre, entrada):
+        self.medidor = medidor
+        self.nombre = nombre
+        self.filas_entrada = _filas(entrada)
+        self.filas_salida = None
+
+    def salida(self, datos):
+        """Registra las filas que produce la etapa (DataFrame, lista o número)"""
+        self.filas_salida = _filas(datos)
+
+    def __enter__(self):
+        self.memoria_inicial = memoria_mb()
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        segundos = time.perf_counter() - self.inicio
+        self.medidor._registrar(self, segundos, memoria_mb() - self.memoria_inicial)
+        return False
+
+
+class Medidor:
+    """Acumula las etapas medidas durante una ejecución"""
+
+    def __init__(self, datos=False):
+        self.medir_datos = datos
+        self.etapas = {}
+        self.inicio = time.perf_counter()
+        self.memoria_inicial = memoria_mb()
+        self.memoria_maxima = self.memoria_inicial
+        self.datos_mb = {}
+
+    def etapa(self, nombre, entrada=None):
+        return _Etapa(self, nombre, entrada)
+
+    def _registrar(self, etapa, segundos, delta_memoria):
+        registro = self.etapas.setdefault(etapa.nombre, {
+            'etapa': etapa.nombre,
+            'veces': 0,
+            'segundos': 0.0,
+            'filas_entrada': None,
+            'filas_salida': None,
+            'memoria_delta_mb': 0.0
+        })
+        registro['veces'] += 1
+        registro['segundos'] += segundos
+        for campo in ('filas_entrada', 'filas_salida'):
+            filas = getattr(etapa, campo)
+            if filas is not None:
+                registro[campo] = (registro[campo] or 0) + filas
+        registro['memoria_delta_mb'] = max(registro['memoria_delta_mb'], delta_memoria)
+        self.memoria_maxima = max(self.memoria_maxima, memoria_mb())
+
+    def registrar_datos(self, nombre, df):
+        if not self.medir_datos:
+            return
+        megas = df.memory_usage(index=False, deep=True).sum() / 1024 / 1024
+        self.datos_mb[nombre] = max(self.datos_mb.get(nombre, 0.0), megas)
+
+    def resumen(self):
+        """Lista de etapas en el orden en que se ejecutaron por primera vez"""
+        etapas = []
+        for registro in self.etapas.values():
+            etapas.append(dict(
+                registro,
+                segundos=round(registro['segundos'], 4),
+                memoria_delta_mb=round(registro['memoria_delta_mb'], 1)
+            ))
+        return {
+            'segundos_total': round(time.perf_counter() - self.inicio, 4),
+            'memoria_inicial_mb': round(self.memoria_inicial, 1),
+            'memoria_maxima_mb': round(self.memoria_maxima, 1),
+            'datos_mb': {nombre: round(megas, 1) for nombre, megas in self.datos_mb.items()},
+            'etapas': etapas
+        }
+
+
+def iniciar(activo=True, datos=False):
+    """
+    Inicia la medición del proceso actual (activo=False la desactiva)
+
+    Args:
+        datos: medir también la memoria de los DataFrames con datos()
+    """
+    global _actual
+    _actual = Medidor(datos) if activo else None
+    return _actual
+
+
+def finalizar():
+    """Termina la medición y devuelve su resumen (None si estaba desactivada)"""
+    global _actual
+    medidor, _actual = _actual, None
+    return medidor.resumen() if medidor else None
+
+
+def etapa(nombre, entrada=None):
+    """
+    Contexto que mide una etapa
+
+    Args:
+        nombre: nombre de la etapa
+        entrada: DataFrame, lista o número de filas que recibe la etapa
+    """
+    if _actual is None:
+        return _ETAPA_NULA
+    return _actual.etapa(nombre, entrada)
+
+
+def datos(nombre, df):
+    """Registra la memoria de los datos de df en el punto 'nombre' (solo con iniciar(datos=True))"""
+    if _actual is not None:
+        _actual.registrar_datos(nombre, df)
+
+
+def iterar(nombre, iterable):
+    """Mide cada next() de un iterador (ej. la lectura por lotes) como la etapa 'nombre'"""
+    if _actual is None:
+        yield from iterable
+        return
+    iterador = iter(iterable)
+    while True:
+        medida = etapa(nombre).__enter__()
+        try:
+            lote = next(iterador)
+        except StopIteration:
+            # El final del iterador no cuenta como una lectura
+            return
+        medida.salida(lote)
+        medida.__exit__(None, None, None)
+        yield lote
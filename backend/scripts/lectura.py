@@ -0,0 +1,776 @@
+"""
+Lectura compartida de archivos subidos.
+
+El encoding se detecta una sola vez validando una muestra de los primeros
+bytes (sin parsear el CSV) y se guarda por archivo, así cada script y endpoint
+parsea cada archivo una vez en lugar de reintentar pd.read_csv con cada
+encoding. Si después de la muestra aparece un byte que no es UTF-8 el archivo
+se relee una única vez como latin-1 y queda guardado así.
+
+Los CSV grandes se pueden parsear en paralelo (leer_csv_paralelo): el archivo
+se divide en rangos de bytes alineados a saltos de línea y cada proceso parsea
+su rango con el encabezado.
+
+leer_encabezado obtiene solo los nombres de columna (para detectar el flujo de
+un archivo) leyendo el primer KB de un CSV o las primeras filas de la primera
+hoja de un Excel, sin cargar el libro completo.
+
+iterar_excel recorre la primera hoja de un .xlsx con openpyxl en modo read_only
+y entrega lotes de DataFrames solo con las columnas pedidas; unir_lotes los
+concatena con los mismos tipos que habría dado pd.read_excel sobre el archivo
+completo, y ajustar_tipos lleva un lote a esos tipos sin concatenar.
+"""
+import io
+import os
+import csv
+import codecs
+import contextlib
+import fcntl
+import zipfile
+import posixpath
+import itertools
+from collections import defaultdict
+from xml.etree import ElementTree
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+from scripts import tipos
+
+# Mismo orden que el antiguo bucle de reintentos. latin-1 decodifica cualquier
+# byte, por lo que iso-8859-1 y cp1252 nunca llegaban a usarse.
+ENCODINGS = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
+
+BLOQUE_BYTES = 1024 * 1024
+# Bytes que se validan como UTF-8 para detectar el encoding (None = archivo completo)
+MUESTRA_BYTES = 4 * 1024 * 1024
+MAX_ENTRADAS_CACHE = 256
+
+_cache_encodings = {}
+
+
+def _clave_archivo(ruta):
+    estado = os.stat(ruta)
+    return (os.path.realpath(ruta), estado.st_size, estado.st_mtime_ns)
+
+
+def _es_utf8(bloques, completo):
+    """
+    Valida UTF-8 en streaming. Si solo se revisa una muestra (completo=False),
+    un carácter multibyte cortado al final de la muestra no cuenta como error.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        for bloque in bloques:
+            decoder.decode(bloque)
+        decoder.decode(b'', final=completo)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def _bloques(f, limite=None):
+    leidos = 0
+    while limite is None or leidos < limite:
+        tamano = BLOQUE_BYTES if limite is None else min(BLOQUE_BYTES, limite - leidos)
+        bloque = f.read(tamano)
+        if not bloque:
+            break
+        leidos += len(bloque)
+        yield bloque
+
+
+def _guardar_encoding(clave, encoding):
+    if clave not in _cache_encodings and len(_cache_encodings) >= MAX_ENTRADAS_CACHE:
+        _cache_encodings.pop(next(iter(_cache_encodings)))
+    _cache_encodings[clave] = encoding
+
+
+def detectar_encoding(origen, muestra_bytes=MUESTRA_BYTES):
+    """
+    Detecta el encoding de un archivo subido
+
+    Args:
+        origen: ruta del archivo o archivo abierto en modo binario (se rebobina al terminar)
+        muestra_bytes: bytes iniciales que se validan; None valida el archivo completo
+
+    Returns:
+        str: 'utf-8' o 'latin-1'
+    """
+    if not isinstance(origen, (str, os.PathLike)):
+        posicion = origen.tell()
+        try:
+            es_utf8 = _es_utf8(_bloques(origen, muestra_bytes), muestra_bytes is None)
+        finally:
+            origen.seek(posicion)
+        return ENCODINGS[0] if es_utf8 else ENCODINGS[1]
+
+    clave = _clave_archivo(origen) + (muestra_bytes,)
+    if clave in _cache_encodings:
+        return _cache_encodings[clave]
+
+    with open(origen, 'rb') as f:
+        encoding = ENCODINGS[0] if _es_utf8(_bloques(f, muestra_bytes), muestra_bytes is None) else ENCODINGS[1]
+    _guardar_encoding(clave, encoding)
+    return encoding
+
+
+def _fuera_de_muestra(origen, muestra_bytes):
+    """Registra que el archivo no era UTF-8 después de la muestra: las próximas lecturas usan latin-1"""
+    print(f"[WARNING] Byte inválido fuera de la muestra, releyendo con {ENCODINGS[1]}")
+    if isinstance(origen, (str, os.PathLike)):
+        _guardar_encoding(_clave_archivo(origen) + (muestra_bytes,), ENCODINGS[1])
+    else:
+        origen.seek(0)
+
+
+def _lotes_csv(origen, encoding, muestra_bytes, kwargs):
+    """
+    Lotes de pd.read_csv(chunksize=...). Si un lote posterior a la muestra
+    no es UTF-8 se relee como latin-1 desde el principio y se descartan las
+    filas ya entregadas (esas quedan decodificadas como UTF-8).
+    """
+    entregadas = 0
+    with pd.read_csv(origen, encoding=encoding, **kwargs) as lector:
+        try:
+            for lote in lector:
+                entregadas += len(lote)
+                yield lote
+            return
+        except UnicodeDecodeError:
+            if encoding == ENCODINGS[1]:
+                raise
+    _fuera_de_muestra(origen, muestra_bytes)
+    with pd.read_csv(origen, encoding=ENCODINGS[1], **kwargs) as lector:
+        for lote in lector:
+            if entregadas >= len(lote):
+                entregadas -= len(lote)
+                continue
+            yield lote.iloc[entregadas:]
+            entregadas = 0
+
+
+def leer_csv(origen, muestra_bytes=MUESTRA_BYTES, **kwargs):
+    """
+    pd.read_csv con el encoding detectado por detectar_encoding
+
+    El UTF-8 solo se valida en la muestra; si más adelante aparece un byte
+    inválido se relee una única vez como latin-1. Con chunksize devuelve un
+    generador de lotes.
+    """
+    encoding = detectar_encoding(origen, muestra_bytes)
+    print(f"[INFO] CSV leído con encoding: {encoding}")
+    if kwargs.get('chunksize'):
+        return _lotes_csv(origen, encoding, muestra_bytes, kwargs)
+    try:
+        return pd.read_csv(origen, encoding=encoding, **kwargs)
+    except UnicodeDecodeError:
+        if encoding == ENCODINGS[1]:
+            raise
+        _fuera_de_muestra(origen, muestra_bytes)
+        return pd.read_csv(origen, encoding=ENCODINGS[1], **kwargs)
+
+
+def rangos_por_lineas(ruta, partes, inicio=0):
+    """
+    Divide el archivo desde 'inicio' en hasta 'partes' rangos (inicio, fin) de
+    tamaño similar, cada uno terminado en un salto de línea
+    """
+    tamano = os.path.getsize(ruta)
+    paso = max((tamano - inicio) // partes, 1)
+    rangos = []
+    with open(ruta, 'rb') as f:
+        desde = inicio
+        while desde < tamano:
+            f.seek(min(desde + paso, tamano))
+            f.readline()  # avanzar hasta el final de la línea en curso
+            hasta = min(f.tell(), tamano)
+            rangos.append((desde, hasta))
+            desde = hasta
+    return rangos
+
+
+def _leer_rango(ruta, inicio, fin, encabezado, encoding, kwargs):
+    """
+    Parsea un rango de bytes del CSV anteponiendo el encabezado. Devuelve None
+    si el rango tiene comillas: un salto de línea podría estar dentro de un campo.
+    """
+    with open(ruta, 'rb') as f:
+        f.seek(inicio)
+        datos = f.read(fin - inicio)
+    if b'"' in datos:
+        return None
+    return pd.read_csv(io.BytesIO(encabezado + datos), encoding=encoding, **kwargs)
+
+
+def _tipos_compatibles(partes):
+    """Las partes se pueden concatenar sin mezclar números y texto en una misma columna"""
+    for columna in partes[0].columns:
+        # Un rango sin valores en la columna no aporta tipo
+        columnas = [parte[columna] for parte in partes if parte[columna].notna().any()]
+        tipos = {str(c.dtype) for c in columnas}
+        if len(tipos) > 1 and not all(pd.api.types.is_numeric_dtype(c) for c in columnas):
+            return False
+    return True
+
+
+def _contexto_procesos():
+    # fork evita volver a importar pandas en cada proceso (no se usa desde los workers gevent)
+    metodos = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('fork' if 'fork' in metodos else 'spawn')
+
+
+def crear_pool(trabajadores):
+    return ProcessPoolExecutor(max_workers=trabajadores, mp_context=_contexto_procesos())
+
+
+# (carpeta de los locks, máximo de procesos) fijado por limitar_procesos
+_cupo = None
+
+
+def limitar_procesos(carpeta, maximo):
+    """
+    Comparte entre procesos un cupo de 'maximo' procesos de pool: cada lugar es
+    un archivo en 'carpeta' que reservar_procesos bloquea con flock, así los
+    trabajos simultáneos no superan el total aunque cada uno cree su pool
+    """
+    global _cupo
+    _cupo = (carpeta, maximo)
+
+
+@contextlib.contextmanager
+def reservar_procesos(pedidos):
+    """
+    Procesos de pool que se pueden usar ahora: hasta 'pedidos', según los
+    lugares del cupo que dejan libres los demás trabajos (todos si no hay cupo).
+    Con menos de 2 lugares no se reserva nada y se entrega 1 (sin pool).
+    """
+    if _cupo is None or pedidos < 2:
+        yield pedidos
+        return
+    carpeta, maximo = _cupo
+    reservados = []
+    try:
+        for i in range(maximo):
+            if len(reservados) >= pedidos:
+                break
+            lock = open(os.path.join(carpeta, f'proceso_{i}.lock'), 'w')
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                reservados.append(lock)
+            except BlockingIOError:
+                lock.close()
+        disponibles = len(reservados) if len(reservados) >= 2 else 1
+        if disponibles < pedidos:
+            print(f"[INFO] Otros trabajos ocupan el cupo de procesos: se usan {disponibles} de {pedidos}")
+        if disponibles == 1:
+            _liberar(reservados)
+        yield disponibles
+    finally:
+        _liberar(reservados)
+
+
+def _liberar(locks):
+    while locks:
+        lock = locks.pop()
+        fcntl.flock(lock, fcntl.LOCK_UN)
+        lock.close()
+
+
+def leer_csv_paralelo(ruta, trabajadores=2, min_bytes=64 * 1024 * 1024, executor=None, **kwargs):
+    """
+    pd.read_csv repartido en 'trabajadores' procesos por rangos de líneas
+
+    Se usa la lectura normal (leer_csv) si el archivo pesa menos de min_bytes,
+    si algún rango tiene comillas o si una columna queda con tipos distintos
+    entre rangos (ej. números en un rango y texto en otro). Las columnas con
+    dtype explícito (ej. Cliente y Documento como str) salen iguales siempre.
+
+    Args:
+        executor: pool de procesos ya creado (ej. compartido con otra lectura)
+    """
+    no_soportados = {'chunksize', 'iterator', 'nrows', 'skiprows', 'skipfooter', 'header', 'encoding'}
+    if (trabajadores < 2 or not isinstance(ruta, (str, os.PathLike))
+            or os.path.getsize(ruta) < min_bytes
+            or kwargs.get('sep', ',') is None or no_soportados & set(kwargs)):
+        return leer_csv(ruta, **kwargs)
+
+    encoding = detectar_encoding(ruta)
+    with open(ruta, 'rb') as f:
+        encabezado = f.readline()
+    if b'"' in encabezado:
+        return leer_csv(ruta, **kwargs)
+
+    rangos = rangos_por_lineas(ruta, trabajadores, inicio=len(encabezado))
+    propio = executor is None
+    executor = executor or crear_pool(trabajadores)
+    try:
+        futuros = [executor.submit(_leer_rango, ruta, inicio, fin, encabezado, encoding, kwargs)
+                   for inicio, fin in rangos]
+        partes = [futuro.result() for futuro in futuros]
+    except UnicodeDecodeError:
+        if encoding == ENCODINGS[1]:
+            raise
+        partes = None
+    finally:
+        if propio:
+            executor.shutdown()
+
+    if partes is None:
+        # Byte que no es UTF-8 después de la muestra: una sola relectura como latin-1
+        _fuera_de_muestra(ruta, MUESTRA_BYTES)
+        return leer_csv_paralelo(ruta, trabajadores, min_bytes, None if propio else executor, **kwargs)
+
+    if any(parte is None for parte in partes) or not _tipos_compatibles(partes):
+        print("[WARNING] El CSV no se puede dividir por líneas (comillas o tipos mixtos), lectura secuencial")
+        return leer_csv(ruta, **kwargs)
+
+    print(f"[INFO] CSV leído en paralelo con encoding: {encoding} ({len(rangos)} rangos)")
+    return tipos.concatenar(partes, ignore_index=True)
+
+
+def es_parquet(ruta):
+    return os.path.splitext(str(ruta))[1].lower() == '.parquet'
+
+
+def leer_tabla(ruta, columnas_texto=(), trabajadores=1, min_bytes_paralelo=None, executor=None, **kwargs):
+    """
+    Lee un CSV (con leer_csv, o leer_csv_paralelo si trabajadores > 1) o un
+    Parquet. En Parquet los tipos vienen del archivo; las columnas de
+    columnas_texto se pasan a texto como haría dtype=str.
+    """
+    if not es_parquet(ruta):
+        dtype = dict(kwargs.pop('dtype', None) or {})
+        for columna in columnas_texto:
+            # Un tipo de texto del plan (string[pyarrow]) también vale como str
+            dtype.setdefault(columna, str)
+        if trabajadores > 1:
+            if min_bytes_paralelo is not None:
+                kwargs['min_bytes'] = min_bytes_paralelo
+            return leer_csv_paralelo(ruta, trabajadores, executor=executor, dtype=dtype or None, **kwargs)
+        return leer_csv(ruta, dtype=dtype or None, **kwargs)
+
+    print(f"[INFO] Parquet leído: {os.path.basename(ruta)}")
+    df = pd.read_parquet(ruta)
+    for columna in columnas_texto:
+        if columna in df.columns and df[columna].dtype != object:
+            df[columna] = df[columna].astype(object).where(df[columna].isna(), df[columna].astype(str))
+    return df
+
+
+# --- Encabezados (detección de flujo) ---
+
+ENCABEZADO_BYTES = 1024
+MAX_ENCABEZADO_BYTES = 1024 * 1024
+FILAS_ENCABEZADO = 5
+# Errores de fórmula que openpyxl entrega como texto y pandas deja como NaN
+_ERRORES_EXCEL = frozenset(('#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!', '#N/A'))
+
+_NS_RELACIONES = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+
+
+def _nombres_pandas(nombres):
+    """
+    Nombres de columna como los deja el parser de pandas: 'Unnamed: i' para
+    los vacíos y sufijos .1, .2 en duplicados (primero las columnas con nombre)
+    """
+    nombres = list(nombres)
+    sin_nombre = [i for i, nombre in enumerate(nombres) if nombre in ('', None)]
+    for i in sin_nombre:
+        nombres[i] = f'Unnamed: {i}'
+    conteos = defaultdict(int)
+    for i in [i for i in range(len(nombres)) if i not in sin_nombre] + sin_nombre:
+        nombre = original = nombres[i]
+        actual = conteos[nombre]
+        while actual > 0:
+            conteos[original] = actual + 1
+            nombre = f'{original}.{actual}'
+            actual = actual + 1 if nombre in nombres else conteos[nombre]
+        nombres[i] = nombre
+        conteos[nombre] = actual + 1
+    return nombres
+
+
+def _fin_primer_registro(datos):
+    """Posición del salto de línea que cierra el primer registro (fuera de comillas) o None"""
+    comillas = 0
+    for posicion, byte in enumerate(datos):
+        if byte == 0x22:
+            comillas += 1
+        elif byte == 0x0A and comillas % 2 == 0:
+            return posicion
+    return None
+
+
+def _encabezado_csv(origen, sep):
+    propio = isinstance(origen, (str, os.PathLike))
+    f = open(origen, 'rb') if propio else origen
+    posicion = None if propio else f.tell()
+    try:
+        datos = b''
+        fin = None
+        # Se lee de a ENCABEZADO_BYTES hasta completar la primera línea
+        while fin is None and len(datos) < MAX_ENCABEZADO_BYTES:
+            bloque = f.read(ENCABEZADO_BYTES)
+            if not bloque:
+                break
+            datos += bloque
+            fin = _fin_primer_registro(datos)
+    finally:
+        if propio:
+            f.close()
+        else:
+            f.seek(posicion)
+
+    linea = datos if fin is None else datos[:fin]
+    if linea.startswith(codecs.BOM_UTF8):
+        linea = linea[len(codecs.BOM_UTF8):]
+    encoding = ENCODINGS[0] if _es_utf8([linea], True) else ENCODINGS[1]
+    texto = linea.decode(encoding).rstrip('\r')
+    if not texto.strip():
+        return []
+    return _nombres_pandas(next(csv.reader([texto], delimiter=sep)))
+
+
+def _valor_celda(celda, tipo, compartidos):
+    """Valor de una celda <c> de la hoja (índice de texto compartido si t='s')"""
+    if tipo == 'inlineStr':
+        return ''.join(t.text or '' for t in celda.iter() if t.tag.endswith('}t'))
+    valor = next((hijo.text for hijo in celda if hijo.tag.endswith('}v')), None)
+    if valor is None:
+        return ''
+    if tipo == 's':
+        indice = int(valor)
+        compartidos.add(indice)
+        return _TextoCompartido(indice)
+    if tipo == 'b':
+        return valor == '1'
+    if tipo in ('str', 'e'):
+        return valor
+    numero = float(valor)
+    return int(numero) if numero.is_integer() else numero
+
+
+class _TextoCompartido(int):
+    """Referencia a sharedStrings.xml que se resuelve después de leer las filas"""
+
+
+def _columna(referencia):
+    """Índice (desde 0) de la columna de una referencia como 'AB12'"""
+    indice = 0
+    for letra in referencia:
+        if not letra.isalpha():
+            break
+        indice = indice * 26 + ord(letra.upper()) - 64
+    return indice - 1
+
+
+def _ruta_primera_hoja(libro):
+    with libro.open('xl/workbook.xml') as f:
+        hoja = next(e for _, e in ElementTree.iterparse(f) if e.tag.endswith('}sheet'))
+    id_relacion = hoja.get(_NS_RELACIONES)
+    with libro.open('xl/_rels/workbook.xml.rels') as f:
+        for _, relacion in ElementTree.iterparse(f):
+            if relacion.tag.endswith('}Relationship') and relacion.get('Id') == id_relacion:
+                destino = relacion.get('Target')
+                if destino.startswith('/'):
+                    return destino.lstrip('/')
+                return posixpath.normpath(posixpath.join('xl', destino))
+    raise KeyError(id_relacion)
+
+
+def _textos_compartidos(libro, indices):
+    """Lee sharedStrings.xml solo hasta el mayor índice que se necesita"""
+    textos = {}
+    if not indices:
+        return textos
+    ultimo = max(indices)
+    with libro.open('xl/sharedStrings.xml') as f:
+        indice = 0
+        for _, elemento in ElementTree.iterparse(f):
+            if not elemento.tag.endswith('}si'):
+                continue
+            if indice in indices:
+                # Texto de las corridas <t>, sin la guía fonética (<rPh>)
+                fonetica = {t for rph in elemento if rph.tag.endswith('}rPh') for t in rph.iter()}
+                textos[indice] = ''.join(t.text or '' for t in elemento.iter()
+                                         if t.tag.endswith('}t') and t not in fonetica)
+            if indice >= ultimo:
+                break
+            indice += 1
+            elemento.clear()
+    return textos
+
+
+def _filas_xlsx(origen, filas):
+    """Primeras filas de la primera hoja leyendo el XML en streaming"""
+    with zipfile.ZipFile(origen) as libro:
+        resultado = []
+        compartidos = set()
+        with libro.open(_ruta_primera_hoja(libro)) as f:
+            for _, elemento in ElementTree.iterparse(f):
+                if not elemento.tag.endswith('}row'):
+                    continue
+                # Las filas vacías no aparecen en el XML pero pandas las cuenta
+                numero = int(elemento.get('r') or len(resultado) + 1)
+                resultado.extend([] for _ in range(min(numero - 1, filas) - len(resultado)))
+                if len(resultado) >= filas:
+                    break
+                fila = []
+                for celda in elemento:
+                    if not celda.tag.endswith('}c'):
+                        continue
+                    referencia = celda.get('r')
+                    indice = _columna(referencia) if referencia else len(fila)
+                    fila.extend([''] * (indice - len(fila)))
+                    fila.append(_valor_celda(celda, celda.get('t'), compartidos))
+                elemento.clear()
+                while fila and fila[-1] == '':
+                    fila.pop()
+                resultado.append(fila)
+                if len(resultado) >= filas:
+                    break
+        textos = _textos_compartidos(libro, compartidos)
+    return [[textos[v] if isinstance(v, _TextoCompartido) else v for v in fila] for fila in resultado]
+
+
+def _convertir_celda(valor):
+    """
+    Valor de una celda como lo deja pd.read_excel con openpyxl: vacía -> '',
+    números enteros como int y errores (#N/A, #DIV/0!...) como NaN
+    """
+    if valor is None:
+        return ''
+    if isinstance(valor, float):
+        return int(valor) if valor.is_integer() else valor
+    if isinstance(valor, str) and valor in _ERRORES_EXCEL:
+        return np.nan
+    return valor
+
+
+def _filas_hoja(origen):
+    """
+    Filas (tuplas de valores) de la primera hoja con openpyxl en modo read_only,
+    abierta con los mismos parámetros que usa pd.read_excel
+    """
+    from openpyxl import load_workbook
+    libro = load_workbook(origen, read_only=True, data_only=True, keep_links=False)
+    try:
+        hoja = libro.worksheets[0]
+        # La dimensión guardada en el libro puede estar mal: se recorren todas las filas
+        hoja.reset_dimensions()
+        yield from hoja.iter_rows(values_only=True)
+    finally:
+        libro.close()
+
+
+def _tiene_datos(fila):
+    return any(valor is not None and valor != '' for valor in fila)
+
+
+def _filas_openpyxl(origen, filas):
+    resultado = []
+    lector = _filas_hoja(origen)
+    try:
+        for fila in itertools.islice(lector, filas):
+            fila = [_convertir_celda(valor) for valor in fila]
+            while fila and fila[-1] == '':
+                fila.pop()
+            resultado.append(fila)
+    finally:
+        lector.close()
+    return resultado
+
+
+def _encabezado_excel(origen, filas):
+    propio = isinstance(origen, (str, os.PathLike))
+    posicion = None if propio else origen.tell()
+    try:
+        contenido = _filas_xlsx(origen, filas)
+    except (zipfile.BadZipFile, KeyError, StopIteration, ValueError, ElementTree.ParseError) as e:
+        print(f"[WARNING] No se pudo leer el XML de la hoja ({e}), usando openpyxl")
+        if not propio:
+            origen.seek(posicion)
+        contenido = _filas_openpyxl(origen, filas)
+    finally:
+        if not propio:
+            origen.seek(posicion)
+    # pandas descarta las filas vacías del final
+    while contenido and not contenido[-1]:
+        contenido.pop()
+    if not contenido:
+        return []
+    # Las filas de datos más anchas que el encabezado agregan columnas 'Unnamed'
+    ancho = max(len(fila) for fila in contenido)
+    return _nombres_pandas(contenido[0] + [''] * (ancho - len(contenido[0])))
+
+
+def leer_encabezado(origen, nombre=None, sep=',', filas=FILAS_ENCABEZADO):
+    """
+    Nombres de columna de un CSV o Excel, con los mismos nombres que daría pandas
+
+    En CSV se lee solo la primera línea (de a ENCABEZADO_BYTES). En .xlsx se
+    recorre en streaming el XML de la primera hoja hasta 'filas' filas y se
+    buscan en sharedStrings solo los textos usados. Los .xls usan pandas.
+
+    Args:
+        origen: ruta o archivo abierto en modo binario (se rebobina al terminar)
+        nombre: nombre del archivo para elegir el formato (por defecto la ruta)
+    """
+    extension = os.path.splitext(str(nombre or origen))[1].lower()
+    if extension == '.csv':
+        return _encabezado_csv(origen, sep)
+    if extension == '.xls':
+        return pd.read_excel(origen, nrows=filas).columns.tolist()
+    return _encabezado_excel(origen, filas)
+
+
+# --- Excel en lotes ---
+
+FILAS_POR_LOTE_EXCEL = 50000
+
+
+def _lote_excel(nombres, filas, dtype):
+    # El mismo parser que usa pd.read_excel, solo sobre las columnas pedidas
+    return TextParser([nombres] + filas, header=0, dtype=dtype, skip_blank_lines=False).read()
+
+
+def iterar_excel(ruta, columnas, filas_por_lote=FILAS_POR_LOTE_EXCEL, dtype=None):
+    """
+    Lee la primera hoja de un .xlsx en lotes de DataFrames con solo 'columnas'
+
+    La hoja se recorre con openpyxl en modo read_only (iter_rows) y de cada fila
+    se convierten solo las celdas de las columnas pedidas. Cada lote infiere sus
+    tipos por separado: usar unir_lotes para concatenarlos (o ajustar_tipos).
+
+    Raises:
+        KeyError: si falta alguna de las columnas en el encabezado
+    """
+    filas = _filas_hoja(ruta)
+    try:
+        nombres = [_convertir_celda(valor) for valor in next(filas, ())]
+        while nombres and nombres[-1] == '':
+            nombres.pop()
+        nombres = _nombres_pandas(nombres)
+        faltantes = [c for c in columnas if c not in nombres]
+        if faltantes:
+            raise KeyError(f"{faltantes} not in index")
+        posiciones = [nombres.index(c) for c in columnas]
+
+        lote = []
+        vacias = 0
+        for fila in filas:
+            if not _tiene_datos(fila):
+                # pandas descarta las filas vacías del final, las intermedias quedan como NaN
+                vacias += 1
+                continue
+            lote.extend([[''] * len(posiciones) for _ in range(vacias)])
+            vacias = 0
+            lote.append([_convertir_celda(fila[i]) if i < len(fila) else '' for i in posiciones])
+            if len(lote) >= filas_por_lote:
+                yield _lote_excel(columnas, lote, dtype)
+                lote = []
+        if lote:
+            yield _lote_excel(columnas, lote, dtype)
+    finally:
+        filas.close()
+
+
+# Tipos de infer_dtype que en una columna object se ven igual
+_TIPOS_EQUIVALENTES = {'datetime64': 'datetime', 'timedelta64': 'timedelta'}
+
+
+def _a_objetos(serie):
+    """Valores originales de una columna de un lote (los enteros de Excel llegan como int)"""
+    if pd.api.types.is_float_dtype(serie):
+        return pd.Series([int(v) if v.is_integer() else v for v in serie.tolist()],
+                         index=serie.index, dtype=object)
+    return serie.astype(object)
+
+
+def unir_lotes(lotes):
+    """
+    Concatena los lotes de iterar_excel con los tipos de una lectura completa
+
+    Si una columna quedó numérica en unos lotes y texto en otros, pd.read_excel
+    la habría dejado como object con los valores originales: se vuelve a eso en
+    lugar de dejar floats como 123.0 que al pasar a texto no coinciden.
+    """
+    if len(lotes) == 1:
+        return lotes[0]
+    for columna in lotes[0].columns:
+        # Un lote sin valores en la columna no aporta tipo (queda float con NaN)
+        con_valores = [lote for lote in lotes if lote[columna].notna().any()]
+        if con_valores and all(isinstance(lote[columna].dtype, pd.CategoricalDtype) for lote in con_valores):
+            # category del plan de tipos: tipos.concatenar une sus categorías
+            continue
+        dtypes = {lote[columna].dtype for lote in con_valores}
+        if len(dtypes) == 1:
+            tipo = dtypes.pop()
+            if pd.api.types.is_datetime64_any_dtype(tipo):
+                for lote in lotes:
+                    lote[columna] = lote[columna].astype(tipo)
+            continue
+        if not dtypes:
+            continue
+        dtypes = [lote[columna].dtype for lote in lotes]
+        numericos = all(pd.api.types.is_numeric_dtype(t) and not pd.api.types.is_bool_dtype(t) for t in dtypes)
+        if not numericos:
+            for lote in lotes:
+                lote[columna] = _a_objetos(lote[columna])
+    return tipos.concatenar(lotes, ignore_index=True)
+
+
+def muestra_tipos(lote):
+    """
+    Filas mínimas de un lote con sus mismos tipos: la primera y la primera con
+    valor de cada columna. unir_lotes sobre las muestras da los tipos de unir
+    todos los lotes.
+    """
+    posiciones = {0}
+    for columna in lote.columns:
+        con_valor = lote[columna].notna().to_numpy()
+        if con_valor.any():
+            posiciones.add(int(con_valor.argmax()))
+    return lote.iloc[sorted(posiciones)].copy() if len(lote) else lote.copy()
+
+
+def tipo_valores(serie):
+    """
+    Tipo de los valores de un lote (pd.api.types.infer_dtype) como quedarían
+    en una columna object al unir lotes: los float enteros cuentan como int
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.cat.categories
+    elif pd.api.types.is_float_dtype(serie):
+        serie = _a_objetos(serie.dropna())
+    tipo = pd.api.types.infer_dtype(serie, skipna=True)
+    return _TIPOS_EQUIVALENTES.get(tipo, tipo)
+
+
+def columnas_mixtas(tipos_por_columna, dtypes):
+    """
+    Columnas que al unir los lotes quedarían object con valores de tipos
+    mezclados (ej. números en un lote y texto en otro)
+
+    Args:
+        tipos_por_columna: dict columna -> set de tipo_valores de cada lote
+        dtypes: tipos de las columnas unidas
+    """
+    return {
+        columna for columna, vistos in tipos_por_columna.items()
+        if dtypes[columna] == object
+        and (len(vistos - {'empty'}) > 1 or any(tipo.startswith('mixed') for tipo in vistos))
+    }
+
+
+def ajustar_tipos(lote, dtypes):
+    """Convierte las columnas de un lote a los tipos que tendrían en unir_lotes (dtypes de las muestras unidas)"""
+    for columna, tipo in dtypes.items():
+        serie = lote[columna]
+        if serie.dtype == tipo:
+            continue
+        lote[columna] = _a_objetos(serie) if tipo == object else serie.astype(tipo)
+    return lote
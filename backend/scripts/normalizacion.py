@@ -0,0 +1,127 @@
+"""
+Normalización de columnas de texto con pocos valores distintos.
+
+Columnas como Marca, Linea o Ciudad repiten unas decenas de valores en
+millones de filas. En lugar de recorrer cada fila con Series.replace, la
+columna se factoriza (códigos + valores únicos, como un category), los
+reemplazos se aplican solo a los valores únicos y el resultado se reconstruye
+con los códigos. La salida es idéntica a la de Series.replace.
+
+Lo mismo aplica a dividir columnas compuestas como Vendedor ('123-NOMBRE'):
+solo se parte cada valor distinto.
+"""
+import unicodedata
+import numpy as np
+import pandas as pd
+
+
+def quitar_acentos(texto):
+    """'Café Molido' -> 'Cafe Molido', 'Champiñones' -> 'Champinones'"""
+    descompuesto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def _normalizar_valor(valor, reemplazos, acentos):
+    if valor in reemplazos:
+        return reemplazos[valor]
+    if acentos and isinstance(valor, str):
+        return quitar_acentos(valor)
+    return valor
+
+
+def reemplazar(serie, reemplazos, acentos=False, categorica=False):
+    """
+    Equivalente a serie.replace(reemplazos) operando sobre los valores únicos
+
+    Args:
+        serie: columna a normalizar
+        reemplazos: dict valor original -> valor nuevo
+        acentos: además quita tildes y diacríticos de los valores que no estén en reemplazos
+        categorica: devuelve la columna como category en lugar de object
+
+    Returns:
+        pd.Series con el mismo índice y nombre
+    """
+    if serie.dtype != object and not isinstance(serie.dtype, pd.CategoricalDtype):
+        # Columnas numéricas o vacías: no hay texto que normalizar
+        return serie.replace(reemplazos)
+
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codigos = serie.cat.codes.to_numpy()
+        unicos = serie.cat.categories.to_numpy(dtype=object)
+    else:
+        # Códigos por fila + valores únicos (nulos con código -1), sin ordenar
+        codigos, unicos = pd.factorize(serie)
+    nuevos = np.array([_normalizar_valor(valor, reemplazos, acentos) for valor in unicos], dtype=object)
+
+    if categorica:
+        # Varios valores pueden quedar iguales tras el reemplazo: se vuelven a factorizar
+        recodificados, nuevas_categorias = pd.factorize(nuevos)
+        codigos = np.where(codigos >= 0, recodificados.take(codigos, mode='clip'), -1)
+        return pd.Series(pd.Categorical.from_codes(codigos, categories=nuevas_categorias),
+                         index=serie.index, name=serie.name)
+
+    # Los nulos (código -1) conservan su valor original (None o NaN)
+    valores = serie.to_numpy(dtype=object, copy=True)
+    validos = codigos >= 0
+    valores[validos] = nuevos[codigos[validos]]
+    return pd.Series(valores, index=serie.index, name=serie.name)
+
+
+def normalizar(df, reemplazos, acentos=False):
+    """
+    Aplica reemplazar() a cada columna del dict reemplazos {columna: {original: nuevo}}
+    presente en el DataFrame (lo modifica en el lugar y lo devuelve). Las
+    columnas category (plan de tipos) siguen siendo category.
+    """
+    for columna, valores in reemplazos.items():
+        if columna in df.columns:
+            categorica = isinstance(df[columna].dtype, pd.CategoricalDtype)
+            df[columna] = reemplazar(df[columna], valores, acentos, categorica=categorica)
+    return df
+
+
+def _dividir_valor(valor, separador):
+    if not isinstance(valor, str):
+        return np.nan, np.nan
+    partes = valor.split(separador, 1)
+    return partes[0], (partes[1] if len(partes) > 1 else None)
+
+
+def _desde_unicos(valores, codigos, index, categorica):
+    """Columna con valores[codigos] por fila (el último valor es el de los nulos)"""
+    if not categorica:
+        return pd.Series(valores[codigos], index=index)
+    # Valores únicos de la parte (pueden repetirse entre valores distintos de la columna)
+    recodificados, categorias = pd.factorize(valores)
+    return pd.Series(pd.Categorical.from_codes(recodificados[codigos], categories=categorias), index=index)
+
+
+def dividir(serie, separador='-'):
+    """
+    Parte la columna en el primer separador, como serie.str.split(separador, n=1, expand=True)
+    pero calculado sobre los valores únicos. Un nombre con otro separador
+    ('12-ANA-MARIA') queda completo en la segunda parte. Una columna category
+    devuelve partes category.
+
+    Returns:
+        tuple: (pd.Series antes del separador, pd.Series después; None si no hay separador)
+    """
+    categorica = isinstance(serie.dtype, pd.CategoricalDtype)
+    if categorica:
+        codigos = serie.cat.codes.to_numpy()
+        unicos = serie.cat.categories.to_numpy(dtype=object)
+    else:
+        codigos, unicos = pd.factorize(serie)
+
+    primeras = np.empty(len(unicos) + 1, dtype=object)
+    restos = np.empty(len(unicos) + 1, dtype=object)
+    for i, valor in enumerate(unicos):
+        primeras[i], restos[i] = _dividir_valor(valor, separador)
+    # Posición final para los nulos (código -1)
+    primeras[-1] = restos[-1] = np.nan
+
+    return (
+        _desde_unicos(primeras, codigos, serie.index, categorica),
+        _desde_unicos(restos, codigos, serie.index, categorica)
+    )
@@ -0,0 +1,643 @@
+"""
+Transformaciones declarativas por etapas y su registro.
+
+Cada script describe su transformación como una lista de etapas:
+
+    Pipeline('exhibidores', 'Exhibidores.csv', [
+        Leer(sep='|'),
+        Filtrar('Estado', igual='A'),
+        Deduplicar(['Numero']),
+        Escribir(),
+    ])
+
+El motor lee el archivo por lotes de filas y pasa cada lote por todas las
+etapas antes de leer el siguiente (las etapas se encadenan como generadores),
+así la memoria depende del tamaño del lote y no del archivo. Antes de ejecutar
+se fusionan etapas consecutivas (renombrados, filtros en una sola máscara,
+reemplazos sobre columnas distintas) y la selección de columnas se lleva a la
+lectura para no parsear las que se descartan.
+
+Una etapa UnificarTipos() deja cada columna de todos los lotes con el tipo que
+tendría en el archivo completo cuando lo que sigue lo necesita (ej. pasar a
+texto una columna leída de Excel, o una columna entera con un vacío en un solo
+lote, que leída completa sería float); para eso guarda los lotes en disco en
+lugar de concatenarlos en memoria.
+
+registrar() agrega la transformación al registro que usan /procesar/<tipo> y
+/transform/<ruta>: una transformación nueva solo declara su pipeline.
+"""
+import os
+import itertools
+import tempfile
+import numpy as np
+import pandas as pd
+
+from scripts import escritura, fechas, instrumentacion, lectura, normalizacion, tipos
+
+# Lotes por defecto cuando no se indica filas_por_lote (0 = archivo completo)
+FILAS_POR_LOTE = 200000
+# Clave de los faltantes en Deduplicar: drop_duplicates considera iguales NaN, None y NA
+_FALTANTE = object()
+
+
+class Etapa:
+    """Paso de la transformación que recibe un lote (DataFrame) y devuelve otro"""
+
+    nombre = 'etapa'
+
+    def aplicar(self, df, contexto):
+        raise NotImplementedError
+
+    def fusionar(self, siguiente):
+        """Etapa equivalente a esta seguida de 'siguiente', o None si no se pueden unir"""
+        return None
+
+
+class Contexto:
+    """
+    Parámetros de la ejecución (ej. mes) y estado de las etapas entre lotes.
+    carpeta: donde las etapas pueden dejar archivos temporales (None = la del sistema)
+    texto: columnas que Escribir guarda como texto en Parquet (tipos mezclados entre lotes)
+    """
+
+    def __init__(self, parametros=None, carpeta=None):
+        self.parametros = parametros or {}
+        self.estado = {}
+        self.carpeta = carpeta
+        self.texto = set()
+
+
+# --- Lectura ---
+
+class Leer:
+    """
+    Origen de los lotes: CSV (con el encoding detectado por lectura.leer_csv)
+    o .xlsx (lectura.iterar_excel en streaming, pd.read_excel completo).
+
+    Args:
+        extensiones: formatos aceptados
+        dtype: dtype de read_csv / read_excel
+        plan_tipos: plan de tipos del script (scripts/tipos.py)
+        engine: motor de read_csv al leer el archivo completo (por lotes se usa 'c')
+        lotes: extensiones que se leen por lotes; las demás se leen completas
+        **opciones: otros argumentos de read_csv (ej. sep)
+    """
+
+    def __init__(self, extensiones=('.csv',), dtype=None, plan_tipos=None, engine=None,
+                 lotes=('.csv', '.xlsx'), **opciones):
+        self.extensiones = extensiones
+        self.dtype = dtype or {}
+        self.plan_tipos = plan_tipos or {}
+        self.engine = engine
+        self.lotes = lotes
+        self.opciones = opciones
+
+    def _extension(self, ruta):
+        extension = os.path.splitext(ruta)[1].lower()
+        if extension not in self.extensiones:
+            raise ValueError("Formato no soportado.")
+        return extension
+
+    def _dtype(self):
+        return tipos.dtypes_lectura(self.plan_tipos, self.dtype) or None
+
+    def _usecols(self, ruta, columnas):
+        """Posiciones de 'columnas' en el encabezado del CSV (None si no se puede proyectar)"""
+        sep = self.opciones.get('sep', ',')
+        if columnas is None or sep is None:
+            return None
+        encabezado = lectura.leer_encabezado(ruta, sep=sep)
+        posiciones = [i for i, nombre in enumerate(encabezado) if nombre in columnas]
+        return posiciones if len(posiciones) < len(encabezado) else None
+
+    def _columnas_excel(self, ruta, columnas):
+        encabezado = lectura.leer_encabezado(ruta)
+        if columnas is None:
+            return encabezado
+        return [nombre for nombre in encabezado if nombre in columnas]
+
+    def leer(self, ruta, filas_por_lote, columnas=None):
+        """
+        Lotes del archivo
+
+        Args:
+            filas_por_lote: filas por lote (0 o None = un solo lote con el archivo completo)
+            columnas: columnas que usan las etapas (None = todas)
+        """
+        extension = self._extension(ruta)
+        por_lotes = bool(filas_por_lote) and extension in self.lotes
+        if extension == '.xlsx':
+            if por_lotes:
+                nombres = self._columnas_excel(ruta, columnas)
+                lotes = lectura.iterar_excel(ruta, nombres, filas_por_lote, dtype=self.dtype or None)
+            else:
+                lotes = [pd.read_excel(ruta, engine="openpyxl", dtype=self.dtype or None)]
+        elif por_lotes:
+            lotes = lectura.leer_csv(ruta, dtype=self._dtype(), usecols=self._usecols(ruta, columnas),
+                                     engine='c' if self.opciones.get('sep', ',') else 'python',
+                                     chunksize=filas_por_lote, **self.opciones)
+        else:
+            lotes = [lectura.leer_csv(ruta, dtype=self._dtype(), engine=self.engine,
+                                      usecols=self._usecols(ruta, columnas), **self.opciones)]
+
+        try:
+            for lote in instrumentacion.iterar('leer', lotes):
+                tipos.aplicar(lote, self.plan_tipos)
+                instrumentacion.datos('leer', lote)
+                yield lote
+        finally:
+            if hasattr(lotes, 'close'):
+                lotes.close()
+
+    def vacio(self, ruta, columnas=None):
+        """DataFrame sin filas con las columnas del archivo (para escribir solo el encabezado)"""
+        if self._extension(ruta) == '.xlsx':
+            return pd.DataFrame({c: pd.Series(dtype=object) for c in self._columnas_excel(ruta, columnas)})
+        engine = 'python' if self.opciones.get('sep', ',') is None else None
+        vacio = lectura.leer_csv(ruta, nrows=0, dtype=self._dtype(), engine=engine, **self.opciones)
+        return tipos.aplicar(vacio, self.plan_tipos)
+
+
+# --- Etapas ---
+
+class Renombrar(Etapa):
+    nombre = 'renombrar'
+
+    def __init__(self, columnas):
+        self.columnas = dict(columnas)
+
+    def aplicar(self, df, contexto):
+        return df.rename(columns=self.columnas)
+
+    def fusionar(self, siguiente):
+        if isinstance(siguiente, Renombrar):
+            # a -> b seguido de b -> c es a -> c
+            compuesto = {origen: siguiente.columnas.get(destino, destino) for origen, destino in self.columnas.items()}
+            for origen, destino in siguiente.columnas.items():
+                compuesto.setdefault(origen, destino)
+            return Renombrar(compuesto)
+        return None
+
+
+class Seleccionar(Etapa):
+    """Conserva solo 'columnas', en ese orden (KeyError si falta alguna)"""
+
+    nombre = 'seleccionar'
+
+    def __init__(self, columnas):
+        self.columnas = list(columnas)
+
+    def aplicar(self, df, contexto):
+        return df[self.columnas].copy()
+
+
+class Descartar(Etapa):
+    """Elimina las columnas indicadas que estén presentes"""
+
+    nombre = 'descartar'
+
+    def __init__(self, columnas):
+        self.columnas = list(columnas)
+
+    def aplicar(self, df, contexto):
+        presentes = [columna for columna in self.columnas if columna in df.columns]
+        return df.drop(columns=presentes) if presentes else df
+
+
+class Filtrar(Etapa):
+    """Conserva las filas donde columna == igual o columna != distinto"""
+
+    nombre = 'filtrar'
+
+    def __init__(self, columna=None, igual=None, distinto=None, condiciones=None):
+        self.condiciones = list(condiciones or []) + ([(columna, igual, distinto)] if columna else [])
+
+    def aplicar(self, df, contexto):
+        mascara = None
+        for columna, igual, distinto in self.condiciones:
+            condicion = df[columna] == igual if igual is not None else df[columna] != distinto
+            mascara = condicion if mascara is None else mascara & condicion
+        return df[mascara]
+
+    def fusionar(self, siguiente):
+        if isinstance(siguiente, Filtrar):
+            # Una sola máscara y una sola copia del lote
+            return Filtrar(condiciones=self.condiciones + siguiente.condiciones)
+        return None
+
+
+class Reemplazar(Etapa):
+    """normalizacion.normalizar: reemplazos {columna: {original: nuevo}} sobre los valores únicos"""
+
+    nombre = 'reemplazar'
+
+    def __init__(self, reemplazos, acentos=False):
+        self.reemplazos = reemplazos
+        self.acentos = acentos
+
+    def aplicar(self, df, contexto):
+        return normalizacion.normalizar(df, self.reemplazos, acentos=self.acentos)
+
+    def fusionar(self, siguiente):
+        if (isinstance(siguiente, Reemplazar) and siguiente.acentos == self.acentos
+                and not set(self.reemplazos) & set(siguiente.reemplazos)):
+            return Reemplazar({**self.reemplazos, **siguiente.reemplazos}, self.acentos)
+        return None
+
+
+class Agregar(Etapa):
+    """
+    Columna nueva con el resultado de funcion(df, parametros): un valor o una Serie
+
+    Args:
+        posicion: posición de la columna (None = al final)
+    """
+
+    nombre = 'agregar'
+
+    def __init__(self, columna, funcion, posicion=None):
+        self.columna = columna
+        self.funcion = funcion
+        self.posicion = posicion
+
+    def aplicar(self, df, contexto):
+        valor = self.funcion(df, contexto.parametros)
+        if self.posicion is None:
+            df[self.columna] = valor
+        else:
+            df.insert(self.posicion, self.columna, valor)
+        return df
+
+
+class Dividir(Etapa):
+    """
+    Parte 'columna' en el primer separador (normalizacion.dividir) hacia
+    destinos = [antes, después]; un destino None se descarta. La columna
+    original se elimina salvo que sea uno de los destinos.
+    """
+
+    nombre = 'dividir'
+
+    def __init__(self, columna, destinos, separador='-'):
+        self.columna = columna
+        self.destinos = list(destinos)
+        self.separador = separador
+
+    def aplicar(self, df, contexto):
+        partes = normalizacion.dividir(df[self.columna], self.separador)
+        for destino, parte in zip(self.destinos, partes):
+            if destino is not None:
+                df[destino] = parte
+        if self.columna not in self.destinos:
+            df.drop(columns=[self.columna], inplace=True)
+        return df
+
+
+def _a_texto(serie):
+    return serie.astype(str)
+
+
+def _a_entero(serie):
+    # Valores no numéricos y vacíos quedan en 0
+    return pd.to_numeric(serie, errors='coerce').fillna(0).astype(int)
+
+
+CONVERSIONES = {'texto': _a_texto, 'entero': _a_entero}
+
+
+class Convertir(Etapa):
+    """Conversiones {columna: 'texto' | 'entero' | función(Serie) -> Serie}"""
+
+    nombre = 'convertir'
+
+    def __init__(self, conversiones):
+        self.conversiones = {
+            columna: CONVERSIONES[conversion] if isinstance(conversion, str) else conversion
+            for columna, conversion in conversiones.items()
+        }
+
+    def aplicar(self, df, contexto):
+        for columna, conversion in self.conversiones.items():
+            df[columna] = conversion(df[columna])
+        return df
+
+    def fusionar(self, siguiente):
+        if isinstance(siguiente, Convertir) and not set(self.conversiones) & set(siguiente.conversiones):
+            return Convertir({**self.conversiones, **siguiente.conversiones})
+        return None
+
+
+class Deduplicar(Etapa):
+    """
+    drop_duplicates(subset=columnas) entre todos los lotes: queda la primera aparición.
+    Las claves ya vistas se guardan en un set, así cada lote cuesta lo mismo.
+    """
+
+    nombre = 'deduplicar'
+
+    def __init__(self, columnas):
+        self.columnas = list(columnas)
+
+    def _claves(self, df):
+        """Clave de cada fila (tupla si hay varias columnas); los faltantes cuentan como iguales"""
+        valores = []
+        for columna in self.columnas:
+            columna = df[columna].to_numpy(dtype=object, copy=True)
+            columna[pd.isna(columna)] = _FALTANTE
+            valores.append(columna)
+        return valores[0] if len(valores) == 1 else list(zip(*valores))
+
+    def aplicar(self, df, contexto):
+        df = df.drop_duplicates(subset=self.columnas)
+        vistas = contexto.estado.setdefault(id(self), set())
+        claves = self._claves(df)
+        if vistas:
+            nuevas = np.fromiter((clave not in vistas for clave in claves), dtype=bool, count=len(df))
+            df = df[nuevas]
+            claves = itertools.compress(claves, nuevas)
+        vistas.update(claves)
+        return df
+
+
+class ConvertirFecha(Etapa):
+    """
+    Fecha como texto con formato_salida (fechas.reformatear). El formato de
+    entrada se detecta con el primer valor del archivo y se mantiene en los
+    lotes siguientes, igual que al convertir la columna completa.
+    """
+
+    nombre = 'convertir_fecha'
+
+    def __init__(self, columna, formato_salida):
+        self.columna = columna
+        self.formato_salida = formato_salida
+
+    def aplicar(self, df, contexto):
+        estado = contexto.estado.setdefault(id(self), {})
+        serie = df[self.columna]
+        if 'formato' not in estado and serie.dtype == object:
+            unicos = pd.unique(serie)
+            if fechas.primer_valor(unicos) is not None:
+                estado['formato'] = fechas.detectar_formato(unicos)
+        df[self.columna] = fechas.reformatear(serie, self.formato_salida, estado.get('formato'), detectar=False)
+        return df
+
+
+class UnificarTipos(Etapa):
+    """
+    Entrega los lotes con el tipo que cada columna tendría al unirlos
+    (lectura.unir_lotes: tipos como en una lectura completa) sin concatenarlos.
+    Mientras se recorre el archivo los lotes se guardan en disco y de cada uno
+    se queda solo una muestra de filas para calcular los tipos; después se
+    vuelven a leer de a uno y se convierten. La memoria sigue dependiendo del
+    tamaño del lote. Las columnas que quedan object con valores de tipos
+    distintos entre lotes se marcan en contexto.texto (Parquet las guarda como
+    texto, igual que con el archivo completo).
+    """
+
+    nombre = 'unificar_tipos'
+
+    def unir(self, lotes, contexto):
+        # El generador no guarda referencias a los lotes que entrega: pandas
+        # tomaría los lotes filtrados después como copias de uno vivo
+        # (SettingWithCopyWarning al asignarles columnas)
+        with tempfile.TemporaryDirectory(prefix='lotes_', dir=contexto.carpeta) as carpeta:
+            # El primer lote queda en memoria: si es el único no se escribe nada
+            primero = []
+            rutas, muestras = [], []
+            tipos_valores = {}
+
+            def revisar(lote):
+                muestras.append(lectura.muestra_tipos(lote))
+                for columna in lote.columns:
+                    tipos_valores.setdefault(columna, set()).add(lectura.tipo_valores(lote[columna]))
+
+            for lote in lotes:
+                if not primero and not rutas:
+                    primero.append(lote)
+                    continue
+                if not rutas:
+                    revisar(primero[0])
+                revisar(lote)
+                ruta = os.path.join(carpeta, f'{len(rutas)}.pkl')
+                with instrumentacion.etapa('guardar_lote', lote):
+                    lote.to_pickle(ruta)
+                rutas.append(ruta)
+            lote = None
+            if not primero:
+                return
+            if not rutas:
+                yield primero.pop()
+                return
+
+            dtypes = lectura.unir_lotes(muestras).dtypes
+            contexto.texto |= lectura.columnas_mixtas(tipos_valores, dtypes)
+            print(f"[INFO] {len(rutas) + 1} lotes con tipos unificados")
+            yield self._ajustar(primero.pop(), dtypes)
+            for ruta in rutas:
+                yield self._ajustar(self._recuperar(ruta), dtypes)
+
+    @staticmethod
+    def _recuperar(ruta):
+        lote = pd.read_pickle(ruta)
+        os.remove(ruta)
+        return lote
+
+    def _ajustar(self, lote, dtypes):
+        with instrumentacion.etapa(self.nombre, lote) as e:
+            lote = lectura.ajustar_tipos(lote, dtypes)
+            e.salida(lote)
+        return lote
+
+
+class Escribir:
+    """Destino: CSV o Parquet por lotes (escritura.EscritorPorLotes)"""
+
+    def __init__(self, encoding='utf-8'):
+        self.encoding = encoding
+
+
+# --- Registro ---
+
+class Transformacion:
+    """
+    Transformación de /procesar/<tipo>
+
+    Args:
+        nombre: tipo de procesamiento
+        ruta: alias de /transform/<ruta> (por defecto el nombre)
+        campos: archivos obligatorios del formulario
+        opcionales: archivos opcionales
+        usa_cache: el resultado se guarda en el cache de resultados
+        funcion: funcion(archivos, parametros, carpeta_trabajo, opciones) -> dict del resultado
+        validar: validar(archivos_subidos, opciones) -> mensaje de error o None
+    """
+
+    def __init__(self, nombre, ruta=None, campos=('archivo',), opcionales=(), usa_cache=True,
+                 funcion=None, validar=None):
+        self.nombre = nombre
+        self.ruta = ruta or nombre
+        self.campos = tuple(campos)
+        self.opcionales = tuple(opcionales)
+        self.usa_cache = usa_cache
+        self.funcion = funcion
+        self._validar = validar
+
+    @property
+    def admite_lote(self):
+        """Un solo archivo de entrada y resultado en cache: se puede procesar por lotes"""
+        return len(self.campos) == 1 and not self.opcionales and self.usa_cache
+
+    def validar(self, archivos_subidos, opciones=None):
+        return self._validar(archivos_subidos, opciones or {}) if self._validar else None
+
+    def ejecutar_trabajo(self, archivos, parametros, carpeta_trabajo, opciones=None):
+        """
+        Returns:
+            dict: {'archivo': nombre, 'ruta': ruta del resultado o None, 'origen': ...}
+        """
+        return self.funcion(archivos, parametros, carpeta_trabajo, opciones or {})
+
+
+class Pipeline(Transformacion):
+    """
+    Transformación declarada como etapas: Leer, etapas de lote y Escribir
+
+    Args:
+        archivo_salida: nombre del CSV de salida (la extensión cambia según el formato)
+        titulo: mensaje al iniciar
+    """
+
+    def __init__(self, nombre, archivo_salida, etapas, titulo=None, **kwargs):
+        super().__init__(nombre, **kwargs)
+        if not etapas or not isinstance(etapas[0], Leer) or not isinstance(etapas[-1], Escribir):
+            raise ValueError(f"El pipeline '{nombre}' debe empezar con Leer y terminar con Escribir")
+        self.archivo_salida = archivo_salida
+        self.titulo = titulo
+        self.lector = etapas[0]
+        self.escritor = etapas[-1]
+        self.etapas = _fusionar(etapas[1:-1])
+        self.columnas_leidas = _columnas_leidas(self.etapas)
+
+    def _procesar(self, lotes, contexto):
+        """Encadena las etapas como generadores: cada lote pasa por todas antes de leer el siguiente"""
+        flujo = lotes
+        tramo = []
+        for etapa in self.etapas + [None]:
+            if etapa is None or isinstance(etapa, UnificarTipos):
+                flujo = _aplicar_tramo(flujo, tramo, contexto)
+                if etapa is not None:
+                    flujo = etapa.unir(flujo, contexto)
+                tramo = []
+            else:
+                tramo.append(etapa)
+        return flujo
+
+    def ejecutar(self, archivo_entrada, carpeta_salida, formato='csv', filas_por_lote=FILAS_POR_LOTE,
+                 parametros=None):
+        """
+        Ejecuta el pipeline y devuelve la ruta del archivo generado
+
+        Args:
+            filas_por_lote: filas por lote (0 o None = archivo completo en un lote)
+            parametros: valores para las etapas (ej. {'mes': '5'})
+        """
+        if self.titulo:
+            print(f"\n{self.titulo}")
+        os.makedirs(carpeta_salida, exist_ok=True)
+        archivo_salida = os.path.join(carpeta_salida, escritura.nombre_salida(self.archivo_salida, formato))
+
+        contexto = Contexto(parametros, carpeta_salida)
+        lotes = self.lector.leer(archivo_entrada, filas_por_lote, self.columnas_leidas)
+        filas = 0
+        with escritura.EscritorPorLotes(archivo_salida, formato, encoding=self.escritor.encoding) as escritor:
+            for lote in self._procesar(lotes, contexto):
+                instrumentacion.datos('escribir', lote)
+                with instrumentacion.etapa('escribir', lote):
+                    escritor.escribir(lote, contexto.texto)
+                filas += len(lote)
+
+            if escritor.lotes == 0:
+                # Archivo sin filas: solo encabezados
+                vacio = self.lector.vacio(archivo_entrada, self.columnas_leidas)
+                for lote in self._procesar([vacio], Contexto(parametros)):
+                    escritor.escribir(lote)
+
+        if filas_por_lote:
+            print(f"[INFO] {filas} filas procesadas en lotes de hasta {filas_por_lote}")
+        print(f"📁 Archivo transformado guardado en: {archivo_salida}")
+        return archivo_salida
+
+    def ejecutar_trabajo(self, archivos, parametros, carpeta_trabajo, opciones=None):
+        opciones = opciones or {}
+        formato = escritura.validar_formato(parametros.get('formato'))
+        ruta = self.ejecutar(archivos['archivo'], carpeta_trabajo, formato,
+                             opciones.get('filas_por_lote', FILAS_POR_LOTE), parametros)
+        if not os.path.exists(ruta):
+            raise RuntimeError('El archivo procesado no se generó correctamente')
+        return {'archivo': os.path.basename(ruta), 'ruta': ruta, 'origen': 'cache'}
+
+
+def _aplicar_tramo(lotes, etapas, contexto):
+    for lote in lotes:
+        for etapa in etapas:
+            with instrumentacion.etapa(etapa.nombre, lote) as e:
+                lote = etapa.aplicar(lote, contexto)
+                e.salida(lote)
+        yield lote
+
+
+def _fusionar(etapas):
+    """Une las etapas consecutivas que se pueden aplicar como una sola"""
+    fusionadas = []
+    for etapa in etapas:
+        unida = fusionadas[-1].fusionar(etapa) if fusionadas else None
+        if unida is not None:
+            fusionadas[-1] = unida
+        else:
+            fusionadas.append(etapa)
+    return fusionadas
+
+
+def _columnas_leidas(etapas):
+    """
+    Columnas del archivo que hacen falta si las primeras etapas son renombrados
+    seguidos de una selección (None = todas): se leen solo esas.
+    """
+    nombres = {}
+    for etapa in etapas:
+        if isinstance(etapa, Renombrar):
+            nombres = {origen: etapa.columnas.get(destino, destino) for origen, destino in nombres.items()}
+            for origen, destino in etapa.columnas.items():
+                nombres.setdefault(origen, destino)
+        elif isinstance(etapa, Seleccionar):
+            seleccion = set(etapa.columnas)
+            # Columnas con el nombre seleccionado (sin renombrar) o que se renombran a él
+            return {c for c in seleccion if c not in nombres} | {o for o, d in nombres.items() if d in seleccion}
+        else:
+            return None
+    return None
+
+
+REGISTRO = {}
+
+
+def registrar(transformacion):
+    """Agrega la transformación al registro (por nombre) y la devuelve"""
+    REGISTRO[transformacion.nombre] = transformacion
+    return transformacion
+
+
+def obtener(nombre):
+    try:
+        return REGISTRO[nombre]
+    except KeyError:
+        raise ValueError(f'Tipo de procesamiento "{nombre}" no reconocido')
+
+
+def por_ruta(ruta):
+    """Transformación de /transform/<ruta>, o None"""
+    for transformacion in REGISTRO.values():
+        if transformacion.ruta == ruta:
+            return transformacion
+    return None
@@ -0,0 +1,89 @@
+"""
+Planes de tipos de columna de cada script.
+
+Cada script declara un dict {columna: tipo} con las columnas que conviene
+guardar en un tipo más compacto que object / int64:
+
+    CATEGORIA  texto con pocos valores distintos (Marca, Linea, Ciudad...)
+    TEXTO      texto con muchos valores distintos (Cliente, Documento) en Arrow
+    ENTERO     enteros reducidos sin pérdida (int64 -> int8/16/32) al leer
+
+category y string se pasan como dtype a read_csv; aplicar() completa el plan
+después de leer (Parquet, Excel, enteros). La salida no cambia: el CSV escribe
+los mismos textos y escritura convierte las columnas a los tipos de Arrow que
+tenían antes al escribir Parquet. Los float con vacíos siguen como float: un
+entero nullable escribiría '3' en lugar de '3.0'.
+"""
+import pandas as pd
+from pandas.api.types import is_integer_dtype, union_categoricals
+
+CATEGORIA = 'category'
+TEXTO = 'string[pyarrow]'
+ENTERO = 'entero'
+
+# False lee todo con los tipos por defecto de pandas (para comparar memoria)
+ACTIVO = True
+
+
+def dtypes_lectura(plan, dtype=None):
+    """dtype para read_csv: el del script más las columnas category / string del plan"""
+    dtype = dict(dtype or {})
+    if ACTIVO:
+        dtype.update({columna: tipo for columna, tipo in plan.items() if tipo != ENTERO})
+    return dtype
+
+
+def _categorias_numericas(serie):
+    categorias = serie.cat.categories
+    return len(categorias) > 0 and pd.to_numeric(categorias, errors='coerce').notna().all()
+
+
+def aplicar(df, plan):
+    """
+    Completa el plan sobre un DataFrame ya leído (lo modifica y lo devuelve)
+
+    - Una columna category cuyos valores resultaron todos números vuelve a ser
+      numérica, como la habría leído pandas sin el plan.
+    - Las columnas object del plan (ej. leídas de Parquet o Excel) pasan a category / string.
+    - Las columnas ENTERO int64 pasan al entero más chico que contiene sus valores.
+    """
+    if not ACTIVO:
+        return df
+    for columna, tipo in plan.items():
+        if columna not in df.columns:
+            continue
+        serie = df[columna]
+        if tipo == CATEGORIA:
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                if _categorias_numericas(serie):
+                    df[columna] = pd.to_numeric(serie.astype(object))
+            elif serie.dtype == object:
+                df[columna] = serie.astype(CATEGORIA)
+        elif tipo == TEXTO:
+            if serie.dtype == object:
+                df[columna] = serie.astype(TEXTO)
+        elif tipo == ENTERO:
+            if is_integer_dtype(serie.dtype) and serie.dtype.kind in 'iu' and len(serie):
+                df[columna] = pd.to_numeric(serie, downcast='integer')
+    return df
+
+
+def concatenar(partes, **kwargs):
+    """
+    pd.concat que conserva las columnas category: con categorías distintas
+    entre partes pd.concat las convertiría a object
+    """
+    partes = list(partes)
+    if len(partes) > 1:
+        for columna in partes[0].columns:
+            series = [parte[columna] for parte in partes if columna in parte.columns]
+            if len(series) != len(partes) or not all(isinstance(s.dtype, pd.CategoricalDtype) for s in series):
+                continue
+            try:
+                categorias = union_categoricals(series, ignore_order=True).categories
+            except TypeError:
+                # Categorías de tipos distintos (números y texto): quedan object como sin plan
+                continue
+            partes = [parte.assign(**{columna: parte[columna].cat.set_categories(categorias)}) for parte in partes]
+    return pd.concat(partes, **kwargs)
+
@@ -1,60 +1,233 @@
-import pandas as pd
+import numpy as np
 import warnings
 import os
+from scripts import almacen_ventas, fechas, lectura, escritura, instrumentacion, pipeline, tipos
 
-def extraer_ano_mes(df):
-    """Extrae el mes de un DataFrame con columna 'Mes'"""
+# Tipos de las columnas de ventas (salida de venta_material). Mes se deja como
+# lo lee pandas: se compara y ordena contra el mes nuevo.
+PLAN_TIPOS = {
+    'Cliente': tipos.TEXTO,
+    'Documento': tipos.TEXTO,
+    'Nombre': tipos.CATEGORIA,
+    'Razon Social': tipos.CATEGORIA,
+    'Barrio': tipos.CATEGORIA,
+    'Nombre Segmento': tipos.CATEGORIA,
+    'Nombre.1': tipos.CATEGORIA,
+    'Marca': tipos.CATEGORIA,
+    'Sub marca': tipos.CATEGORIA,
+    'Linea': tipos.CATEGORIA,
+    'Sub linea': tipos.CATEGORIA,
+    'Categoria': tipos.CATEGORIA,
+    'Sub categoria': tipos.CATEGORIA,
+    'Negocio': tipos.CATEGORIA,
+    'Ciudad': tipos.CATEGORIA,
+    'Asesor': tipos.CATEGORIA,
+    'Producto': tipos.ENTERO,
+    'Cant. pedida': tipos.ENTERO,
+    'Cant. devuelta': tipos.ENTERO,
+    'Cantidad neta': tipos.ENTERO,
+    'Venta - IVA': tipos.ENTERO,
+}
+
+def extraer_meses(df):
+    """
+    Meses presentes en un DataFrame con columna 'Mes', en orden de aparición
+
+    Si 'Mes' viene como fecha en texto se reemplaza por el número de mes
+    (convirtiendo solo los valores distintos). Un archivo mensual puede traer
+    filas de más de un mes: se reemplazan todos.
+    """
     if 'Mes' not in df.columns:
         raise ValueError("El archivo mensual debe contener una columna 'Mes'")
+    if df.empty:
+        raise ValueError("El archivo mensual no tiene filas")
     if df['Mes'].dtype == 'O':  # object
-        df['Mes'] = pd.to_datetime(df['Mes'], errors='coerce')
-        df['Mes'] = df['Mes'].dt.month
-    return df['Mes'].unique()[0]
+        df['Mes'] = fechas.mes(df['Mes'])
+    return list(df['Mes'].unique())
+
+# Acumulados menores a este tamaño se leen en un solo proceso
+MIN_BYTES_PARALELO = 64 * 1024 * 1024
+
+def _leer_ventas(ruta, etiqueta, trabajadores=1, executor=None, min_bytes_paralelo=MIN_BYTES_PARALELO):
+    """Lee un archivo de ventas (CSV o Parquet) con una sola pasada"""
+    print(f"[INFO] Leyendo archivo {etiqueta}")
+    with instrumentacion.etapa(f'leer_{etiqueta}') as e:
+        df = lectura.leer_tabla(ruta, columnas_texto=('Cliente', 'Documento'), trabajadores=trabajadores,
+                                min_bytes_paralelo=min_bytes_paralelo, executor=executor,
+                                dtype=tipos.dtypes_lectura(PLAN_TIPOS))
+        # Completa el plan (Parquet, enteros, categorías que resultaron numéricas)
+        tipos.aplicar(df, PLAN_TIPOS)
+        e.salida(df)
+    instrumentacion.datos(f'leer_{etiqueta}', df)
+    return df
+
+def _leer_mes_y_acumulado(archivo_mes, archivo_acum, trabajadores, min_bytes_paralelo):
+    """
+    Lee ambos archivos a la vez: el mes en un proceso del pool mientras el
+    acumulado se reparte por rangos de líneas en el resto. Los procesos salen
+    del cupo compartido con los demás trabajos (lectura.reservar_procesos).
+
+    Returns:
+        tuple: (df_mes, df_acum)
+    """
+    with lectura.reservar_procesos(trabajadores) as trabajadores:
+        if trabajadores < 2:
+            return _leer_ventas(archivo_mes, 'mes'), _leer_ventas(archivo_acum, 'acum')
+
+        with lectura.crear_pool(trabajadores) as executor:
+            futuro_mes = executor.submit(_leer_ventas, archivo_mes, 'mes')
+            df_acum = _leer_ventas(archivo_acum, 'acum', trabajadores, executor, min_bytes_paralelo)
+            with instrumentacion.etapa('esperar_mes') as e:
+                df_mes = futuro_mes.result()
+                e.salida(df_mes)
+    return df_mes, df_acum
+
+def _ordenado_por_mes(serie):
+    try:
+        return serie.is_monotonic_increasing
+    except TypeError:
+        # Tipos no comparables (ej. números y texto)
+        return False
+
+def unir_ordenado(df_acum, df_mes):
+    """
+    Concatena acumulado y mes dejando el resultado ordenado por 'Mes', igual
+    que sort_values(by='Mes', kind='stable') sobre la concatenación.
+
+    Si ambos ya vienen ordenados por mes (el acumulado lo está porque lo generó
+    una unión anterior) las filas del mes se insertan en su posición con
+    searchsorted, sin ordenar todo el histórico. Si no, se ordena.
+
+    Solo la usa ejecutar (unión de dos archivos, benchmarks). La aplicación usa
+    ejecutar_incremental: el almacén guarda una partición por mes y el acumulado
+    se arma concatenándolas en orden, sin ordenar filas.
+    """
+    claves_acum = df_acum['Mes']
+    claves_mes = df_mes['Mes']
+
+    if not (_ordenado_por_mes(claves_acum) and _ordenado_por_mes(claves_mes)):
+        print("[INFO] El acumulado no está ordenado por mes, se ordena completo")
+        return tipos.concatenar([df_acum, df_mes], ignore_index=True).sort_values(by='Mes', kind='stable')
+
+    try:
+        # side='right': a igual mes, las filas del acumulado quedan antes (como en un orden estable)
+        posiciones = np.searchsorted(claves_acum.to_numpy(), claves_mes.to_numpy(), side='right')
+    except TypeError:
+        print("[INFO] Meses de tipos distintos entre archivos, se ordena completo")
+        return tipos.concatenar([df_acum, df_mes], ignore_index=True).sort_values(by='Mes', kind='stable')
+
+    if len(posiciones) == 0 or posiciones[0] == posiciones[-1]:
+        # Caso habitual: todo el mes va en un mismo punto del acumulado
+        corte = posiciones[0] if len(posiciones) else len(df_acum)
+        partes = [df_acum.iloc[:corte], df_mes, df_acum.iloc[corte:]]
+        return tipos.concatenar(partes, ignore_index=True)
+
+    # Varios meses nuevos: mezcla de las dos secuencias ordenadas
+    total_acum, total_mes = len(df_acum), len(df_mes)
+    destinos_mes = posiciones + np.arange(total_mes)
+    del_mes = np.zeros(total_acum + total_mes, dtype=bool)
+    del_mes[destinos_mes] = True
+    orden = np.empty(total_acum + total_mes, dtype=np.int64)
+    orden[del_mes] = total_acum + np.arange(total_mes)
+    orden[~del_mes] = np.arange(total_acum)
+    return tipos.concatenar([df_acum, df_mes], ignore_index=True).take(orden).reset_index(drop=True)
+
+def ejecutar(archivo_acum, archivo_mes, carpeta_salida, formato='csv', trabajadores=1,
+             min_bytes_paralelo=MIN_BYTES_PARALELO):
+    """
+    Une el mes con un acumulado completo y escribe el acumulado resultante.
+    La aplicación usa ejecutar_incremental con el almacén del servidor.
 
-def ejecutar(archivo_acum, archivo_mes, carpeta_salida):
+    Args:
+        trabajadores: procesos para leer ambos archivos a la vez (1 = lectura secuencial)
+    """
     print("\n🔗 Procesamiento: Unión de Ventas Mensuales con Acumuladas")
     warnings.filterwarnings('ignore')
 
     try:
-        # Multi-encoding fallback para archivo mes
-        for encoding in ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']:
-            try:
-                df_mes = pd.read_csv(archivo_mes, dtype={'Cliente': str, 'Documento': str}, encoding=encoding)
-                print(f"[INFO] Archivo mes leído con encoding: {encoding}")
-                break
-            except (UnicodeDecodeError, UnicodeError):
-                continue
-        else:
-            raise ValueError("No se pudo leer archivo_mes con los encodings disponibles.")
-        
-        # Multi-encoding fallback para archivo acumulado
-        for encoding in ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']:
-            try:
-                df_acum = pd.read_csv(archivo_acum, dtype={'Cliente': str, 'Documento': str}, encoding=encoding)
-                print(f"[INFO] Archivo acum leído con encoding: {encoding}")
-                break
-            except (UnicodeDecodeError, UnicodeError):
-                continue
-        else:
-            raise ValueError("No se pudo leer archivo_acum con los encodings disponibles.")
+        df_mes, df_acum = _leer_mes_y_acumulado(archivo_mes, archivo_acum, trabajadores, min_bytes_paralelo)
 
-        mes_nuevo = extraer_ano_mes(df_mes)
+        meses_nuevos = extraer_meses(df_mes)
 
         if 'Mes' not in df_acum.columns:
             raise ValueError("El archivo acumulado no contiene columna 'Mes'")
 
-        df_acum = df_acum[df_acum['Mes'] != mes_nuevo]
+        with instrumentacion.etapa('unir', len(df_acum) + len(df_mes)) as e:
+            df_acum = df_acum[~df_acum['Mes'].isin(meses_nuevos)]
 
-        df_final = pd.concat([df_acum, df_mes], ignore_index=True)
-        df_final = df_final.sort_values(by='Mes')
+            df_final = unir_ordenado(df_acum, df_mes)
+            e.salida(df_final)
 
         # Preparar carpeta de salida
         os.makedirs(carpeta_salida, exist_ok=True)
-        ruta_salida = os.path.join(carpeta_salida, "ventas_acum.csv")
+        ruta_salida = os.path.join(carpeta_salida, escritura.nombre_salida("ventas_acum.csv", formato))
 
-        df_final.to_csv(ruta_salida, index=False, encoding='utf-8')
+        instrumentacion.datos('escribir', df_final)
+        with instrumentacion.etapa('escribir', df_final):
+            escritura.escribir(df_final, ruta_salida, formato, encoding='utf-8')
         print(f"✅ Archivo actualizado guardado en: {ruta_salida}")
 
     except Exception as e:
         print(f"❌ Error durante la unión: {e}")
         raise  # Muy importante: relanzar para que la interfaz lo capture
+
+def ejecutar_incremental(archivo_mes, carpeta_almacen, archivo_acum=None, trabajadores=1,
+                         min_bytes_paralelo=MIN_BYTES_PARALELO):
+    """
+    Une el mes nuevo contra el almacén particionado (una partición por mes).
+
+    Si se envía archivo_acum, el almacén se reconstruye a partir de él; en caso
+    contrario solo se reemplazan las particiones de los meses del archivo, sin
+    leer el histórico. El acumulado completo se obtiene luego con
+    almacen_ventas.iterar_bytes.
+
+    Returns:
+        list: meses actualizados
+    """
+    print("\n🔗 Procesamiento: Unión incremental de Ventas Mensuales")
+    warnings.filterwarnings('ignore')
+
+    try:
+        if archivo_acum:
+            df_mes, df_acum = _leer_mes_y_acumulado(archivo_mes, archivo_acum, trabajadores, min_bytes_paralelo)
+            with instrumentacion.etapa('inicializar_almacen', df_acum):
+                almacen_ventas.inicializar_desde_acumulado(df_acum, carpeta_almacen)
+            del df_acum
+        elif almacen_ventas.almacen_vacio(carpeta_almacen):
+            raise ValueError("No hay ventas acumuladas en el servidor. Envíe el archivo acumulado.")
+        else:
+            df_mes = _leer_ventas(archivo_mes, 'mes')
+
+        meses_nuevos = extraer_meses(df_mes)
+
+        with instrumentacion.etapa('escribir_particion', df_mes):
+            almacen_ventas.escribir_meses(df_mes, carpeta_almacen)
+        print(f"✅ Mes {', '.join(map(str, meses_nuevos))} actualizado en el almacén: {carpeta_almacen}")
+        return meses_nuevos
+
+    except Exception as e:
+        print(f"❌ Error durante la unión: {e}")
+        raise
+
+def _ejecutar_trabajo(archivos, parametros, carpeta_trabajo, opciones):
+    meses = ejecutar_incremental(
+        archivos['archivo_mes'],
+        opciones['carpeta_almacen'],
+        archivo_acum=archivos.get('archivo_acum'),
+        trabajadores=opciones.get('trabajadores', 1),
+        min_bytes_paralelo=opciones.get('min_bytes_paralelo', MIN_BYTES_PARALELO)
+    )
+    return {'archivo': 'ventas_acum.csv', 'ruta': None, 'origen': 'ventas_acumuladas', 'mes': ', '.join(map(str, meses))}
+
+def _validar(archivos_subidos, opciones):
+    # El acumulado es opcional: sin él se usa el almacén particionado del servidor
+    if 'archivo_acum' not in archivos_subidos and almacen_ventas.almacen_vacio(opciones['carpeta_almacen']):
+        return 'Faltan archivos: el servidor aún no tiene ventas acumuladas'
+    return None
+
+# Une dos archivos contra el almacén del servidor: no es un pipeline de lotes,
+# se registra con su propia función. El resultado se descarga del almacén.
+TRANSFORMACION = pipeline.registrar(pipeline.Transformacion(
+    'union_ventas', ruta='union', campos=('archivo_mes',), opcionales=('archivo_acum',),
+    usa_cache=False, funcion=_ejecutar_trabajo, validar=_validar
+))
@@ -1,137 +1,156 @@
-import pandas as pd
-import os
+from scripts import pipeline, tipos
 
-def ejecutar(archivo_entrada, mes, carpeta_salida):
-    print("\n📦 Procesamiento: Informe Venta x Material x Cliente")
+# Renombrar columnas
+COLUMNAS_RENOMBRAR = {
+    'Razon Soc': 'Razon Social',
+    'Cant. Ped.': 'Cant. pedida',
+    'Cant. Dev.': 'Cant. devuelta',
+    'Cant. Neta': 'Cantidad neta',
+    'Vta. - IVA': 'Venta - IVA',
+    'SubMarca': 'Sub marca',
+    'SubLinea': 'Sub linea',
+    'Sub Categoria': 'Sub categoria',
+}
 
-    os.makedirs(carpeta_salida, exist_ok=True)
-    archivo_salida = os.path.join(carpeta_salida, "ventas_mes.csv")
+# Filtrado de columnas
+COLUMNAS = ['Cliente', 'Nombre', 'Razon Social', 'Documento','Barrio','Nombre Segmento','Producto', 'Nombre.1','Cant. pedida',
+            'Cant. devuelta', 'Cantidad neta', 'IVA','Venta - IVA','Marca', 'Sub marca','Linea', 'Sub linea', 'Categoria', 'Sub categoria',
+            'Negocio','Vendedor', 'Ciudad']
 
-    try:
-        extension = os.path.splitext(archivo_entrada)[1].lower()
-
-        # Lectura con multi-encoding fallback
-        if extension == ".csv":
-            for encoding in ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']:
-                try:
-                    df = pd.read_csv(archivo_entrada, dtype={'Cliente': str, 'Documento': str}, sep=',', encoding=encoding, engine="python")
-                    print(f"[INFO] CSV leído con encoding: {encoding}")
-                    break
-                except (UnicodeDecodeError, UnicodeError):
-                    continue
-            else:
-                raise ValueError("No se pudo leer el archivo CSV con los encodings disponibles.")
-        else:
-            raise ValueError("Formato no soportado.")
-
-        # Renombrar columnas
-        df = df.rename(columns={'Razon Soc': 'Razon Social',
-                        'Cant. Ped.': 'Cant. pedida',
-                        'Cant. Dev.': 'Cant. devuelta',
-                        'Cant. Neta': 'Cantidad neta',
-                        'Vta. - IVA': 'Venta - IVA',
-                        'SubMarca': 'Sub marca',
-                        'SubLinea': 'Sub linea',
-                        'Sub Categoria': 'Sub categoria',
-                        })
-
-        # Filtrado de columnas
-        df = df[['Cliente', 'Nombre', 'Razon Social', 'Documento','Barrio','Nombre Segmento','Producto', 'Nombre.1','Cant. pedida', 
-                'Cant. devuelta', 'Cantidad neta', 'IVA','Venta - IVA','Marca', 'Sub marca','Linea', 'Sub linea', 'Categoria', 'Sub categoria', 
-                'Negocio','Vendedor', 'Ciudad']].copy()
-
-        df = df[df['Vendedor'] != '99 - SERVICIOS']
+# Tipos al leer (nombres del archivo, antes de renombrar). Cliente y Documento
+# son texto; las columnas descriptivas repiten pocos valores; las cantidades
+# enteras se reducen. Los float con vacíos se dejan como float.
+PLAN_TIPOS = {
+    'Cliente': tipos.TEXTO,
+    'Documento': tipos.TEXTO,
+    'Nombre': tipos.CATEGORIA,
+    'Barrio': tipos.CATEGORIA,
+    'Nombre Segmento': tipos.CATEGORIA,
+    'Nombre.1': tipos.CATEGORIA,
+    'Marca': tipos.CATEGORIA,
+    'SubMarca': tipos.CATEGORIA,
+    'Linea': tipos.CATEGORIA,
+    'SubLinea': tipos.CATEGORIA,
+    'Categoria': tipos.CATEGORIA,
+    'Sub Categoria': tipos.CATEGORIA,
+    'Negocio': tipos.CATEGORIA,
+    'Vendedor': tipos.CATEGORIA,
+    'Ciudad': tipos.CATEGORIA,
+    'Cant. Ped.': tipos.ENTERO,
+    'Cant. Dev.': tipos.ENTERO,
+    'Cant. Neta': tipos.ENTERO,
+    'IVA': tipos.ENTERO,
+    'Vta. - IVA': tipos.ENTERO,
+}
+DTYPES_LECTURA = {'Cliente': str, 'Documento': str}
 
-        # Reemplazos
-        reemplazos = {
-            'Categoria': {
-                '10-Café': '10-Cafe',
-                '51-Té e infusiones': '51-Te e infusiones',
-                '61-Equipos Preparación': '61-Equipos Preparacion',
-                '06-Champiñones': '06-Champinones',
-                '09-Bebidas dechocolate': '09-Bebidas de chocolate',
-            },
-            'Nombre Segmento': {
-                'Reposición': 'Reposicion',
-                'AU Multimisión': 'AU Multimision',
-                'Servicios de Alimentación': 'Servicios de Alimentacion',
-                'Centros de diversión': 'Centros de diversion'
-            },
-            'Marca': {
-                '026-Colcafé': '026-Colcafe',
-                '001-Zenú': '001-Zenu',
-                '351-Genérico otros distibuidos': '351-Generico otros distribuidos',
-                '373-Bénet': '373-Benet',
-                '113-Drácula': '113-Dracula',
-                '096-Setas de Cuivá': '096-Setas de Cuiva'
-            },
-            'Sub marca': {
-                '01-Colcafé': '01-Colcafe',
-                '01-Zenú': '01-Zenu',
-                '02-Zenú': '02-Zenu',
-                '01-Genérico otros distibuidos': '01-Generico otros distribuidos',
-                '01-Bénet': '01-Benet',
-                '10-Lechey calcio': '10-Leche y calcio',
-                '04-Lechecon almendras': '04-Leche con almendras',
-                '12-Quesoy Mantequilla': '12-Queso y Mantequilla',
-                '08-Gool': '08-Gol',
-                '01-Drácula': '01-Dracula',
-            },
-            'Negocio': {
-                '01-Cárnicos': '01-Carnicos',
-                '04-Café': '04-Cafe',
-                '23-Nutrición Experta': '23-Nutricion Experta',
-            },
-            'Linea': {
-                '0094-Sólidas': '0094-Solidas',
-                '0041-Azúcar': '0041-Azucar',
-                '0058-Café Molido': '0058-Cafe Molido',
-                '0103-Pasta Clásica': '0103-Pasta Clasica',
-                '0200-Atún': '0200-Atun',
-                '0194-Maíz LV': '0194-Maiz LV',
-                '0029-Otros LV Cárnicos': '0029-Otros LV Carnicos',
-                '0090-Cremas dechocolate': '0090-Cremas de chocolate',
-                '0521-Cápsulas': '0521-Capsulas',
-            },
-            'Sub linea':{
-                '0161-Sólidas sin agregados': '0161-Solidas sin agregados',
-                '0160-Sólidas con agregados': '0160-Solidas con agregados',
-                '0171-Grageadoscrocantes': '0171-Grageados crocantes',
-                '0173-Clásica': '0173-Clasica',
-                '0296-Maíz LV': '0296-Maiz LV',
-                '0151-Bombones sólidos': '0151-Bombones solidos',
-                '0420-Azúcar': '0420-Azucar',
-                '0152-Cremas deChocolate': '0152-Cremas de Chocolate',
-                '0141-Estuches de Línea': '0141-Estuches de Linea',
-                '0688-Cápsulas': '0688-Capsulas',
-            },
-            'Sub categoria': {
-                '026-Instantáneo': '026-Instantaneo',
-                '027-Mezclas Instantáneas': '027-Mezclas Instantaneas',
-                '056-OtrosDistribuidos': '056-Otros Distribuidos',
-                '277-Cápsulas Nutricional': '277-Capsulas Nutricional'
-            }
-        
-        }
+# Reemplazos
+REEMPLAZOS = {
+    'Categoria': {
+        '10-Café': '10-Cafe',
+        '51-Té e infusiones': '51-Te e infusiones',
+        '61-Equipos Preparación': '61-Equipos Preparacion',
+        '06-Champiñones': '06-Champinones',
+        '09-Bebidas dechocolate': '09-Bebidas de chocolate',
+    },
+    'Nombre Segmento': {
+        'Reposición': 'Reposicion',
+        'AU Multimisión': 'AU Multimision',
+        'Servicios de Alimentación': 'Servicios de Alimentacion',
+        'Centros de diversión': 'Centros de diversion'
+    },
+    'Marca': {
+        '026-Colcafé': '026-Colcafe',
+        '001-Zenú': '001-Zenu',
+        '351-Genérico otros distibuidos': '351-Generico otros distribuidos',
+        '373-Bénet': '373-Benet',
+        '113-Drácula': '113-Dracula',
+        '096-Setas de Cuivá': '096-Setas de Cuiva'
+    },
+    'Sub marca': {
+        '01-Colcafé': '01-Colcafe',
+        '01-Zenú': '01-Zenu',
+        '02-Zenú': '02-Zenu',
+        '01-Genérico otros distibuidos': '01-Generico otros distribuidos',
+        '01-Bénet': '01-Benet',
+        '10-Lechey calcio': '10-Leche y calcio',
+        '04-Lechecon almendras': '04-Leche con almendras',
+        '12-Quesoy Mantequilla': '12-Queso y Mantequilla',
+        '08-Gool': '08-Gol',
+        '01-Drácula': '01-Dracula',
+    },
+    'Negocio': {
+        '01-Cárnicos': '01-Carnicos',
+        '04-Café': '04-Cafe',
+        '23-Nutrición Experta': '23-Nutricion Experta',
+    },
+    'Linea': {
+        '0094-Sólidas': '0094-Solidas',
+        '0041-Azúcar': '0041-Azucar',
+        '0058-Café Molido': '0058-Cafe Molido',
+        '0103-Pasta Clásica': '0103-Pasta Clasica',
+        '0200-Atún': '0200-Atun',
+        '0194-Maíz LV': '0194-Maiz LV',
+        '0029-Otros LV Cárnicos': '0029-Otros LV Carnicos',
+        '0090-Cremas dechocolate': '0090-Cremas de chocolate',
+        '0521-Cápsulas': '0521-Capsulas',
+    },
+    'Sub linea':{
+        '0161-Sólidas sin agregados': '0161-Solidas sin agregados',
+        '0160-Sólidas con agregados': '0160-Solidas con agregados',
+        '0171-Grageadoscrocantes': '0171-Grageados crocantes',
+        '0173-Clásica': '0173-Clasica',
+        '0296-Maíz LV': '0296-Maiz LV',
+        '0151-Bombones sólidos': '0151-Bombones solidos',
+        '0420-Azúcar': '0420-Azucar',
+        '0152-Cremas deChocolate': '0152-Cremas de Chocolate',
+        '0141-Estuches de Línea': '0141-Estuches de Linea',
+        '0688-Cápsulas': '0688-Capsulas',
+    },
+    'Sub categoria': {
+        '026-Instantáneo': '026-Instantaneo',
+        '027-Mezclas Instantáneas': '027-Mezclas Instantaneas',
+        '056-OtrosDistribuidos': '056-Otros Distribuidos',
+        '277-Cápsulas Nutricional': '277-Capsulas Nutricional'
+    }
+}
 
-        for columna, valores in reemplazos.items():
-            df[columna] = df[columna].replace(valores)
+# Quitar tildes también de los valores que no están en REEMPLAZOS (cambia la salida)
+QUITAR_ACENTOS = False
 
-        # Insertar mes
-        df.insert(1, 'Mes', mes)
+def _mes(df, parametros):
+    """Mes del formulario, numérico si lo es (para que Parquet no lo guarde como texto)"""
+    mes = parametros.get('mes', '')
+    return int(mes) if str(mes).strip().isdigit() else mes
 
-        # División de columnas
-        df[['Cod. Asesor', 'Asesor']] = df['Vendedor'].str.split('-', expand=True)
-        df[['Cod. Ciudad', 'Ciudad']] = df['Ciudad'].str.split('-', expand=True)
-        df.drop(columns=['Cod. Ciudad', 'Vendedor'], inplace=True)
-
-        # Conversion columna Venta - IVA a numero entero
-        df['Venta - IVA'] = pd.to_numeric(df['Venta - IVA'], errors='coerce').fillna(0).astype(int)
-
-
-        # Guardar archivo
-        df.to_csv(archivo_salida, index=False, encoding='latin1')
-        print(f"📁 Archivo transformado guardado en: {archivo_salida}")
+PIPELINE = pipeline.registrar(pipeline.Pipeline('venta_material', 'ventas_mes.csv', [
+    pipeline.Leer(dtype=DTYPES_LECTURA, plan_tipos=PLAN_TIPOS, sep=',', engine="python"),
+    pipeline.Renombrar(COLUMNAS_RENOMBRAR),
+    pipeline.Seleccionar(COLUMNAS),
+    # Tipos como en la lectura completa: un vacío en una columna entera la deja
+    # float (3.0) en todo el archivo, no solo en su lote. Antes de filtrar,
+    # porque las filas filtradas también cuentan al leer el archivo completo
+    pipeline.UnificarTipos(),
+    pipeline.Filtrar('Vendedor', distinto='99 - SERVICIOS'),
+    # Reemplazos sobre los valores únicos de cada columna
+    pipeline.Reemplazar(REEMPLAZOS, acentos=QUITAR_ACENTOS),
+    pipeline.Agregar('Mes', _mes, posicion=1),
+    # División de columnas en el primer '-' (sobre los valores únicos)
+    pipeline.Dividir('Vendedor', ['Cod. Asesor', 'Asesor']),
+    pipeline.Dividir('Ciudad', [None, 'Ciudad']),
+    # Venta - IVA a número entero
+    pipeline.Convertir({'Venta - IVA': 'entero'}),
+    pipeline.Escribir(encoding='latin1'),
+], titulo="📦 Procesamiento: Informe Venta x Material x Cliente", ruta='ventas'))
 
+def ejecutar(archivo_entrada, mes, carpeta_salida, chunksize=None, formato='csv'):
+    """
+    Si se indica chunksize, el archivo se procesa en lotes de ese número de filas
+    (memoria constante; los lotes pasan por disco para unificar sus tipos); si
+    no, se carga completo.
+    """
+    try:
+        PIPELINE.ejecutar(archivo_entrada, carpeta_salida, formato, filas_por_lote=chunksize,
+                          parametros={'mes': mes})
     except Exception as e:
-        print(f"❌ Error durante el procesamiento: {e}")
\ No newline at end of file
+        print(f"❌ Error durante el procesamiento: {e}")
@@ -9,6 +9,12 @@ cd "$APP_DIR"
 # Las variables de entorno ya están cargadas por docker-compose (env_file)
 # Así que no necesitamos source .env aquí
 
+# Métricas Prometheus compartidas entre workers: cada proceso escribe en esta
+# carpeta y /metrics las suma. Se vacía al iniciar para no arrastrar procesos viejos.
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/convertidor_metricas}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
 # Ejecutar gunicorn con configuración para archivos grandes
 # - workers: 4 (aumentado para mejor paralelización)
 # - timeout: 3600 (1 hora para archivos muy grandes)
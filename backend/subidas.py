@@ -0,0 +1,76 @@
+"""
+Recepción de archivos subidos directo a disco
+
+Werkzeug escribe cada archivo del multipart en un archivo temporal propio de
+la petición y aquí se calcula su SHA-256 mientras llega. Al procesarlo, el
+archivo se mueve (os.replace) a la carpeta de trabajo en lugar de copiarlo
+con FileStorage.save(), y el hash ya está listo para la clave del cache.
+"""
+import os
+import shutil
+import hashlib
+import tempfile
+
+from flask import Request
+
+import cache
+
+
+class ArchivoSubido:
+    """Archivo temporal en disco que calcula el hash de lo que se le escribe"""
+
+    def __init__(self, carpeta):
+        self._archivo = tempfile.NamedTemporaryFile(dir=carpeta, prefix='subida_', delete=False)
+        self.name = self._archivo.name
+        self.sha256 = hashlib.sha256()
+
+    def write(self, datos):
+        self.sha256.update(datos)
+        return self._archivo.write(datos)
+
+    def __getattr__(self, nombre):
+        # read, readline, seek, tell, close... del archivo real
+        return getattr(self._archivo, nombre)
+
+    def __iter__(self):
+        return iter(self._archivo)
+
+
+class SubidaRequest(Request):
+    """Request de Flask que guarda las subidas en una carpeta temporal por petición"""
+
+    carpeta_subidas = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.carpeta_subidas is None:
+            self.carpeta_subidas = tempfile.mkdtemp(prefix='subidas_')
+        return ArchivoSubido(self.carpeta_subidas)
+
+    def limpiar_subidas(self):
+        """Elimina los archivos subidos que no se movieron a otra carpeta"""
+        if self.carpeta_subidas is not None:
+            shutil.rmtree(self.carpeta_subidas, ignore_errors=True)
+            self.carpeta_subidas = None
+
+
+def mover_subida(archivo, destino):
+    """
+    Mueve el archivo subido (FileStorage) a destino sin copiar sus bytes
+
+    Returns:
+        str: SHA-256 del contenido
+    """
+    flujo = archivo.stream
+    if not isinstance(flujo, ArchivoSubido):
+        # Petición sin SubidaRequest: guardado y hash tradicionales
+        archivo.save(destino)
+        return cache.hash_archivo(destino)
+
+    flujo.flush()
+    flujo.close()
+    try:
+        os.replace(flujo.name, destino)
+    except OSError:
+        # Otro sistema de archivos: se copia una vez
+        shutil.move(flujo.name, destino)
+    return flujo.sha256.hexdigest()
@@ -0,0 +1,33 @@
+"""
+Pruebas del backend: se ejecutan desde backend/ con
+
+    python -m pytest -q tests
+
+Los archivos de entrada de tests/datos se generaron con benchmarks/generadores.py
+(semillas fijas) y los esperados de tests/datos/esperado con los scripts
+originales, antes de pasarlos al pipeline por lotes.
+"""
+import os
+import sys
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND not in sys.path:
+    sys.path.insert(0, BACKEND)
+
+DATOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'datos')
+ESPERADO = os.path.join(DATOS, 'esperado')
+
+
+@pytest.fixture
+def datos():
+    return lambda nombre: os.path.join(DATOS, nombre)
+
+
+@pytest.fixture
+def esperado():
+    def leer(nombre):
+        with open(os.path.join(ESPERADO, nombre), 'rb') as f:
+            return f.read()
+    return leer
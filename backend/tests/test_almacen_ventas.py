@@ -0,0 +1,92 @@
+import os
+
+import pandas as pd
+import pytest
+
+from scripts import almacen_ventas
+
+
+def _ventas(meses, columnas=('Cliente', 'Mes', 'Venta')):
+    filas = [{'Cliente': f'C{i}', 'Mes': mes, 'Venta': i * 10} for i, mes in enumerate(meses)]
+    return pd.DataFrame(filas)[list(columnas)]
+
+
+def _exportado(carpeta, tmp_path):
+    return pd.read_csv(almacen_ventas.exportar(carpeta, str(tmp_path / 'acum.csv')), dtype=str,
+                       keep_default_na=False)
+
+
+def test_escribir_meses_una_particion_por_mes(tmp_path):
+    carpeta = str(tmp_path / 'almacen')
+    rutas = almacen_ventas.escribir_meses(_ventas([4, 5, 4, 5.0]), carpeta)
+
+    # 5 y 5.0 comparten partición y las filas conservan su orden
+    assert [os.path.basename(r) for r in rutas] == ['mes_4.csv', 'mes_5.csv']
+    assert pd.read_csv(rutas[0])['Cliente'].tolist() == ['C0', 'C2']
+    assert pd.read_csv(rutas[1])['Cliente'].tolist() == ['C1', 'C3']
+
+
+def test_escribir_meses_reemplaza_solo_sus_meses(tmp_path):
+    carpeta = str(tmp_path / 'almacen')
+    almacen_ventas.inicializar_desde_acumulado(_ventas([3, 4, 5]), carpeta)
+    nuevo = _ventas([4, 4])
+    nuevo['Cliente'] = ['N0', 'N1']
+    almacen_ventas.escribir_meses(nuevo, carpeta)
+
+    assert _exportado(carpeta, tmp_path)['Cliente'].tolist() == ['C0', 'N0', 'N1', 'C2']
+
+
+def test_particiones_en_orden_de_mes(tmp_path):
+    carpeta = str(tmp_path / 'almacen')
+    almacen_ventas.inicializar_desde_acumulado(_ventas([10, 'ENE', 2, None, 1]), carpeta)
+
+    # Numéricos primero (como números, no como texto), luego texto y los vacíos al final
+    assert [os.path.basename(r) for r in almacen_ventas.listar_particiones(carpeta)] == [
+        'mes_1.csv', 'mes_2.csv', 'mes_10.csv', 'mes_ENE.csv', 'mes_nan.csv']
+    assert _exportado(carpeta, tmp_path)['Cliente'].tolist() == ['C4', 'C2', 'C0', 'C1', 'C3']
+
+
+def test_inicializar_reemplaza_el_almacen(tmp_path):
+    carpeta = str(tmp_path / 'almacen')
+    almacen_ventas.inicializar_desde_acumulado(_ventas([1, 2]), carpeta)
+    almacen_ventas.inicializar_desde_acumulado(_ventas([3]), carpeta)
+
+    assert [os.path.basename(r) for r in almacen_ventas.listar_particiones(carpeta)] == ['mes_3.csv']
+
+
+def test_mes_con_columnas_en_otro_orden_se_alinea(tmp_path):
+    carpeta = str(tmp_path / 'almacen')
+    almacen_ventas.inicializar_desde_acumulado(_ventas([3, 4]), carpeta)
+    almacen_ventas.escribir_meses(_ventas([5], columnas=('Venta', 'Mes', 'Cliente')), carpeta)
+
+    with open(almacen_ventas.exportar(carpeta, str(tmp_path / 'acum.csv')), 'rb') as f:
+        contenido = f.read()
+    # Mismas columnas: la partición se escribe con el orden del almacén y se concatena tal cual
+    assert contenido == b'Cliente,Mes,Venta\nC0,3,0\nC1,4,10\nC0,5,0\n'
+
+
+def test_exportar_alinea_encabezados_distintos(tmp_path):
+    carpeta = str(tmp_path / 'almacen')
+    almacen_ventas.inicializar_desde_acumulado(_ventas([3]), carpeta)
+    nuevo = _ventas([4])
+    nuevo['Zona'] = ['NORTE']
+    almacen_ventas.escribir_meses(nuevo, carpeta)
+
+    exportado = _exportado(carpeta, tmp_path)
+    assert exportado.columns.tolist() == ['Cliente', 'Mes', 'Venta', 'Zona']
+    assert exportado['Zona'].tolist() == ['', 'NORTE']
+
+
+def test_exportar_almacen_vacio(tmp_path):
+    carpeta = str(tmp_path / 'almacen')
+    assert almacen_ventas.almacen_vacio(carpeta)
+    with open(almacen_ventas.exportar(carpeta, str(tmp_path / 'acum.csv')), 'rb') as f:
+        assert f.read() == b''
+
+
+def test_sin_columna_mes(tmp_path):
+    df = _ventas([1]).drop(columns='Mes')
+    with pytest.raises(ValueError, match="'Mes'"):
+        almacen_ventas.escribir_meses(df, str(tmp_path))
+    with pytest.raises(ValueError, match="'Mes'"):
+        almacen_ventas.inicializar_desde_acumulado(df, str(tmp_path))
@@ -0,0 +1,74 @@
+import os
+import time
+
+import pytest
+
+import cache
+from config import Config
+
+
+@pytest.fixture
+def objetos(tmp_path, monkeypatch):
+    carpeta = tmp_path / 'objetos'
+    carpeta.mkdir()
+    monkeypatch.setattr(cache, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(cache, 'OBJETOS_DIR', str(carpeta))
+    monkeypatch.setattr(Config, 'CACHE_TTL', 3600)
+    monkeypatch.setattr(Config, 'CACHE_MAX_BYTES', 1000)
+    return carpeta
+
+
+def _entrada(carpeta, clave, tamano, modificado, usado):
+    """Resultado con su metadato; modificado y usado son segundos atrás"""
+    ahora = time.time()
+    ruta = carpeta / f'{clave}.csv'
+    ruta.write_bytes(b'x' * tamano)
+    os.utime(ruta, (ahora - usado, ahora - modificado))
+    (carpeta / f'{clave}.json').write_text('{}')
+    return ruta
+
+
+def _archivos(carpeta):
+    return sorted(os.listdir(carpeta))
+
+
+def test_elimina_expiradas(objetos):
+    _entrada(objetos, 'vieja', 10, modificado=7200, usado=0)
+    _entrada(objetos, 'nueva', 10, modificado=60, usado=60)
+
+    cache.desalojar()
+
+    # El TTL cuenta desde que se creó, aunque se haya usado hace poco
+    assert _archivos(objetos) == ['nueva.csv', 'nueva.json']
+
+
+def test_lru_hasta_el_presupuesto(objetos):
+    _entrada(objetos, 'a', 400, modificado=60, usado=30)
+    _entrada(objetos, 'b', 400, modificado=60, usado=50)
+    _entrada(objetos, 'c', 400, modificado=60, usado=10)
+
+    cache.desalojar()
+
+    # 1200 bytes > 1000: sale solo la menos usada recientemente
+    assert _archivos(objetos) == ['a.csv', 'a.json', 'c.csv', 'c.json']
+
+
+def test_dentro_del_presupuesto_no_elimina(objetos):
+    _entrada(objetos, 'a', 500, modificado=60, usado=30)
+    _entrada(objetos, 'b', 500, modificado=60, usado=50)
+
+    cache.desalojar()
+
+    assert _archivos(objetos) == ['a.csv', 'a.json', 'b.csv', 'b.json']
+
+
+def test_ignora_metadatos_y_temporales(objetos):
+    _entrada(objetos, 'a', 10, modificado=60, usado=60)
+    # Un temporal grande y viejo (resultado a medio escribir) no cuenta ni se borra
+    temporal = objetos / 'b.csv.123.tmp'
+    temporal.write_bytes(b'x' * 5000)
+    os.utime(temporal, (time.time() - 7200, time.time() - 7200))
+
+    cache.desalojar()
+
+    assert _archivos(objetos) == ['a.csv', 'a.json', 'b.csv.123.tmp']
@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+
+from scripts import lectura
+
+
+@pytest.fixture
+def utf8_con_latin1_al_final(tmp_path):
+    """UTF-8 válido en los primeros bytes y un byte latin-1 mucho después"""
+    ruta = tmp_path / 'ventas.csv'
+    with open(ruta, 'wb') as f:
+        f.write(b'id,nombre\n')
+        for i in range(50):
+            f.write(f'{i},ANA {i}\n'.encode('utf-8'))
+        f.write('50,MUÑOZ\n'.encode('latin-1'))
+        for i in range(51, 60):
+            f.write(f'{i},LUZ {i}\n'.encode('utf-8'))
+    return str(ruta)
+
+
+def test_detecta_con_la_muestra(utf8_con_latin1_al_final):
+    assert lectura.detectar_encoding(utf8_con_latin1_al_final, muestra_bytes=64) == 'utf-8'
+    assert lectura.detectar_encoding(utf8_con_latin1_al_final, muestra_bytes=None) == 'latin-1'
+
+
+def test_relee_como_latin1(utf8_con_latin1_al_final):
+    df = lectura.leer_csv(utf8_con_latin1_al_final, muestra_bytes=64)
+
+    pd.testing.assert_frame_equal(df, pd.read_csv(utf8_con_latin1_al_final, encoding='latin-1'))
+    # La próxima lectura del mismo archivo ya usa latin-1
+    assert lectura.detectar_encoding(utf8_con_latin1_al_final, muestra_bytes=64) == 'latin-1'
+
+
+def test_relee_por_lotes_sin_repetir_filas(utf8_con_latin1_al_final):
+    lotes = list(lectura.leer_csv(utf8_con_latin1_al_final, muestra_bytes=64, chunksize=20))
+    df = pd.concat(lotes)
+
+    assert df['id'].tolist() == list(range(60))
+    assert df.index.tolist() == list(range(60))
+    assert df['nombre'].iloc[50] == 'MUÑOZ'
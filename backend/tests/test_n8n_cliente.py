@@ -0,0 +1,80 @@
+import csv
+import io
+
+import pytest
+
+from n8n_cliente import dividir_en_partes
+
+
+def _escribir(tmp_path, contenido):
+    ruta = tmp_path / 'datos.csv'
+    ruta.write_bytes(contenido)
+    return str(ruta)
+
+
+def _partes(ruta, rangos):
+    with open(ruta, 'rb') as f:
+        datos = f.read()
+    return [datos[inicio:fin] for inicio, fin in rangos]
+
+
+def _filas(encabezado, parte):
+    return list(csv.reader(io.StringIO((encabezado + parte).decode('utf-8'))))[1:]
+
+
+@pytest.mark.parametrize('filas_por_parte, esperadas', [(3, [3, 3, 3, 1]), (5, [5, 5]), (10, [10]), (20, [10])])
+def test_filas_por_parte(tmp_path, filas_por_parte, esperadas):
+    contenido = b'a,b\n' + b''.join(b'%d,x\n' % i for i in range(10))
+    ruta = _escribir(tmp_path, contenido)
+
+    encabezado, rangos = dividir_en_partes(ruta, filas_por_parte)
+
+    assert encabezado == b'a,b\n'
+    assert [len(_filas(encabezado, p)) for p in _partes(ruta, rangos)] == esperadas
+    # Los rangos son contiguos y cubren todo el archivo
+    assert rangos[0][0] == len(encabezado) and rangos[-1][1] == len(contenido)
+    assert all(fin == inicio for (_, fin), (inicio, _) in zip(rangos, rangos[1:]))
+
+
+def test_no_corta_saltos_de_linea_entre_comillas(tmp_path):
+    filas = [[str(i), f'linea {i}\notra "linea"\n'] for i in range(7)]
+    salida = io.StringIO()
+    csv.writer(salida, lineterminator='\n').writerows([['id', 'texto']] + filas)
+    ruta = _escribir(tmp_path, salida.getvalue().encode('utf-8'))
+
+    encabezado, rangos = dividir_en_partes(ruta, 2)
+
+    partes = [_filas(encabezado, p) for p in _partes(ruta, rangos)]
+    assert [len(p) for p in partes] == [2, 2, 2, 1]
+    assert [fila for parte in partes for fila in parte] == filas
+
+
+def test_ultima_fila_sin_salto_de_linea(tmp_path):
+    ruta = _escribir(tmp_path, b'a\n1\n2\n3')
+
+    encabezado, rangos = dividir_en_partes(ruta, 2)
+
+    assert _partes(ruta, rangos) == [b'1\n2\n', b'3']
+
+
+def test_solo_encabezado(tmp_path):
+    ruta = _escribir(tmp_path, b'a,b\n')
+
+    encabezado, rangos = dividir_en_partes(ruta, 100)
+
+    # Una parte vacía para que igual se envíe el encabezado
+    assert encabezado == b'a,b\n'
+    assert rangos == [(4, 4)]
+
+
+def test_archivo_de_varios_bloques(tmp_path):
+    """Filas que cruzan el límite de los bloques de lectura de 1 MB, con y sin comillas"""
+    filas = [f'{i},{"x" * 50}\n'.encode() if i % 1000 else f'{i},"a\nb"\n'.encode() for i in range(60000)]
+    contenido = b'id,texto\n' + b''.join(filas)
+    ruta = _escribir(tmp_path, contenido)
+
+    encabezado, rangos = dividir_en_partes(ruta, 25000)
+    partes = _partes(ruta, rangos)
+
+    assert [len(_filas(encabezado, p)) for p in partes] == [25000, 25000, 10000]
+    assert encabezado + b''.join(partes) == contenido
@@ -0,0 +1,91 @@
+"""
+Salidas de los scripts portados al pipeline comparadas byte a byte con las de
+los scripts originales (venta_material con la división en el primer '-').
+Cada caso se corre con el archivo completo y por lotes pequeños: el resultado
+no debe depender del tamaño del lote.
+"""
+import os
+
+import pandas as pd
+import pytest
+
+from scripts import almacen_ventas, clientes, exhibidores, unir_ventas, venta_material
+
+LOTES = [0, 7]
+
+
+def _ejecutar(pipeline_script, entrada, carpeta, filas_por_lote, formato='csv', parametros=None):
+    pipeline_script.ejecutar(entrada, str(carpeta), formato, filas_por_lote=filas_por_lote,
+                             parametros=parametros)
+    (archivo,) = os.listdir(carpeta)
+    with open(os.path.join(carpeta, archivo), 'rb') as f:
+        return archivo, f.read()
+
+
+@pytest.mark.parametrize('filas_por_lote', LOTES)
+def test_venta_material(tmp_path, datos, esperado, filas_por_lote):
+    archivo, contenido = _ejecutar(venta_material.PIPELINE, datos('venta_material.csv'), tmp_path,
+                                   filas_por_lote, parametros={'mes': '5'})
+    assert archivo == 'ventas_mes.csv'
+    assert contenido == esperado('ventas_mes.csv')
+
+
+@pytest.mark.parametrize('filas_por_lote', LOTES)
+def test_exhibidores(tmp_path, datos, esperado, filas_por_lote):
+    archivo, contenido = _ejecutar(exhibidores.PIPELINE, datos('exhibidores.csv'), tmp_path, filas_por_lote)
+    assert archivo == 'Exhibidores.csv'
+    assert contenido == esperado('Exhibidores.csv')
+
+
+@pytest.mark.parametrize('entrada', ['csv', 'xlsx'])
+@pytest.mark.parametrize('filas_por_lote', LOTES)
+def test_clientes(tmp_path, datos, esperado, entrada, filas_por_lote):
+    archivo, contenido = _ejecutar(clientes.PIPELINE, datos(f'clientes.{entrada}'), tmp_path, filas_por_lote)
+    assert archivo == 'maestra_clientes.csv'
+    assert contenido == esperado(f'maestra_clientes_{entrada}.csv')
+
+
+def test_clientes_parquet_por_lotes(tmp_path, datos):
+    """Columnas con tipos distintos entre lotes: el Parquet por lotes es el del libro completo"""
+    _ejecutar(clientes.PIPELINE, datos('clientes.xlsx'), tmp_path / 'completo', 0, formato='parquet')
+    _ejecutar(clientes.PIPELINE, datos('clientes.xlsx'), tmp_path / 'lotes', 7, formato='parquet')
+    pd.testing.assert_frame_equal(
+        pd.read_parquet(tmp_path / 'lotes' / 'maestra_clientes.parquet'),
+        pd.read_parquet(tmp_path / 'completo' / 'maestra_clientes.parquet'))
+
+
+# El acumulado trae los meses 3 a 6; ventas_mes.csv solo el 5 y ventas_meses.csv
+# el 4 y el 6 (deben reemplazarse ambos, no solo el primero)
+UNIONES = [
+    ('ventas_mes.csv', [5], 'ventas_acum_mes.csv'),
+    ('ventas_meses.csv', [4, 6], 'ventas_acum_meses.csv'),
+]
+
+
+@pytest.mark.parametrize('archivo_mes, meses, resultado', UNIONES)
+def test_unir_ventas(tmp_path, datos, esperado, archivo_mes, meses, resultado):
+    unir_ventas.ejecutar(datos('ventas_acum.csv'), datos(archivo_mes), str(tmp_path))
+    with open(tmp_path / 'ventas_acum.csv', 'rb') as f:
+        assert f.read() == esperado(resultado)
+
+
+@pytest.mark.parametrize('archivo_mes, meses, resultado', UNIONES)
+def test_unir_ventas_incremental(tmp_path, datos, esperado, archivo_mes, meses, resultado):
+    almacen = str(tmp_path / 'almacen')
+    assert unir_ventas.ejecutar_incremental(datos(archivo_mes), almacen,
+                                            archivo_acum=datos('ventas_acum.csv')) == meses
+
+    ruta = almacen_ventas.exportar(almacen, str(tmp_path / 'ventas_acum.csv'))
+    with open(ruta, 'rb') as f:
+        assert f.read() == esperado(resultado)
+
+
+def test_unir_ventas_incremental_sin_acumulado(tmp_path, datos, esperado):
+    """Un mes sobre el almacén ya inicializado da lo mismo que la unión con el acumulado"""
+    almacen = str(tmp_path / 'almacen')
+    almacen_ventas.inicializar_desde_acumulado(pd.read_csv(datos('ventas_acum.csv'), dtype=str), almacen)
+    unir_ventas.ejecutar_incremental(datos('ventas_meses.csv'), almacen)
+
+    ruta = almacen_ventas.exportar(almacen, str(tmp_path / 'ventas_acum.csv'))
+    with open(ruta, 'rb') as f:
+        assert f.read() == esperado('ventas_acum_meses.csv')